@@ -1,58 +1,176 @@
-from fastapi import FastAPI, Query
+from fastapi import FastAPI, Query, Request, Response
+from pydantic import BaseModel
+from typing import List, Optional
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
-from checker import check_tee_times, get_cached_tee_times
-import subprocess
+from checker import get_cached_tee_times, check_status, check_freshness, parse_targets
+from failures import breaker
+from resource_policy import resource_policy
+from persistence import ConfigStore
+from shared_state import (
+    get_state_backend, LeaderLease, StateWatcher, CONFIG_KEY, CHECK_PAYLOAD_KEY, SCRAPE_REQUEST_KEY, HOT_WATCH_KEY,
+)
 import os
-import json
-import threading
 from scraper import run_scraper
+from browser_pool import get_pool, shutdown_pool
+from jobs import scrape_queue, QueueFull
+from sheet_fetch import get_fetcher
+from artifacts import artifact_store
+from slot_store import get_store
+from result_cache import result_cache, CHECK, CONFIG
+from events import broadcaster
+from notifier import notifier
+from async_checker import bind_loop, run_check, get_async_pool, shutdown_async_pool
+from scraper import CHECK_ENGINE
+from scheduler import Scheduler, PollPolicy, SCHEDULER_ENABLED
+from metrics import metrics
+from watchlists import get_watch_store, with_watch_dates
+from observations import get_observation_store, WEEKDAYS
+from hot_watch import hot_watch, HotWatchBusy
+from sheet_parser import parse_time
+from startup import readiness, prepare_browser, OK
+import log_config
+from datetime import datetime
+import asyncio
 import logging
+import threading
+import zlib
 
-# Configure logging for app.py as well
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
-
-# Install Playwright browser at runtime (only if it hasn't been installed by postBuildCommand)
-try:
-    subprocess.run(["playwright", "install", "chromium"], check=True)
-except Exception as e:
-    logging.error(f"Failed to install Playwright at runtime: {e}")
+# Queued console logging from the first import on; the JSON log files start with the app (log_config.py)
+log_config.configure_logging()
 
 # --- IMPORTANT CHANGE HERE: Revert to a writable path for free tier ---
-RUNTIME_CONFIG_FILE = "current_config.json" # This will be in your app's root directory
+RUNTIME_CONFIG_FILE = os.getenv("RUNTIME_CONFIG_FILE", "current_config.json") # This will be in your app's root directory
 # --- END IMPORTANT CHANGE ---
 
-# Ensure the directory for the config file exists (this will create it if using subdirectories,
-# but for root, it just ensures the path is valid)
-os.makedirs(os.path.dirname(RUNTIME_CONFIG_FILE) or '.', exist_ok=True) # Added 'or '.' for root path
+# /check's ETag includes the results' age in steps of this, so clients polling with If-None-Match see it move
+FRESHNESS_ETAG_SECONDS = int(os.getenv("FRESHNESS_ETAG_SECONDS", "60"))
 
 
 DEFAULT_CONFIG = {
     "date": "07/23/2025",
     "start": "08:00 AM",
     "end": "09:00 AM",
-    "is_paused": False # NEW: Add a pause flag, default to False (running)
+    "is_paused": False, # NEW: Add a pause flag, default to False (running)
+    # Every date/window to check in one scraper run. "date"/"start"/"end" above
+    # always mirror the first target for older clients.
+    "targets": [{"date": "07/23/2025", "start": "08:00 AM", "end": "09:00 AM"}]
 }
 
-in_memory_config = DEFAULT_CONFIG.copy()
+_config_store = None
+_config_store_lock = threading.Lock()
 
-# Try to load config from the runtime file (if it exists)
-if os.path.exists(RUNTIME_CONFIG_FILE):
-    try:
-        with open(RUNTIME_CONFIG_FILE, "r") as f:
-            loaded_config = json.load(f)
-            in_memory_config.update(loaded_config)
-            # Ensure 'is_paused' is set if it wasn't in an older config file
-            if "is_paused" not in in_memory_config:
-                in_memory_config["is_paused"] = DEFAULT_CONFIG["is_paused"]
-            logging.info(f"Loaded config from {RUNTIME_CONFIG_FILE}: {in_memory_config}")
-    except json.JSONDecodeError:
-        logging.warning(f"Error decoding JSON from {RUNTIME_CONFIG_FILE}. Using default config.")
-    except Exception as e:
-        logging.error(f"Failed to load runtime config from {RUNTIME_CONFIG_FILE}: {e}. Using default config.")
+
+def get_config_store():
+    """
+    Immutable, versioned config snapshots; reads never lock and every worker
+    sees the same versions. Built on first use, not on import: it opens the
+    shared state backend (see shared_state.py) and reads RUNTIME_CONFIG_FILE.
+    """
+    global _config_store
+    with _config_store_lock:
+        if _config_store is None:
+            _config_store = ConfigStore(RUNTIME_CONFIG_FILE, DEFAULT_CONFIG, backend=get_state_backend(), key=CONFIG_KEY)
+        return _config_store
+
+
+def on_leadership_change(is_leader):
+    if is_leader:
+        scheduler.wake() # Take over scraping now rather than after the standby wait
+        if readiness.state("browser_warmup") != OK:
+            prepare_browser_in_background() # Skipped as a follower, or failed earlier
+    elif hot_watch.running:
+        asyncio.get_running_loop().create_task(hot_watch.stop()) # The new leader's browser takes over
+
+
+# Only the lease holder scrapes (scheduler, manual runs, emails); every worker serves reads
+lease = LeaderLease(on_change=on_leadership_change)
+state_watcher = StateWatcher()
 
 
 app = FastAPI()
 
+
+@app.on_event("startup")
+async def start_logging():
+    log_config.add_file_logging()
+
+
+@app.on_event("startup")
+async def bind_event_loop():
+    # Scraper threads push events onto this loop for the /events streams
+    broadcaster.bind(asyncio.get_running_loop())
+    result_cache.add_listener(publish_check_results)
+    # Job queue workers hand async checks to this loop too
+    bind_loop(asyncio.get_running_loop())
+
+
+@app.on_event("startup")
+async def start_shared_state():
+    # These reach SQLite and the result cache listeners, so they run off the event loop
+    state_watcher.watch(CONFIG_KEY, on_shared_config, in_thread=True)
+    state_watcher.watch(CHECK_PAYLOAD_KEY, on_shared_results, in_thread=True)
+    state_watcher.watch(SCRAPE_REQUEST_KEY, on_scrape_request, in_thread=True)
+    state_watcher.watch(HOT_WATCH_KEY, on_hot_watch_request)
+    result_cache.add_listener(share_check_results)
+    await asyncio.to_thread(get_config_store) # Opens the backend and reads the config file off the loop
+    await state_watcher.start()
+    await lease.start()
+
+
+@app.on_event("startup")
+async def start_scheduler():
+    if SCHEDULER_ENABLED:
+        result_cache.add_listener(wake_scheduler)
+        scheduler.start()
+
+
+async def warm_browser():
+    if CHECK_ENGINE == "async":
+        await get_async_pool().warm()
+    else:
+        await asyncio.to_thread(get_pool().warm)
+
+
+_browser_preparation = None
+
+
+def prepare_browser_in_background():
+    """Start the install check and warm-up on the event loop, unless they're already running."""
+    global _browser_preparation
+    if _browser_preparation is None or _browser_preparation.done():
+        _browser_preparation = asyncio.get_running_loop().create_task(prepare_browser(lambda: lease.is_leader, warm_browser))
+
+
+@app.on_event("startup")
+async def start_browser_preparation():
+    # Chromium install check and warm-up run in the background; the port binds right away
+    # and /check serves stored results meanwhile. /ready reports when checks can run.
+    prepare_browser_in_background()
+
+
+@app.on_event("shutdown")
+def close_browser_pool():
+    # Deliver queued notifications, then close the long-lived Chromium instance owned by the browser pool
+    notifier.flush()
+    get_fetcher().close()
+    shutdown_pool()
+
+
+@app.on_event("shutdown")
+async def close_async_browser_pool():
+    await scheduler.stop()
+    await hot_watch.stop()
+    await shutdown_async_pool()
+    await state_watcher.stop()
+    await lease.stop()
+
+
+@app.on_event("shutdown")
+def close_logging():
+    # Last, so everything the other shutdown hooks log is written out
+    log_config.stop_logging()
+
 # Mount static file directory to serve index.html, style.css, script.js
 # html=True serves index.html if the directory is requested (e.g., /static/)
 app.mount("/static", StaticFiles(directory="static", html=True), name="static")
@@ -63,91 +181,477 @@ app.mount("/static", StaticFiles(directory="static", html=True), name="static")
 def root():
     return {"status": "Tee Time API is live. Access UI at /static/index.html or /static/"}
 
+@app.get("/ready")
+def ready():
+    # Readiness, unlike /: is the browser installed and warmed up so checks can run?
+    status = readiness.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
 @app.get("/set")
 def set_config(date: str = Query(...), start: str = Query(...), end: str = Query(...)):
-    global in_memory_config
-
-    in_memory_config["date"] = date
-    in_memory_config["start"] = start
-    in_memory_config["end"] = end
+    targets = [{"date": date, "start": start, "end": end}]
+    try:
+        parse_targets(targets)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": f"Invalid date/time format: {e}"})
 
     try:
-        with open(RUNTIME_CONFIG_FILE, "w") as f:
-            json.dump(in_memory_config, f)
-        logging.info(f"Runtime config updated and saved to file: {in_memory_config}")
-        return {"message": "Configuration updated successfully", "current_config": in_memory_config}
+        snapshot = get_config_store().update(targets=targets)
     except Exception as e:
-        logging.error(f"Failed to save runtime config to file: {e}")
-        return {"error": f"Configuration updated in memory but failed to save to file: {e}", "current_config": in_memory_config}
+        logging.error(f"Failed to save runtime config: {e}")
+        return {"error": f"Failed to save configuration: {e}", "current_config": get_config_store().current().to_dict()}
+
+    result_cache.invalidate(CONFIG)
+    result_cache.invalidate(CHECK) # /check results depend on the targets
+    logging.info(f"Runtime config updated and saved to file: {snapshot.to_dict()}")
+    return {"message": "Configuration updated successfully", "current_config": snapshot.to_dict()}
+
+
+def cached_json(request, key, build, live=None):
+    """
+    Serve a cached payload with an ETag, or a bodyless 304 if the client already has this version.
+    `live(payload)` returns (payload, tag) with fields that change without an invalidation; the tag goes in the ETag.
+    """
+    etag, payload = result_cache.get(key, build)
+    if live is not None:
+        payload, tag = live(payload)
+        etag = f'{etag[:-1]}-{tag}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=payload, headers=headers)
 
 
 @app.get("/get")
-def get_config():
-    if os.path.exists(RUNTIME_CONFIG_FILE):
+def get_config(request: Request):
+    # config_store's snapshot is the source of truth; the file only persists it across restarts
+    return cached_json(request, CONFIG, lambda: {"current_config": get_config_store().current().to_dict()})
+
+
+class TeeTimeTarget(BaseModel):
+    date: str
+    start: str
+    end: str
+
+
+class TargetsRequest(BaseModel):
+    targets: List[TeeTimeTarget]
+
+
+@app.post("/targets")
+def set_targets(request: TargetsRequest):
+    targets = [target.dict() for target in request.targets]
+    if not targets:
+        return JSONResponse(status_code=400, content={"error": "At least one target is required."})
+    try:
+        parse_targets(targets)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": f"Invalid date/time format: {e}"})
+
+    try:
+        snapshot = get_config_store().update(targets=targets)
+    except Exception as e:
+        logging.error(f"Failed to save runtime config: {e}")
+        return {"error": f"Failed to save targets: {e}", "current_config": get_config_store().current().to_dict()}
+
+    result_cache.invalidate(CONFIG)
+    result_cache.invalidate(CHECK) # /check results depend on the targets
+    logging.info(f"Runtime targets updated and saved to file: {targets}")
+    return {"message": "Targets updated successfully", "current_config": snapshot.to_dict()}
+
+
+@app.get("/targets")
+def get_targets():
+    return {"targets": get_config_store().current().target_dicts()}
+
+
+def build_check_payload():
+    if not lease.is_leader:
+        # The leader publishes every payload it builds, so followers needn't share its slot database
+        _, payload = get_state_backend().get(CHECK_PAYLOAD_KEY)
+        if payload is not None:
+            return payload
+    # After a failed check the results are the last good ones; the status says how old they are
+    return {"results": get_cached_tee_times(get_config_store().current().target_dicts()), **check_status()}
+
+
+def with_freshness(payload):
+    """
+    A cached /check payload plus its staleness as of now, and a tag of those
+    fields for the ETag. The leader reports its breaker live; followers show
+    the one in the leader's last shared payload.
+    """
+    payload = {**payload, **check_freshness(payload, breaker.status() if lease.is_leader else None)}
+    age, breaker_status = payload["age_seconds"], payload["breaker"] or {}
+    retry = breaker_status.get("retry_in_seconds")
+    fingerprint = (payload["stale"], age // FRESHNESS_ETAG_SECONDS if age is not None else None,
+                   breaker_status.get("state"), breaker_status.get("failure_kind"), retry // 60 if retry else None)
+    return payload, format(zlib.crc32(repr(fingerprint).encode()), "x")
+
+
+def share_check_results(key, version):
+    # The leader's results changed (or its config did): hand the new payload to the other workers
+    if key == CHECK and lease.is_leader:
         try:
-            with open(RUNTIME_CONFIG_FILE, "r") as f:
-                current_saved_config = json.load(f)
-                # Ensure 'is_paused' is included in the returned config for clients
-                if "is_paused" not in current_saved_config:
-                    current_saved_config["is_paused"] = DEFAULT_CONFIG["is_paused"]
-                return {"current_config": current_saved_config}
-        # FIX: Corrected indentation for this except block
+            _, payload = result_cache.get(CHECK, build_check_payload)
+            get_state_backend().put(CHECK_PAYLOAD_KEY, payload)
         except Exception as e:
-            logging.error(f"Failed to load runtime config for /get endpoint: {e}")
-            return {"current_config": in_memory_config}
-    else:
-        return {"current_config": in_memory_config}
+            logging.error(f"Failed to share refreshed results: {e}")
+
+
+def on_shared_config(version, config):
+    # /set, /targets or a pause toggle on another worker
+    if get_config_store().adopt(version, config):
+        logging.info(f"Adopted config version {version} from another worker.")
+        result_cache.invalidate(CONFIG)
+        result_cache.invalidate(CHECK)
+
+
+def on_shared_results(version, payload):
+    if not lease.is_leader:
+        result_cache.invalidate(CHECK) # Rebuilt from the shared payload; also pushes it to /events
+
+
+def request_scrape_from_leader(snapshot):
+    get_state_backend().put(SCRAPE_REQUEST_KEY, {
+        "requested_at": datetime.now().isoformat(timespec="seconds"),
+        "by": lease.holder,
+        "config_version": snapshot.version,
+    })
+    logging.info("Not the scraping leader. Asked the leader to run a scrape.")
+    return {"message": "Scrape requested from the scraping leader", "leader": get_state_backend().lease_holder(lease.name)}
+
+
+def on_scrape_request(version, request):
+    # A manual run asked for on a follower
+    snapshot = get_config_store().current()
+    if lease.is_leader and not snapshot.is_paused:
+        logging.info(f"Running a scrape requested by {request.get('by')}.")
+        try:
+            submit_scrape(with_watch_dates(snapshot.target_dicts()))
+        except QueueFull as e:
+            logging.warning(f"Not starting requested scraper run: {e}")
+
+
+def publish_check_results(key, version):
+    # Push the refreshed /check payload to stream subscribers whenever it changes
+    if key == CHECK:
+        try:
+            _, payload = result_cache.get(CHECK, build_check_payload)
+            broadcaster.publish("results", with_freshness(payload)[0])
+        except Exception as e:
+            logging.error(f"Failed to publish refreshed results: {e}")
 
 
 @app.get("/check")
-def check():
+def check(request: Request):
     try:
-        results = get_cached_tee_times()
-        return {"results": results}
+        return cached_json(request, CHECK, build_check_payload, live=with_freshness)
     except Exception as e:
         logging.error(f"Error checking cached results: {e}")
         return {"error": str(e)}
 
+@app.get("/events")
+async def events(request: Request):
+    # Server-Sent Events: "slots" diffs and refreshed "results" as soon as a scrape finishes
+    try:
+        last_event_id = int(request.headers.get("last-event-id", ""))
+    except ValueError:
+        last_event_id = None
+    return StreamingResponse(
+        broadcaster.stream(request, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/slots")
+def get_slots(date: str = Query(...)):
+    # Structured open slots for one date, as of the last scrape that covered it
+    slots = get_store().open_slots(date)
+    return {
+        "date": date,
+        "status": get_store().status(),
+        "slots": [slot.to_dict() for slot in slots],
+    }
+
+@app.get("/slots/history")
+def get_slot_history(date: str = Query(None), limit: int = Query(100, le=1000)):
+    return {"history": get_store().history(date, limit)}
+
+def submit_scrape(targets):
+    """Queue a scraper run for `targets`; identical runs already queued or running are joined. Returns (job, created)."""
+    key = tuple((t["date"], t.get("start"), t.get("end")) for t in targets)
+    return scrape_queue.submit(key, run_scraper, targets=targets)
+
+
+async def scheduled_scrape(targets):
+    """One scheduler run. Returns (changed, error) for the poll policy."""
+    store = get_store()
+    started = datetime.now().isoformat(timespec="seconds")
+    if CHECK_ENGINE == "async":
+        await run_check(targets)
+    else:
+        # Same queue as /run-scraper, so a manual trigger and a scheduled run never overlap
+        job, _ = submit_scrape(targets)
+        await asyncio.to_thread(job.done.wait)
+
+    # Only completed scrapes record a run; anything else (login, missing sheet) counts as a failure
+    status = store.status()
+    error = status is None or status["last_run_at"] < started or bool(status["last_error"])
+    latest_change = store.history(limit=1)
+    changed = bool(latest_change) and latest_change[0]["observed_at"] >= started
+    return changed, error
+
+
+scheduler = Scheduler(
+    # Configured targets plus every other date on a member's watchlist, each scraped once per cycle
+    get_targets=lambda: with_watch_dates(get_config_store().current().target_dicts()),
+    is_paused=lambda: get_config_store().current().is_paused,
+    is_leader=lambda: lease.is_leader,
+    run=scheduled_scrape,
+    # Poll more often in the hours cancellations have historically shown up
+    policy=PollPolicy(activity=lambda now: get_observation_store().activity_factor(now)),
+)
+
+
+def wake_scheduler(key, version):
+    # New targets or an unpause take effect now rather than after the current wait
+    if key == CONFIG:
+        scheduler.wake()
+
+
+@app.get("/scheduler")
+def get_scheduler():
+    return {"scheduler": scheduler.status(), "lease": lease.status()}
+
+@app.get("/metrics")
+def get_metrics():
+    # Prometheus text exposition: per-stage latency histograms, outcome counters and memory gauges
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/stats")
+def get_stats():
+    return {**metrics.summary(), "queue": scrape_queue.stats(), "breaker": breaker.status(),
+            "resource_policy": resource_policy.status(), "logging": log_config.status()}
+
+@app.post("/logging")
+def set_logging(debug: bool = Query(...)):
+    # This worker only; LOG_LEVEL=DEBUG sets it for every worker from the start
+    log_config.set_debug(debug)
+    return {"logging": log_config.status()}
+
 @app.get("/run-scraper")
 def run_scraper_background():
-    global in_memory_config # Ensure we read the latest state
-
-    if in_memory_config.get("is_paused", False): # Check the pause flag
+    # One snapshot for the whole request; the job keeps its own copy of the targets
+    snapshot = get_config_store().current()
+    if snapshot.is_paused: # Check the pause flag
         logging.info("Scraper is currently paused. Not starting a new run.")
         return {"message": "Scraper is currently paused."}
 
-    current_date = in_memory_config["date"]
-    current_start = in_memory_config["start"]
-    current_end = in_memory_config["end"]
+    if not lease.is_leader:
+        return request_scrape_from_leader(snapshot)
 
-    logging.info(f"Triggered scraper run with config: Date={current_date}, Start={current_start}, End={current_end}")
+    targets = with_watch_dates(snapshot.target_dicts())
 
-    def scraper_thread():
-        run_scraper(current_date, current_start, current_end)
+    logging.info(f"Triggered scraper run with config version {snapshot.version}, targets: {targets}")
 
-    threading.Thread(target=scraper_thread).start()
-    return {"message": "Scraper started in background"}
+    try:
+        job, created = submit_scrape(targets)
+    except QueueFull as e:
+        logging.warning(f"Not starting scraper run: {e}")
+        return JSONResponse(status_code=429, content={"error": str(e), "queue": scrape_queue.stats()})
+
+    if not created:
+        return {"message": "An identical scraper run is already queued or running", "job_id": job.id, "status": job.status}
+    return {"message": "Scraper started in background", "job_id": job.id, "status": job.status}
+
+@app.get("/check-now")
+async def check_now():
+    # Runs on the event loop: concurrent pages in one browser, no worker thread held for the check
+    snapshot = get_config_store().current()
+    if snapshot.is_paused:
+        return {"message": "Scraper is currently paused."}
+    if not lease.is_leader:
+        return await asyncio.to_thread(request_scrape_from_leader, snapshot)
+    results = await run_check(snapshot.target_dicts())
+    return {"results": results}
+
+class WatchRequest(BaseModel):
+    user: str
+    date: str
+    start: str
+    end: str
+    notify: str # Email address for this watch's alerts
+    min_open: int = 1
+    courses: List[str] = [] # Empty watches every course
+
+
+@app.post("/watches")
+def create_watch(request: WatchRequest):
+    # Scraped from the next scheduler cycle on; a date someone already watches costs nothing extra
+    try:
+        watch = get_watch_store().create(**request.dict())
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    return {"watch": watch.to_dict()}
+
+@app.get("/watches")
+def list_watches(user: Optional[str] = Query(None)):
+    return {"watches": [watch.to_dict() for watch in get_watch_store().list(user)]}
+
+@app.get("/watches/{watch_id}")
+def get_watch(watch_id: str):
+    watch = get_watch_store().get(watch_id)
+    if watch is None:
+        return JSONResponse(status_code=404, content={"error": f"Watch {watch_id} not found"})
+    # Open times matching the watch as of the last scrape of its date
+    slots = get_store().open_slots(watch.date, parse_time(watch.start), parse_time(watch.end))
+    return {"watch": watch.to_dict(), "slots": [slot.to_dict() for slot in slots if watch.accepts(slot)]}
+
+@app.delete("/watches/{watch_id}")
+def delete_watch(watch_id: str, user: Optional[str] = Query(None)):
+    if not get_watch_store().delete(watch_id, user):
+        return JSONResponse(status_code=404, content={"error": f"Watch {watch_id} not found"})
+    return {"message": f"Watch {watch_id} deleted"}
+
+class HotWatchRequest(BaseModel):
+    date: str
+    start: Optional[str] = None # Without a window, the configured ones for the date (or every time)
+    end: Optional[str] = None
+    minutes: Optional[float] = None
+    interval_seconds: Optional[float] = None
+
+
+def hot_watch_targets(date, start=None, end=None):
+    if start and end:
+        return [{"date": date, "start": start, "end": end}]
+    return [t for t in get_config_store().current().target_dicts() if t["date"] == date] or [{"date": date}]
+
+
+def on_hot_watch_request(version, request):
+    # A hot watch started or stopped on a follower
+    if not lease.is_leader:
+        return
+    if request.get("action") == "stop":
+        asyncio.get_running_loop().create_task(hot_watch.stop())
+        return
+    try:
+        hot_watch.start(hot_watch_targets(request["date"], request.get("start"), request.get("end")),
+                        request.get("minutes"), request.get("interval_seconds"))
+    except (ValueError, HotWatchBusy) as e:
+        logging.warning(f"Not starting requested hot watch: {e}")
+
+
+@app.post("/hot-watch")
+async def start_hot_watch(request: HotWatchRequest):
+    if not lease.is_leader:
+        await asyncio.to_thread(get_state_backend().put, HOT_WATCH_KEY, {"action": "start", "by": lease.holder, **request.dict()})
+        return {"message": "Hot watch requested from the scraping leader", "leader": get_state_backend().lease_holder(lease.name)}
+    try:
+        status = hot_watch.start(hot_watch_targets(request.date, request.start, request.end),
+                                 request.minutes, request.interval_seconds)
+    except HotWatchBusy as e:
+        return JSONResponse(status_code=409, content={"error": str(e), "hot_watch": hot_watch.status()})
+    except (KeyError, ValueError) as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    return {"hot_watch": status}
+
+@app.get("/hot-watch")
+def get_hot_watch():
+    return {"hot_watch": hot_watch.status(), "lease": lease.status()}
+
+@app.delete("/hot-watch")
+async def stop_hot_watch():
+    if not lease.is_leader:
+        await asyncio.to_thread(get_state_backend().put, HOT_WATCH_KEY, {"action": "stop", "by": lease.holder})
+        return {"message": "Stop requested from the scraping leader"}
+    if not hot_watch.running:
+        return {"message": "No hot watch is running", "hot_watch": hot_watch.status()}
+    await hot_watch.stop()
+    return {"message": "Hot watch stopped", "hot_watch": hot_watch.status()}
+
+def _weekday(name):
+    if name is None:
+        return None
+    matches = [i for i, day in enumerate(WEEKDAYS) if day.lower() == name[:3].lower()]
+    if not matches:
+        raise ValueError(f"Unknown weekday '{name}'")
+    return matches[0]
+
+
+@app.get("/history/availability")
+def get_availability(weekday: Optional[str] = Query(None), course: Optional[str] = Query(None),
+                     start: Optional[str] = Query(None), end: Optional[str] = Query(None)):
+    # e.g. ?weekday=Sat&start=8:00 AM&end=8:30 AM&course=Highlands: how often open, and how far ahead it opens up
+    try:
+        start_time, end_time = (parse_time(t) if t else None for t in (start, end))
+        if (start and start_time is None) or (end and end_time is None):
+            raise ValueError("Times must look like '8:00 AM'")
+        rows = get_observation_store().availability(
+            _weekday(weekday), course,
+            start_time.hour * 60 + start_time.minute if start_time else None,
+            end_time.hour * 60 + end_time.minute if end_time else None)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    return {"availability": rows}
+
+@app.get("/history/opening-hours")
+def get_opening_hours():
+    # Openings per hour watched, by weekday and hour; the scheduler polls more often in the busy ones
+    return {"opening_hours": get_observation_store().opening_hours()}
+
+@app.get("/history/summary")
+def get_history_summary():
+    return get_observation_store().summary()
+
+@app.get("/jobs")
+def list_jobs():
+    return {"queue": scrape_queue.stats(), "jobs": scrape_queue.list()}
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = scrape_queue.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": f"Job {job_id} not found"})
+    return {"job": job}
+
+@app.get("/artifacts")
+def list_artifacts():
+    return {"mode": artifact_store.mode, "runs": artifact_store.list_runs()}
+
+@app.get("/artifacts/latest-failure")
+def latest_failure_artifacts():
+    run = artifact_store.latest_failed_run()
+    if run is None:
+        return JSONResponse(status_code=404, content={"error": "No failed run with debug artifacts found."})
+    run["urls"] = [f"/artifacts/{run['run_id']}/{item['name']}" for item in run["files"]]
+    return {"run": run}
+
+@app.get("/artifacts/{run_id}/{name}")
+def get_artifact(run_id: str, name: str):
+    path = artifact_store.artifact_path(run_id, name)
+    if path is None:
+        return JSONResponse(status_code=404, content={"error": f"Artifact {run_id}/{name} not found"})
+    return FileResponse(path)
 
 # NEW: Endpoint to toggle the scraper pause state
 @app.get("/toggle-scraper-pause")
 def toggle_scraper_pause():
-    global in_memory_config
-    
-    current_state = in_memory_config.get("is_paused", False)
-    new_state = not current_state
-    in_memory_config["is_paused"] = new_state
-
     try:
-        with open(RUNTIME_CONFIG_FILE, "w") as f:
-            json.dump(in_memory_config, f)
-        logging.info(f"Scraper pause state toggled to {new_state} and saved to file: {in_memory_config}")
-        status_message = "paused" if new_state else "resumed"
-        return {"message": f"Scraper has been {status_message}.", "is_paused": new_state, "current_config": in_memory_config}
+        snapshot = get_config_store().toggle_pause()
     except Exception as e:
-        logging.error(f"Failed to save pause state to file: {e}")
-        return {"error": f"Failed to save pause state: {e}", "is_paused": new_state, "current_config": in_memory_config}
+        logging.error(f"Failed to save pause state: {e}")
+        current = get_config_store().current()
+        return {"error": f"Failed to save pause state: {e}", "is_paused": current.is_paused, "current_config": current.to_dict()}
+
+    result_cache.invalidate(CONFIG)
+    logging.info(f"Scraper pause state toggled to {snapshot.is_paused} and saved to file: {snapshot.to_dict()}")
+    status_message = "paused" if snapshot.is_paused else "resumed"
+    return {"message": f"Scraper has been {status_message}.", "is_paused": snapshot.is_paused, "current_config": snapshot.to_dict()}
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("app:app", host="0.0.0.0", port=8000, reload=True)
+    # Several workers share config and results through shared_state; one of them scrapes
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    uvicorn.run("app:app", host="0.0.0.0", port=8000, reload=workers == 1, workers=workers)
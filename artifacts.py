@@ -0,0 +1,178 @@
+import os
+import re
+import json
+import queue
+import shutil
+import logging
+import threading
+from datetime import datetime
+from persistence import atomic_write_json
+
+# CONFIG
+# "off": never capture. "on-error": only capture when a check fails.
+# "full": capture at every step (the old behaviour, for debugging the flow).
+ARTIFACT_MODE = os.getenv("ARTIFACT_MODE", "on-error")
+ARTIFACT_DIR = "screenshots" # One sub-directory per check run
+ARTIFACT_MAX_RUNS = int(os.getenv("ARTIFACT_MAX_RUNS", "20"))
+ARTIFACT_MAX_BYTES = int(os.getenv("ARTIFACT_MAX_BYTES", str(50 * 1024 * 1024)))
+RUN_MANIFEST = "run.json"
+
+MODES = ("off", "on-error", "full")
+
+RUN_ID_FORMAT = "%Y%m%d_%H%M%S_%f"
+# What begin_run() produces and what the writer names files; anything else in a URL is refused
+RUN_ID_PATTERN = re.compile(r"\d{8}_\d{6}_\d{6}")
+NAME_PATTERN = re.compile(r"[\w-][\w.-]*")
+
+
+class ArtifactStore:
+    """
+    Debug screenshots/HTML for check runs, written by a background thread.
+
+    The scrape only pays for grabbing the bytes from the page; writing them
+    to disk, the run manifest and retention pruning happen off the hot path.
+    """
+
+    def __init__(self, mode=ARTIFACT_MODE, root=ARTIFACT_DIR, max_runs=ARTIFACT_MAX_RUNS, max_bytes=ARTIFACT_MAX_BYTES):
+        if mode not in MODES:
+            logging.warning(f"Unknown ARTIFACT_MODE '{mode}'. Using 'on-error'.")
+            mode = "on-error"
+        self.mode = mode
+        self.root = root
+        self.max_runs = max_runs
+        self.max_bytes = max_bytes
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def begin_run(self):
+        return datetime.now().strftime(RUN_ID_FORMAT)
+
+    def wants(self, error=False):
+        return self.mode == "full" or (self.mode == "on-error" and error)
+
+    def capture(self, page, run_id, name, error=False):
+        """Screenshot `page` (plus its HTML on errors) if the mode asks for it."""
+        if not self.wants(error):
+            return
+        try:
+            self.save(run_id, f"{name}.png", page.screenshot())
+            if error:
+                self.save(run_id, f"{name}.html", page.content().encode("utf-8"))
+        except Exception as e:
+            logging.error(f"Failed to capture debug artifact '{name}': {e}")
+
+    def save(self, run_id, name, data):
+        """Queue bytes already grabbed by the caller (e.g. from an async page) for writing."""
+        self._put(run_id, name, data)
+
+    def finish_run(self, run_id, error=None):
+        """Record how the run ended. Only runs that produced artifacts get a directory."""
+        self._put(run_id, RUN_MANIFEST, None, {"error": error})
+
+    # --- Read side (API) ---
+
+    def list_runs(self):
+        runs = []
+        if not os.path.isdir(self.root):
+            return runs
+        for run_id in sorted(os.listdir(self.root), reverse=True):
+            manifest = self._read_manifest(run_id)
+            if manifest is not None:
+                runs.append(manifest)
+        return runs
+
+    def latest_failed_run(self):
+        for run in self.list_runs():
+            if run.get("failed"):
+                return run
+        return None
+
+    def artifact_path(self, run_id, name):
+        """Resolve an artifact file, refusing anything outside the run's directory."""
+        if not RUN_ID_PATTERN.fullmatch(run_id) or not NAME_PATTERN.fullmatch(name):
+            return None
+        root = os.path.realpath(self.root)
+        run_dir = os.path.join(root, run_id)
+        path = os.path.realpath(os.path.join(run_dir, name))
+        # Also catches a symlink inside the run directory pointing elsewhere
+        if os.path.dirname(path) != run_dir or os.path.commonpath([root, path]) != root or not os.path.isfile(path):
+            return None
+        return path
+
+    def _read_manifest(self, run_id):
+        path = os.path.join(self.root, run_id, RUN_MANIFEST)
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    # --- Writer thread ---
+
+    def _put(self, run_id, name, data, manifest=None):
+        self._ensure_writer()
+        self._queue.put((run_id, name, data, manifest))
+
+    def _ensure_writer(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._write_loop, name="artifact-writer", daemon=True)
+                self._thread.start()
+
+    def _write_loop(self):
+        while True:
+            run_id, name, data, manifest = self._queue.get()
+            try:
+                if manifest is not None:
+                    self._write_manifest(run_id, manifest)
+                else:
+                    run_dir = os.path.join(self.root, run_id)
+                    os.makedirs(run_dir, exist_ok=True)
+                    with open(os.path.join(run_dir, name), "wb") as f:
+                        f.write(data)
+                    logging.info(f"Debug artifact saved: {os.path.join(run_dir, name)}")
+            except Exception as e:
+                logging.error(f"Failed to write debug artifact '{name}' for run {run_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _write_manifest(self, run_id, manifest):
+        run_dir = os.path.join(self.root, run_id)
+        if not os.path.isdir(run_dir):
+            return # Nothing was captured for this run
+
+        files = sorted(
+            ({"name": name, "bytes": os.path.getsize(os.path.join(run_dir, name))}
+             for name in os.listdir(run_dir) if name != RUN_MANIFEST),
+            key=lambda item: item["name"],
+        )
+        # /artifacts reads manifests while the writer thread is finishing runs
+        atomic_write_json(os.path.join(run_dir, RUN_MANIFEST), {
+            "run_id": run_id,
+            "failed": manifest["error"] is not None,
+            "error": manifest["error"],
+            "finished_at": datetime.now().isoformat(),
+            "files": files,
+        })
+        self._prune()
+
+    def _prune(self):
+        runs = []
+        for run_id in sorted(os.listdir(self.root)):
+            run_dir = os.path.join(self.root, run_id)
+            if not os.path.isdir(run_dir):
+                continue
+            size = sum(os.path.getsize(os.path.join(run_dir, name)) for name in os.listdir(run_dir))
+            runs.append((run_id, size))
+
+        total = sum(size for _, size in runs)
+        # Oldest first; always keep the newest run even if it alone is over the byte budget
+        while len(runs) > 1 and (len(runs) > self.max_runs or total > self.max_bytes):
+            run_id, size = runs.pop(0)
+            shutil.rmtree(os.path.join(self.root, run_id), ignore_errors=True)
+            total -= size
+            logging.info(f"Pruned debug artifacts for run {run_id} ({size} bytes).")
+
+
+artifact_store = ArtifactStore()
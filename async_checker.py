@@ -0,0 +1,420 @@
+import os
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+from browser_pool import (
+    LoginError, check_response, ensure_browser_installed, USERNAME, PASSWORD, LOGIN_URL, MEMBER_CENTRAL_URL, TEE_SHEET_URL, STORAGE_STATE_FILE,
+    BROWSER_ARGS, BROWSER_IDLE_SECONDS, PAGE_TIMEOUT_MS, STEP_TIMEOUT_MS, NAV_TIMEOUT_MS, AUTH_TIMEOUT_MS,
+    LAYOUT_TIMEOUT_MS, SHEET_IFRAME_SELECTOR,
+)
+from checker import (
+    check_targets, parse_targets, describe_targets, parse_sheet_rows, publish_results, record_check_failure, step, log_timings,
+    ROWS_SELECTOR, FRESH_ROWS_SELECTOR, MARK_ROWS_STALE_JS, SELECTED_OPTION_JS, SHEET_HTML_JS,
+)
+from sheet_fetch import FETCH_MODE, ALL_COURSES
+from artifacts import artifact_store
+from metrics import metrics, record_page_memory
+from failures import breaker, classify, LayoutChanged, AUTH
+from persistence import atomic_write_json
+from resource_policy import resource_policy
+from log_config import log_context
+from startup import browser_worked
+import replay
+
+# CONFIG
+# Dates checked at the same time, each on its own page in the one shared browser
+MAX_CONCURRENT_PAGES = int(os.getenv("CHECK_CONCURRENCY", "3"))
+
+
+class AsyncBrowserPool:
+    """
+    Chromium browser + logged-in context driven from the app's event loop.
+
+    Every check gets its own page from `page()`; a semaphore caps how many
+    are open at once. When several pages find the session expired they log
+    in one at a time: the first one logs in and bumps `_session`, the others
+    see the new session and only reload the tee sheet.
+    """
+
+    def __init__(self, storage_state_file=STORAGE_STATE_FILE, max_pages=MAX_CONCURRENT_PAGES, idle_seconds=BROWSER_IDLE_SECONDS):
+        self.storage_state_file = storage_state_file
+        self.idle_seconds = idle_seconds
+        self._pages = asyncio.Semaphore(max_pages)
+        self._start_lock = asyncio.Lock()
+        self._login_lock = asyncio.Lock()
+        self._session = 0
+        self._active = 0
+        self._idle_task = None
+        self._playwright = None
+        self._browser = None
+        self._context = None
+
+    @asynccontextmanager
+    async def page(self):
+        async with self._pages:
+            # Count the page before launching so the idle timer can't close the browser under it
+            self._active += 1
+            self._cancel_idle_close()
+            try:
+                context = await self._ensure_context()
+                page = await context.new_page()
+                page.set_default_timeout(PAGE_TIMEOUT_MS)
+                try:
+                    yield page
+                finally:
+                    try:
+                        await page.close()
+                    except Exception as e:
+                        logging.warning(f"Failed to close page: {e}")
+            finally:
+                self._active -= 1
+                if self._active == 0:
+                    self._schedule_idle_close()
+
+    async def warm(self):
+        """Launch the browser and open the saved session now, so the first check doesn't pay for it."""
+        async with self.page():
+            pass
+
+    async def shutdown(self):
+        self._cancel_idle_close()
+        async with self._start_lock:
+            await self._close_browser()
+            if self._playwright:
+                await self._playwright.stop()
+                self._playwright = None
+
+    async def _ensure_context(self):
+        async with self._start_lock:
+            if self._browser and not self._browser.is_connected():
+                logging.warning("⚠️ Browser disconnected. Relaunching.")
+                self._browser = None
+                self._context = None
+
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+
+            if not self._browser:
+                await asyncio.to_thread(ensure_browser_installed, self._playwright.chromium.executable_path)
+                logging.info("🚀 Launching async Chromium browser.")
+                with metrics.span("browser_launch"):
+                    self._browser = await self._playwright.chromium.launch(headless=True, args=BROWSER_ARGS)
+                self._context = None
+
+            if not self._context:
+                storage_state = self.storage_state_file if os.path.exists(self.storage_state_file) else None
+                if storage_state:
+                    logging.info(f"Reusing saved session from {self.storage_state_file}.")
+                self._context = await self._browser.new_context(
+                    storage_state=storage_state, **replay.context_options(), **resource_policy.context_options())
+                if replay.REPLAY_URL:
+                    await replay.install_replay_async(self._context)
+                await resource_policy.install_async(self._context, "async") # After replay, so it gets each request first
+
+            return self._context
+
+    async def _close_browser(self):
+        if self._browser:
+            try:
+                if self._context:
+                    await self._context.close()
+                await self._browser.close()
+                logging.info("Browser closed.")
+            except Exception as e:
+                logging.warning(f"Failed to close browser cleanly: {e}")
+        self._browser = None
+        self._context = None
+
+    def _schedule_idle_close(self):
+        if self.idle_seconds:
+            self._idle_task = asyncio.get_running_loop().create_task(self._close_when_idle())
+
+    def _cancel_idle_close(self):
+        if self._idle_task:
+            self._idle_task.cancel()
+            self._idle_task = None
+
+    async def close_if_idle(self):
+        """Close the browser now rather than after idle_seconds, unless a page is still open."""
+        async with self._start_lock:
+            if self._active == 0 and self._browser:
+                self._cancel_idle_close()
+                await self._close_browser()
+
+    async def _close_when_idle(self):
+        await asyncio.sleep(self.idle_seconds)
+        async with self._start_lock:
+            if self._active == 0 and self._browser:
+                logging.info(f"Browser idle for {self.idle_seconds}s. Closing it until the next check.")
+                await self._close_browser()
+
+    # --- Session handling ---
+
+    async def needs_login(self, page):
+        if page.url.startswith(LOGIN_URL):
+            return True
+        return await page.locator("#lgUserName").count() > 0
+
+    async def login(self, page):
+        logging.info(f"Navigating to login page: {LOGIN_URL}")
+        check_response(await page.goto(LOGIN_URL, wait_until="domcontentloaded", timeout=NAV_TIMEOUT_MS), LOGIN_URL)
+
+        try:
+            with metrics.span("login"):
+                await page.wait_for_selector("#lgUserName", state='visible', timeout=AUTH_TIMEOUT_MS)
+                await page.fill("#lgUserName", USERNAME)
+                await page.fill("#lgPassword", PASSWORD)
+                await page.click("#lgLoginButton")
+                await page.wait_for_url(lambda url: url != LOGIN_URL, wait_until="domcontentloaded", timeout=AUTH_TIMEOUT_MS)
+            logging.info("✅ Initial login successful and redirected.")
+        except Exception as e:
+            logging.error(f"❌ Failed initial login using 'lgUserName' strategy: {e}")
+            raise LoginError(f"Initial login failed: {e}") from e
+
+        member_area_button_selector = "button:has-text('ENTER MEMBER AREA')"
+        if await page.locator(member_area_button_selector).is_visible():
+            logging.info("✅ 'ENTER MEMBER AREA' button found after initial login. Clicking to proceed.")
+            with metrics.span("member_area_bypass"):
+                async with page.expect_navigation(wait_until="domcontentloaded", timeout=NAV_TIMEOUT_MS):
+                    await page.click(member_area_button_selector, timeout=LAYOUT_TIMEOUT_MS)
+                logging.info("➡️ Navigating to Member Central page after bypass.")
+                check_response(await page.goto(MEMBER_CENTRAL_URL, wait_until="domcontentloaded", timeout=NAV_TIMEOUT_MS), MEMBER_CENTRAL_URL)
+
+        try:
+            # Shared with the sync browser pool, so either one benefits from the other's login
+            atomic_write_json(self.storage_state_file, await page.context.storage_state())
+            logging.info(f"Saved session state to {self.storage_state_file}.")
+        except Exception as e:
+            logging.warning(f"Failed to save session state: {e}")
+
+    async def _goto_tee_sheet(self, page):
+        logging.info(f"➡️ Navigating to tee sheet page: {TEE_SHEET_URL}")
+        check_response(await page.goto(TEE_SHEET_URL, wait_until="domcontentloaded", timeout=NAV_TIMEOUT_MS), TEE_SHEET_URL)
+        await wait_for_layout(page, f"{SHEET_IFRAME_SELECTOR}, #lgUserName", "Tee sheet iframe or login form", state="attached")
+
+    async def open_tee_sheet(self, page):
+        """Navigate to the tee sheet, logging in first only if no other page already has."""
+        session = self._session
+        await self._goto_tee_sheet(page)
+
+        if await self.needs_login(page):
+            async with self._login_lock:
+                if self._session == session:
+                    logging.info("🔑 Session missing or expired. Logging in.")
+                    await self.login(page)
+                    self._session += 1
+                else:
+                    logging.info("🔑 Another page already logged in. Reloading the tee sheet.")
+            await self._goto_tee_sheet(page)
+        else:
+            logging.info("✅ Saved session still valid. Skipping login.")
+
+
+async def wait_for_layout(frame, selector, what, **kwargs):
+    """Async browser_pool.wait_for_layout: a missing always-there element means the site changed."""
+    try:
+        return await frame.wait_for_selector(selector, timeout=LAYOUT_TIMEOUT_MS, **kwargs)
+    except PlaywrightTimeoutError as e:
+        raise LayoutChanged(f"{what} ({selector}) not found within {LAYOUT_TIMEOUT_MS / 1000:.0f}s") from e
+
+
+async def take_screenshot(page, run_id, name, error=False):
+    if not artifact_store.wants(error):
+        return
+    try:
+        artifact_store.save(run_id, f"{name}.png", await page.screenshot())
+        if error:
+            artifact_store.save(run_id, f"{name}.html", (await page.content()).encode("utf-8"))
+    except Exception as e:
+        logging.error(f"Failed to capture debug artifact '{name}': {e}")
+
+
+async def _open_sheet_iframe(page, run_id):
+    iframe_handle = await wait_for_layout(page, SHEET_IFRAME_SELECTOR, "ForeTees iframe", state="attached")
+    iframe = await iframe_handle.content_frame()
+    await iframe.wait_for_load_state("domcontentloaded", timeout=NAV_TIMEOUT_MS)
+    await wait_for_layout(iframe, "#member_select_calendar1", "Tee sheet calendar")
+    await take_screenshot(page, run_id, "after_iframe_calendar_ready")
+    return iframe
+
+
+async def _select_date(page, iframe, date_str, check_day, timings, run_id):
+    # Same steps as checker._select_date; see there for why each wait is what it is
+    with step(timings, "date_click"):
+        current_day = iframe.locator("td.ui-datepicker-current-day a")
+        already_selected = await current_day.count() > 0 and (await current_day.first.inner_text()).strip() == check_day
+        has_rows = await iframe.locator(ROWS_SELECTOR).count() > 0
+
+        if already_selected and has_rows:
+            logging.info(f"📆 {date_str} (Day: {check_day}) is already selected. Skipping the date click.")
+        else:
+            await iframe.evaluate(MARK_ROWS_STALE_JS)
+            logging.info(f"📆 Clicking on target date: {date_str} (Day: {check_day})")
+            try:
+                await iframe.locator(f"td a:has-text('{check_day}')").first.click(timeout=STEP_TIMEOUT_MS)
+            except Exception as click_e:
+                logging.warning(f"Could not click date '{check_day}' directly: {click_e}. Trying alternative.")
+                await iframe.locator(f"//td[contains(@class, 'ui-datepicker-week-end') or contains(@class, 'ui-datepicker-unselectable') or contains(@class, 'ui-datepicker-current-day')]//a[text()='{check_day}']").click(timeout=STEP_TIMEOUT_MS)
+            await iframe.wait_for_selector(FRESH_ROWS_SELECTOR, state="attached", timeout=STEP_TIMEOUT_MS)
+            await take_screenshot(page, run_id, f"after_date_selection_{check_day}")
+
+    with step(timings, "course_select"):
+        course_select = iframe.locator(f"select:has(option:text-is('{ALL_COURSES}'))").first
+        if await course_select.count() == 0:
+            logging.warning(f"❌ '{ALL_COURSES}' course option not found on the tee sheet for {date_str}.")
+            await take_screenshot(page, run_id, f"course_all_not_found_{check_day}", error=True)
+        elif await course_select.evaluate(SELECTED_OPTION_JS) != ALL_COURSES:
+            await iframe.evaluate(MARK_ROWS_STALE_JS)
+            await course_select.select_option(label=ALL_COURSES)
+            await iframe.wait_for_selector(FRESH_ROWS_SELECTOR, state="attached", timeout=STEP_TIMEOUT_MS)
+
+    with step(timings, "row_wait"):
+        await iframe.wait_for_selector(ROWS_SELECTOR, state='visible', timeout=STEP_TIMEOUT_MS)
+
+
+async def _scrape_date(pool, date_str, check_day, timings, run_id):
+    """Check one date on its own page and return its TeeSlots."""
+    async with pool.page() as page:
+        try:
+            with step(timings, "tee_sheet_navigation"):
+                await pool.open_tee_sheet(page)
+            with step(timings, "iframe_load"):
+                iframe = await _open_sheet_iframe(page, run_id)
+            await _select_date(page, iframe, date_str, check_day, timings, run_id)
+            with step(timings, "parse"):
+                html = await iframe.locator("div.member_sheet_table").first.evaluate(SHEET_HTML_JS)
+                # Parsing is CPU work; keep it off the event loop
+                slots = await asyncio.to_thread(parse_sheet_rows, html)
+            await asyncio.to_thread(replay.save_sheet, date_str, html)
+            if slots is None:
+                raise LayoutChanged("No tee sheet table found.")
+            await _sample_page_memory(page)
+            return slots
+        except Exception as e:
+            await take_screenshot(page, run_id, f"error_{classify(e)}_{check_day}", error=True)
+            raise
+
+
+async def _sample_page_memory(page):
+    try:
+        session = await page.context.new_cdp_session(page)
+        await session.send("Performance.enable")
+        record_page_memory(await session.send("Performance.getMetrics"))
+        await session.detach()
+    except Exception as e:
+        logging.debug(f"Could not sample browser memory: {e}")
+
+
+async def check_targets_async(targets):
+    """
+    Async counterpart of checker.check_targets for the app's event loop.
+
+    Each date is checked on its own page, up to MAX_CONCURRENT_PAGES at once,
+    and the results are stored, diffed and published exactly like a sync run.
+    """
+    if FETCH_MODE == "http":
+        # The HTTP fetcher is synchronous and already cheap; just keep it off the loop
+        return await asyncio.to_thread(check_targets, targets)
+
+    logging.info(f"Starting async check for {len(targets)} target(s): " + describe_targets(targets))
+
+    if not USERNAME or not PASSWORD:
+        error_msg = "Prestonwood login credentials (PRESTONWOOD_USERNAME, PRESTONWOOD_PASSWORD) not set as environment variables."
+        logging.error(error_msg)
+        return [error_msg]
+
+    if not targets:
+        return ["Error: No dates configured to check."]
+
+    try:
+        targets_by_date = parse_targets(targets)
+    except (KeyError, ValueError) as e:
+        logging.error(f"Configuration parsing error: {e}. Please check date/time formats.")
+        return [f"Error: Invalid date/time format in config: {e}"]
+
+    allowed, reason = await asyncio.to_thread(breaker.allow)
+    if not allowed:
+        logging.warning(f"⛔ Skipping check: {reason}")
+        return [f"Skipped: {reason}"]
+
+    # One list per page: the pages run at the same time, so their steps overlap and mustn't be summed together
+    timings = {date_str: [] for date_str in targets_by_date}
+    run_id = await asyncio.to_thread(artifact_store.begin_run)
+    with log_context(run_id=run_id), breaker.guard(): # The run_id is inherited by every page's task and worker thread
+        pool = get_async_pool()
+        savings = resource_policy.begin("async")
+        started = time.perf_counter()
+        try:
+            # Let every page finish (and close) before reporting the first failure
+            results = await asyncio.gather(
+                *(_scrape_date(pool, date_str, check_day, timings[date_str], run_id) for date_str, (check_day, _) in targets_by_date.items()),
+                return_exceptions=True,
+            )
+            errors = [r for r in results if isinstance(r, BaseException)]
+            if errors:
+                # A rejected login explains every other page's failure too
+                raise next((e for e in errors if classify(e) == AUTH), errors[0])
+        except Exception as e:
+            return await asyncio.to_thread(record_check_failure, run_id, e, time.perf_counter() - started)
+        finally:
+            for date_str, date_timings in timings.items():
+                log_timings(date_timings, date_str)
+            resource_policy.log_savings(savings)
+
+        artifact_store.finish_run(run_id)
+        # SQLite writes and listener callbacks run on a worker thread, not the loop
+        found = await asyncio.to_thread(publish_results, targets_by_date, dict(zip(targets_by_date, results)))
+        await asyncio.to_thread(breaker.record_success)
+        browser_worked()
+        metrics.observe("check", time.perf_counter() - started)
+        return found
+
+
+_inflight = {}
+
+
+async def run_check(targets):
+    """Run (or join an identical, already running) async check for `targets`."""
+    key = tuple((t["date"], t.get("start"), t.get("end")) for t in targets)
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(check_targets_async(targets))
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    # One caller going away mustn't cancel the check for the others
+    return await asyncio.shield(task)
+
+
+_loop = None
+_pool = None
+
+
+def bind_loop(loop):
+    """Remember the app's event loop so worker threads can hand checks to it."""
+    global _loop
+    _loop = loop
+
+
+def run_check_threadsafe(targets, timeout=None):
+    """Run an async check on the app's loop from a worker thread (e.g. the job queue)."""
+    if _loop is None or _loop.is_closed():
+        logging.warning("No event loop bound for async checks. Using the sync checker.")
+        return check_targets(targets)
+    return asyncio.run_coroutine_threadsafe(run_check(targets), _loop).result(timeout)
+
+
+def get_async_pool():
+    # Only used from the event loop, so no lock is needed
+    global _pool
+    if _pool is None:
+        _pool = AsyncBrowserPool()
+    return _pool
+
+
+async def shutdown_async_pool():
+    global _pool
+    if _pool is not None:
+        await _pool.shutdown()
+        _pool = None
@@ -0,0 +1,352 @@
+"""
+Load test of the HTTP API with latency budgets, with scrapes running behind it.
+
+    python benchmarks/bench_api.py
+    python benchmarks/bench_api.py --concurrency 1,8,32 --seconds 10 --budget /check=50 --budget /set=150
+
+The app runs in-process under uvicorn on a local port, from a throwaway
+directory (config file, databases, logs). The checker is stubbed: a
+"scrape" waits --scrape-ms, as if for the browser, then parses a freshly
+generated synthetic sheet and publishes it like a real check does, so the
+slot store, result cache and /events all churn. Unless --no-background-scrapes
+is given, one is always running.
+
+At each concurrency level, that many clients send a weighted mix of /check,
+/get, /set, /run-scraper and /toggle-scraper-pause for --seconds. Each
+client keeps its own connection and sends If-None-Match like the UI does.
+Every response is checked:
+
+- error: a connection failure, an unexpected status or a body that isn't JSON
+- torn: a config whose fields don't belong together (date, start and end
+  mirror targets[0], and each /set writes a matching triple), a /set that
+  doesn't echo what it wrote, or a pause flag that disagrees with the config
+  next to it
+
+A 429 from /run-scraper is the queue pushing back, so it's counted but isn't
+an error. The run fails (exit 1) on any error or torn read, or if an
+endpoint's p99 goes over its budget at any level.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import argparse
+import tempfile
+import threading
+import http.client
+import statistics
+from datetime import datetime, date, timedelta
+from urllib.parse import urlencode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_parser import make_sheet_html  # noqa: E402
+
+# Requests per 100, roughly what the UI and a few scripted clients send
+MIX = {"/check": 55, "/get": 25, "/set": 10, "/run-scraper": 8, "/toggle-scraper-pause": 2}
+# p99 budgets in ms; override with --budget
+BUDGETS = {"/check": 100, "/get": 100, "/set": 250, "/run-scraper": 250, "/toggle-scraper-pause": 250}
+TOTAL = "all"
+
+# /set writes the date N days after this, with start and end derived from N, so a reader can spot a mixed-up config
+BASE_DATE = date(2030, 1, 1)
+
+
+def config_for(n):
+    hour = n % 12 + 1
+    return {"date": (BASE_DATE + timedelta(days=n)).strftime("%m/%d/%Y"), "start": f"{hour:02d}:00 AM", "end": f"{hour:02d}:30 PM"}
+
+
+def config_torn(config):
+    """Why `config` (a current_config) isn't one a single /set could have written, or None."""
+    targets = config.get("targets") or []
+    if not targets:
+        return "no targets"
+    first = targets[0]
+    if [config.get(k) for k in ("date", "start", "end")] != [first.get(k) for k in ("date", "start", "end")]:
+        return "date/start/end don't mirror targets[0]"
+    try:
+        n = (datetime.strptime(first["date"], "%m/%d/%Y").date() - BASE_DATE).days
+    except (KeyError, ValueError):
+        return f"unreadable date {first.get('date')!r}"
+    if n >= 0 and {k: first.get(k) for k in ("date", "start", "end")} != config_for(n):
+        return f"target {first} mixes two writes"
+    return None
+
+
+def configure_environment(args, scratch):
+    # Module-level CONFIG is read at import, so this has to happen before importing the app.
+    # Relative file defaults (config, databases, logs) land in the scratch directory.
+    os.chdir(scratch)
+    shutil.copytree(os.path.join(ROOT, "static"), os.path.join(scratch, "static"))
+    os.environ["SCHEDULER_ENABLED"] = "0"
+    os.environ["BROWSER_WARMUP"] = "0"
+    os.environ["CHECK_ENGINE"] = "sync"
+    os.environ["STATE_BACKEND"] = "sqlite"
+    os.environ["RECIPIENT_EMAIL"] = ""
+    os.environ["ARTIFACT_MODE"] = "off"
+    os.environ["LOG_LEVEL"] = args.log_level
+    os.environ.setdefault("PRESTONWOOD_USERNAME", "bench")
+    os.environ.setdefault("PRESTONWOOD_PASSWORD", "bench")
+
+
+class StubScraper:
+    """Stands in for scraper.run_scraper: no browser, but the same parse and publish work per date."""
+
+    def __init__(self, scrape_seconds):
+        self.scrape_seconds = scrape_seconds
+        self.runs = 0
+        self._seed = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, targets=None, **_):
+        from checker import parse_targets, parse_sheet_rows, publish_results
+
+        targets_by_date = parse_targets(targets)
+        time.sleep(self.scrape_seconds) # Navigation and the sheet loading
+        slots_by_date = {}
+        for date_str in targets_by_date:
+            with self._lock:
+                self._seed += 1
+                seed = self._seed
+            slots_by_date[date_str] = parse_sheet_rows(make_sheet_html(seed=seed))
+        results = publish_results(targets_by_date, slots_by_date)
+        with self._lock:
+            self.runs += 1
+        return results
+
+
+def keep_scraping(app_module, stop):
+    """Keep one stubbed scrape of the configured targets running until `stop` is set."""
+    from jobs import QueueFull
+
+    while not stop.is_set():
+        try:
+            job, _ = app_module.submit_scrape(app_module.get_config_store().current().target_dicts())
+        except QueueFull:
+            stop.wait(0.1)
+            continue
+        while not job.done.wait(0.1) and not stop.is_set():
+            pass
+
+
+class Client(threading.Thread):
+    """One simulated client: its own keep-alive connection, sending the mix until `deadline`."""
+
+    def __init__(self, port, deadline, seed, counter):
+        super().__init__(daemon=True)
+        self.port = port
+        self.deadline = deadline
+        self.rng = random.Random(seed)
+        self.counter = counter
+        self.etags = {}
+        self.samples = {} # endpoint -> [latency seconds]
+        self.errors = {}
+        self.torn = {}
+        self.rejected = {}
+        self.examples = []
+
+    def run(self):
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=30)
+        endpoints, weights = list(MIX), list(MIX.values())
+        while time.perf_counter() < self.deadline:
+            endpoint = self.rng.choices(endpoints, weights)[0]
+            path, expect = self._request(endpoint)
+            headers = {"If-None-Match": self.etags[endpoint]} if endpoint in self.etags else {}
+            started = time.perf_counter()
+            try:
+                conn.request("GET", path, headers=headers)
+                response = conn.getresponse()
+                body = response.read()
+            except (OSError, http.client.HTTPException) as e:
+                conn.close() # Reconnects on the next request
+                self._fail(self.errors, endpoint, f"{type(e).__name__}: {e}")
+                continue
+            self.samples.setdefault(endpoint, []).append(time.perf_counter() - started)
+            self._check(endpoint, response, body, expect)
+        conn.close()
+
+    def _request(self, endpoint):
+        if endpoint == "/set":
+            with self.counter["lock"]:
+                self.counter["n"] += 1
+                expect = config_for(self.counter["n"])
+            return f"/set?{urlencode(expect)}", expect
+        return endpoint, None
+
+    def _fail(self, kind, endpoint, detail):
+        kind[endpoint] = kind.get(endpoint, 0) + 1
+        if len(self.examples) < 5:
+            self.examples.append(f"{endpoint}: {detail}")
+
+    def _check(self, endpoint, response, body, expect):
+        if response.status == 304 and endpoint in self.etags:
+            return
+        if response.status == 429 and endpoint == "/run-scraper":
+            self.rejected[endpoint] = self.rejected.get(endpoint, 0) + 1
+            return
+        if response.status != 200:
+            return self._fail(self.errors, endpoint, f"HTTP {response.status}: {body[:200]!r}")
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return self._fail(self.errors, endpoint, f"not JSON: {body[:200]!r}")
+        if response.getheader("ETag"):
+            self.etags[endpoint] = response.getheader("ETag")
+        if "error" in payload:
+            return self._fail(self.errors, endpoint, payload["error"])
+
+        if endpoint == "/check":
+            if not isinstance(payload.get("results"), list):
+                return self._fail(self.torn, endpoint, f"no results list: {str(payload)[:200]}")
+        elif endpoint == "/run-scraper":
+            if "message" not in payload:
+                return self._fail(self.errors, endpoint, f"no message: {str(payload)[:200]}")
+        else:
+            config = payload.get("current_config") or {}
+            problem = config_torn(config)
+            if problem is None and endpoint == "/set" and {k: config.get(k) for k in expect} != expect:
+                problem = f"wrote {expect}, got back {config}"
+            if problem is None and endpoint == "/toggle-scraper-pause" and payload.get("is_paused") != config.get("is_paused"):
+                problem = f"is_paused {payload.get('is_paused')} but the config says {config.get('is_paused')}"
+            if problem:
+                self._fail(self.torn, endpoint, problem)
+
+
+def percentile(sorted_values, p):
+    return sorted_values[max(0, int(len(sorted_values) * p + 0.5) - 1)]
+
+
+def run_level(port, concurrency, seconds, counter, seed):
+    deadline = time.perf_counter() + seconds
+    clients = [Client(port, deadline, seed * 1000 + i, counter) for i in range(concurrency)]
+    started = time.perf_counter()
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    elapsed = time.perf_counter() - started
+
+    stats = {}
+    for endpoint in list(MIX) + [TOTAL]:
+        merged = sorted(s for c in clients for e, samples in c.samples.items() if endpoint in (e, TOTAL) for s in samples)
+        count = lambda kind: sum(n for c in clients for e, n in getattr(c, kind).items() if endpoint in (e, TOTAL))  # noqa: E731
+        stats[endpoint] = {
+            "n": len(merged), "rps": len(merged) / elapsed,
+            "p50": statistics.median(merged) if merged else None,
+            "p99": percentile(merged, 0.99) if merged else None,
+            "max": merged[-1] if merged else None,
+            "errors": count("errors"), "torn": count("torn"), "rejected": count("rejected"),
+        }
+    examples = [example for c in clients for example in c.examples]
+    return stats, examples
+
+
+def report(concurrency, stats, scrapes, budgets):
+    print(f"\nconcurrency {concurrency} ({scrapes} scrape(s) finished meanwhile)")
+    print(f"{'endpoint':<24}{'n':>7}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}{'budget':>8}{'err':>6}{'torn':>6}{'429':>6}")
+    for endpoint, row in stats.items():
+        if not row["n"] and endpoint != TOTAL:
+            continue
+        ms = lambda v: f"{v * 1000:.1f}" if v is not None else "-"  # noqa: E731
+        budget = budgets.get(endpoint)
+        over = budget is not None and row["p99"] is not None and row["p99"] * 1000 > budget
+        print(f"{endpoint:<24}{row['n']:>7}{row['rps']:>9.0f}{ms(row['p50']):>9}{ms(row['p99']):>9}{ms(row['max']):>9}"
+              f"{f'{budget:.0f}' if budget is not None else '':>8}{row['errors']:>6}{row['torn']:>6}{row['rejected']:>6}"
+              + ("  << over budget" if over else ""))
+
+
+def parse_budgets(values):
+    budgets = dict(BUDGETS)
+    for value in values:
+        endpoint, _, ms = value.partition("=")
+        if endpoint not in MIX or not ms:
+            raise argparse.ArgumentTypeError(f"--budget expects ENDPOINT=MS with ENDPOINT one of {', '.join(MIX)}")
+        budgets[endpoint] = float(ms)
+    return budgets
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the API in-process against a stubbed checker.")
+    parser.add_argument("--concurrency", default="1,4,16,32", help="Comma-separated client counts, run in turn")
+    parser.add_argument("--seconds", type=float, default=5, help="Per concurrency level")
+    parser.add_argument("--scrape-ms", type=float, default=1000, help="How long each stubbed scrape waits for the 'browser'")
+    parser.add_argument("--no-background-scrapes", action="store_true", help="Only scrape when /run-scraper asks")
+    parser.add_argument("--budget", action="append", default=[], metavar="ENDPOINT=MS", help="p99 budget, e.g. /check=50")
+    parser.add_argument("--log-level", default="ERROR", help="The app's LOG_LEVEL; WARNING and INFO print its per-request lines")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    try:
+        budgets = parse_budgets(args.budget)
+        levels = [int(level) for level in args.concurrency.split(",")]
+    except (argparse.ArgumentTypeError, ValueError) as e:
+        parser.error(str(e))
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="tee-bench-api-") as scratch:
+        configure_environment(args, scratch)
+        import uvicorn
+        import browser_pool
+        import app as app_module
+
+        browser_pool._browser_installed = True # Nothing here launches a browser
+        stub = StubScraper(args.scrape_ms / 1000)
+        app_module.run_scraper = stub
+
+        server = uvicorn.Server(uvicorn.Config(app_module.app, host="127.0.0.1", port=port, log_level="warning", access_log=False))
+        server_thread = threading.Thread(target=server.run, daemon=True)
+        server_thread.start()
+        while not server.started:
+            if not server_thread.is_alive():
+                print("The server failed to start.")
+                return 1
+            time.sleep(0.05)
+        while not app_module.lease.is_leader: # /run-scraper only queues scrapes on the leader
+            time.sleep(0.05)
+
+        counter = {"n": 0, "lock": threading.Lock()}
+        app_module.get_config_store().update(targets=[config_for(0)])
+        stop_scraping = threading.Event()
+        if not args.no_background_scrapes:
+            threading.Thread(target=keep_scraping, args=(app_module, stop_scraping), daemon=True).start()
+
+        print(f"Load-testing http://127.0.0.1:{port} for {args.seconds:.0f}s per level at concurrency {args.concurrency}; "
+              f"stubbed scrapes take {args.scrape_ms:.0f}ms" + (" and run only on request." if args.no_background_scrapes else " and run back to back."))
+        failures = []
+        for i, concurrency in enumerate(levels):
+            scrapes_before = stub.runs
+            stats, examples = run_level(port, concurrency, args.seconds, counter, args.seed + i)
+            report(concurrency, stats, stub.runs - scrapes_before, budgets)
+            for endpoint, row in stats.items():
+                if endpoint == TOTAL:
+                    continue
+                if row["errors"] or row["torn"]:
+                    failures.append(f"{endpoint} at concurrency {concurrency}: {row['errors']} error(s), {row['torn']} torn read(s)")
+                if row["p99"] is not None and row["p99"] * 1000 > budgets[endpoint]:
+                    failures.append(f"{endpoint} at concurrency {concurrency}: p99 {row['p99'] * 1000:.1f}ms "
+                                    f"over its {budgets[endpoint]:.0f}ms budget")
+            for example in examples:
+                print(f"  ! {example}")
+
+        stop_scraping.set()
+        server.should_exit = True
+        server_thread.join(timeout=30)
+        os.chdir(cwd)
+
+    if failures:
+        print("\n!! " + "\n!! ".join(failures))
+        return 1
+    print("\nAll endpoints within budget, no errors or torn reads.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""
+Compare tee sheet parser backends on parse time and memory.
+
+    python benchmarks/bench_parser.py
+    python benchmarks/bench_parser.py --fixtures "recordings/*/sheets/*.html" --repeat 50
+
+Without --fixtures it runs over benchmarks/fixtures/*.html, generating a
+full-day synthetic sheet there first if the directory is empty. Every
+backend must return the same slots for a fixture or the run fails.
+"""
+import os
+import sys
+import glob
+import time
+import random
+import argparse
+import statistics
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sheet_parser import BACKENDS, available_backends  # noqa: E402
+
+FIXTURE_DIR = os.path.join(ROOT, "benchmarks", "fixtures")
+COURSES = ["Highlands", "Fairways", "Meadows"]
+
+
+def make_sheet_html(first_hour=6, last_hour=18, interval=8, seed=7):
+    """A full-day, all-courses sheet shaped like the ForeTees member sheet markup."""
+    rng = random.Random(seed)
+    rows = ['<div class="rwdTr rwdHeader"><div class="rwdTd">Time</div><div class="rwdTd">Fr</div>'
+            '<div class="rwdTd">Course</div><div class="rwdTd">Players</div><div class="rwdTd">Status</div></div>']
+    for minutes in range(first_hour * 60, last_hour * 60, interval):
+        hour, minute = divmod(minutes, 60)
+        label = f"{(hour - 1) % 12 + 1}:{minute:02d} {'AM' if hour < 12 else 'PM'}"
+        for course in COURSES:
+            open_count = rng.choice([0, 0, 0, 1, 2, 4])
+            status = f"{open_count} Open" if open_count else "Full"
+            players = "".join(f'<span class="player">Member {rng.randint(100, 999)}</span>' for _ in range(4 - open_count))
+            time_cell = (f'<a class="teetime_button" href="#" data-ttdata="{rng.getrandbits(64):x}">{label}</a>'
+                         if open_count else f'<div class="time_slot">{label}</div>')
+            rows.append(
+                f'<div class="rwdTr"><div class="rwdTd sT">{time_cell}</div><div class="rwdTd">1</div>'
+                f'<div class="rwdTd">{course}</div><div class="rwdTd">{players}</div>'
+                f'<div class="rwdTd">{status}</div></div>'
+            )
+    calendar = "".join(f'<td><a href="#">{day}</a></td>' for day in range(1, 32))
+    return (
+        '<html><head><script>var sheetData = {};</script></head><body>'
+        f'<div id="member_select_calendar1"><table><tr>{calendar}</tr></table></div>'
+        '<select><option>-ALL-</option>' + "".join(f"<option>{c}</option>" for c in COURSES) + '</select>'
+        f'<div class="member_sheet_table">{"".join(rows)}</div></body></html>'
+    )
+
+
+def load_fixtures(pattern):
+    if pattern:
+        paths = sorted(glob.glob(pattern, recursive=True))
+    else:
+        os.makedirs(FIXTURE_DIR, exist_ok=True)
+        paths = sorted(glob.glob(os.path.join(FIXTURE_DIR, "*.html")))
+        if not paths:
+            path = os.path.join(FIXTURE_DIR, "synthetic_full_day.html")
+            with open(path, "w") as f:
+                f.write(make_sheet_html())
+            paths = [path]
+    fixtures = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            fixtures.append((os.path.relpath(path, ROOT), f.read()))
+    return fixtures
+
+
+def bench(parse, html, repeat):
+    parse(html) # warm up imports and compiled XPaths
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        parse(html)
+        durations.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    parse(html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return durations, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tee sheet parser backends.")
+    parser.add_argument("--fixtures", help="Glob of recorded sheet HTML files")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--backend", action="append", help="Only run these backends (repeatable)")
+    args = parser.parse_args()
+
+    backends = [name for name in available_backends() if not args.backend or name in args.backend]
+    if not backends:
+        print("No parser backends installed.")
+        return 1
+
+    failed = False
+    for name, html in load_fixtures(args.fixtures):
+        print(f"\n{name} ({len(html) / 1024:.0f} KiB)")
+        print(f"  {'backend':<12}{'rows':>6}{'mean ms':>10}{'p95 ms':>10}{'min ms':>10}{'peak KiB':>10}")
+        reference = None
+        for backend in backends:
+            parse = BACKENDS[backend][1]
+            slots = parse(html)
+            durations, peak = bench(parse, html, args.repeat)
+            p95 = sorted(durations)[max(0, int(len(durations) * 0.95) - 1)]
+            print(f"  {backend:<12}{len(slots or []):>6}{statistics.mean(durations) * 1000:>10.2f}"
+                  f"{p95 * 1000:>10.2f}{min(durations) * 1000:>10.2f}{peak / 1024:>10.0f}")
+            if reference is None:
+                reference = (backend, slots)
+            elif slots != reference[1]:
+                print(f"  !! {backend} disagrees with {reference[0]}")
+                failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""
+End-to-end check benchmark against a recorded session (see replay.py).
+
+    python benchmarks/bench_scrape.py --recording recordings/2026-10-17 --runs 10 --latency-ms 100
+    python benchmarks/bench_scrape.py --recording recordings/2026-10-17 --engine http
+
+Starts a replay server for the recording in-process and points the checker
+at it. The run uses a throwaway session file, slot database and
+subscriber list, then performs --runs checks of the recorded dates.
+Wall time, CPU (this process and the browser processes) and peak RSS are
+reported for each stage. Nothing touches the live site or sends email.
+"""
+import os
+import sys
+import glob
+import socket
+import asyncio
+import argparse
+import statistics
+import tempfile
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TOTAL = "total" # One whole check as seen by the caller
+
+
+def recorded_targets(recording):
+    """One all-day target per date with a recorded sheet."""
+    targets = []
+    for path in sorted(glob.glob(os.path.join(recording, "sheets", "??-??-????.html"))):
+        date_str = os.path.basename(path)[:-len(".html")].replace("-", "/")
+        targets.append({"date": date_str, "start": "12:00 AM", "end": "11:59 PM"})
+    return targets
+
+
+def configure_environment(args, replay_url, scratch):
+    # Module-level CONFIG is read at import, so this has to happen before importing the checker
+    os.environ["REPLAY_URL"] = replay_url
+    os.environ["FETCH_MODE"] = "http" if args.engine == "http" else "browser"
+    if args.engine == "http":
+        os.environ["FORETEES_SHEET_URL"] = f"{replay_url}/sheet"
+    os.environ["STORAGE_STATE_FILE"] = os.path.join(scratch, "storage_state.json")
+    # Every store a check writes to, so a benchmark leaves the real history and caches alone
+    os.environ["SLOT_DB"] = os.path.join(scratch, "tee_times.db")
+    os.environ["OBSERVATION_DB"] = os.path.join(scratch, "observations.db")
+    os.environ["ASSET_CACHE_DIR"] = os.path.join(scratch, "asset_cache")
+    os.environ["NOTIFY_SUBSCRIBERS_FILE"] = os.path.join(scratch, "subscribers.json")
+    os.environ["RECIPIENT_EMAIL"] = ""
+    os.environ["ARTIFACT_MODE"] = "off"
+    os.environ.setdefault("PRESTONWOOD_USERNAME", "replay")
+    os.environ.setdefault("PRESTONWOOD_PASSWORD", "replay")
+
+
+def run_checks(engine, targets, runs, scratch):
+    import checker
+    from checker import check_targets
+    from browser_pool import shutdown_pool
+    from metrics import metrics
+
+    checker.LOG_FILE = os.path.join(scratch, checker.LOG_FILE) # Not an env setting; found times go to the cwd
+    results = []
+    if engine == "async":
+        from async_checker import check_targets_async, shutdown_async_pool
+
+        async def run_all():
+            for _ in range(runs):
+                with metrics.span(TOTAL):
+                    results.append(await check_targets_async(targets))
+            await shutdown_async_pool()
+
+        asyncio.run(run_all())
+    else:
+        for _ in range(runs):
+            with metrics.span(TOTAL):
+                results.append(check_targets(targets))
+        shutdown_pool()
+    return results
+
+
+def report(profile):
+    print(f"\n{'stage':<22}{'n':>4}{'wall p50':>10}{'wall p95':>10}{'app cpu':>10}{'brw cpu':>10}{'peak MiB':>10}")
+    print(f"{'':<22}{'':>4}{'ms':>10}{'ms':>10}{'ms/run':>10}{'ms/run':>10}{'':>10}")
+    # Whole checks last, stages in order of their median time
+    order = sorted((s for s in profile if s != TOTAL), key=lambda s: -statistics.median(r[0] for r in profile[s]))
+    for stage in order + ([TOTAL] if TOTAL in profile else []):
+        rows = profile[stage]
+        walls = sorted(r[0] for r in rows)
+        p95 = walls[max(0, int(len(walls) * 0.95 + 0.5) - 1)]
+        print(f"{stage:<22}{len(rows):>4}{statistics.median(walls) * 1000:>10.1f}{p95 * 1000:>10.1f}"
+              f"{statistics.mean(r[1] for r in rows) * 1000:>10.1f}{statistics.mean(r[2] for r in rows) * 1000:>10.1f}"
+              f"{max(r[3] for r in rows) / 2**20:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark full checks against a replayed recording.")
+    parser.add_argument("--recording", required=True, help="Directory written by `replay.py record`")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--engine", choices=("sync", "async", "http"), default="sync")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Injected per response")
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--sample-ms", type=float, default=50, help="RSS sampling interval")
+    args = parser.parse_args()
+
+    targets = recorded_targets(args.recording)
+    if not targets:
+        print(f"No recorded sheets in {args.recording}/sheets.")
+        return 1
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    replay_url = f"http://127.0.0.1:{port}"
+
+    with tempfile.TemporaryDirectory(prefix="tee-bench-") as scratch:
+        configure_environment(args, replay_url, scratch)
+        import replay
+        from metrics import metrics, StageProfiler
+
+        server = replay.serve(args.recording, port=port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        metrics.profiler = StageProfiler(interval=args.sample_ms / 1000)
+        print(f"{args.runs} {args.engine} check(s) of {len(targets)} date(s) against {replay_url} "
+              f"(+{args.latency_ms:.0f}ms latency)")
+        results = run_checks(args.engine, targets, args.runs, scratch)
+        metrics.profiler.close()
+        profile = metrics.profiler.results()
+        metrics.profiler = None
+
+    server.shutdown()
+    report(profile)
+
+    failures = metrics.summary()["stages"].get("check", {}).get("failures", 0)
+    if failures:
+        print(f"\n!! {failures} of {len(results)} check(s) failed. Last result: {results[-1]}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
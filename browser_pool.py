@@ -0,0 +1,319 @@
+import os
+import sys
+import queue
+import functools
+import contextvars
+import logging
+import threading
+import subprocess
+import importlib.metadata
+from concurrent.futures import Future
+from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+from metrics import metrics
+from failures import CheckFailure, SiteDown, LayoutChanged, AUTH
+from persistence import atomic_write_json, read_json
+from resource_policy import resource_policy
+import replay
+
+# CONFIG
+USERNAME = os.getenv("PRESTONWOOD_USERNAME")
+PASSWORD = os.getenv("PRESTONWOOD_PASSWORD")
+
+LOGIN_URL = "https://www.prestonwood.com/members-login"
+MEMBER_CENTRAL_URL = "https://www.prestonwood.com/member-central-18.html"
+TEE_SHEET_URL = "https://www.prestonwood.com/golf/tee-times-43.html"
+
+# Cookies/localStorage of the last successful login. Reloaded into every new
+# browser context so a restart (or an idle shutdown) doesn't force a new login.
+STORAGE_STATE_FILE = os.getenv("STORAGE_STATE_FILE", "storage_state.json")
+
+# Close the browser after this many seconds without work so an idle instance
+# doesn't hold on to Chromium's memory. 0 keeps it open forever.
+BROWSER_IDLE_SECONDS = int(os.getenv("BROWSER_IDLE_SECONDS", "600"))
+
+# Remembers that Chromium is installed for this Playwright version, so a boot
+# doesn't need to start the Playwright driver (or the installer) to find out
+BROWSER_INSTALL_STAMP = os.getenv("BROWSER_INSTALL_STAMP", ".browser_installed.json")
+
+BROWSER_ARGS = [
+    '--no-sandbox',
+    '--disable-setuid-sandbox',
+    '--disable-dev-shm-usage',
+    '--no-zygote',
+    '--single-process',
+    # Background work a scraper never needs, each holding memory or making requests of its own
+    '--disable-extensions',
+    '--disable-background-networking',
+    '--disable-component-update',
+    '--disable-default-apps',
+    '--disable-sync',
+    '--mute-audio',
+    '--no-first-run',
+]
+
+PAGE_TIMEOUT_MS = 60000 # 60 seconds timeout for page operations
+# Ceiling for a single readiness wait (a selector, URL change or navigation)
+STEP_TIMEOUT_MS = int(os.getenv("STEP_TIMEOUT_MS", "30000"))
+# Shorter ceilings where running out of time already tells us what's wrong, so a
+# broken login or a changed page fails in seconds instead of sitting out the full wait
+NAV_TIMEOUT_MS = int(os.getenv("NAV_TIMEOUT_MS", "20000"))       # Page loads; no response means the site is down
+AUTH_TIMEOUT_MS = int(os.getenv("AUTH_TIMEOUT_MS", "15000"))     # Login form and the redirect after submitting it
+LAYOUT_TIMEOUT_MS = int(os.getenv("LAYOUT_TIMEOUT_MS", "10000")) # Elements that are always on an already loaded page
+SHEET_IFRAME_SELECTOR = "iframe#ifrforetees"
+
+
+class LoginError(CheckFailure):
+    """Raised when the member login form can't be submitted successfully."""
+    kind = AUTH
+
+
+def check_response(response, url):
+    """Raise SiteDown for a navigation that got no response or a server error."""
+    if response is not None and response.status >= 500:
+        raise SiteDown(f"HTTP {response.status} from {url}")
+
+
+def wait_for_layout(frame, selector, what, **kwargs):
+    """Wait for an element that is always on the loaded page; if it never shows up, the site changed."""
+    try:
+        return frame.wait_for_selector(selector, timeout=LAYOUT_TIMEOUT_MS, **kwargs)
+    except PlaywrightTimeoutError as e:
+        raise LayoutChanged(f"{what} ({selector}) not found within {LAYOUT_TIMEOUT_MS / 1000:.0f}s") from e
+
+
+_browser_installed = False
+_install_lock = threading.Lock()
+
+
+def _chromium_executable():
+    with sync_playwright() as p:
+        return p.chromium.executable_path
+
+
+def ensure_browser_installed(executable=None):
+    """
+    Install Playwright's Chromium if it isn't on disk yet. Checked once per
+    process and stamped to disk, so after the first boot this is a file read.
+    `executable` saves starting a Playwright driver when the caller has one.
+    Must not be called from a thread running an event loop.
+    """
+    global _browser_installed
+    if _browser_installed:
+        return
+    with _install_lock:
+        if _browser_installed:
+            return
+        version = importlib.metadata.version("playwright")
+        stamp = read_json(BROWSER_INSTALL_STAMP, {})
+        if stamp.get("playwright") != version or not os.path.exists(stamp.get("executable", "")):
+            executable = executable or _chromium_executable()
+            if not os.path.exists(executable):
+                logging.info("📦 Chromium not installed. Installing it now.")
+                with metrics.span("browser_install"):
+                    subprocess.run([sys.executable, "-m", "playwright", "install", "chromium"], check=True)
+            atomic_write_json(BROWSER_INSTALL_STAMP, {"playwright": version, "executable": executable})
+        _browser_installed = True
+
+
+class BrowserPool:
+    """
+    Long-lived Chromium browser + authenticated context owned by one thread.
+
+    Playwright's sync API is bound to the thread that started it, so every
+    browser operation runs on the pool's own thread. Callers hand in a
+    function with `run(fn)`; it is called as `fn(page)` with a fresh page in
+    the shared, logged-in context, and its return value (or exception) is
+    passed back to the caller.
+    """
+
+    def __init__(self, storage_state_file=STORAGE_STATE_FILE, idle_seconds=BROWSER_IDLE_SECONDS):
+        self.storage_state_file = storage_state_file
+        self.idle_seconds = idle_seconds
+        self._jobs = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        # Only touched from the pool thread
+        self._playwright = None
+        self._browser = None
+        self._context = None
+
+    def start(self):
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="browser-pool", daemon=True)
+            self._thread.start()
+
+    def run(self, fn, timeout=None):
+        """Run `fn(page)` on the pool thread and return its result."""
+        self.start()
+        future = Future()
+        # Run with the caller's context, so what `fn` logs carries the caller's run_id
+        self._jobs.put((functools.partial(contextvars.copy_context().run, fn), future))
+        return future.result(timeout)
+
+    def warm(self):
+        """Launch the browser and open the saved session now, so the first check doesn't pay for it."""
+        self.run(lambda page: None)
+
+    def shutdown(self):
+        if self._thread and self._thread.is_alive():
+            self._jobs.put(None)
+            self._thread.join(timeout=30)
+
+    # --- Pool thread ---
+
+    def _run(self):
+        with sync_playwright() as p:
+            self._playwright = p
+            while True:
+                try:
+                    item = self._jobs.get(timeout=self.idle_seconds or None)
+                except queue.Empty:
+                    if self._browser:
+                        logging.info(f"Browser idle for {self.idle_seconds}s. Closing it until the next check.")
+                        self._close_browser()
+                    continue
+
+                if item is None:
+                    break
+
+                fn, future = item
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    future.set_result(self._call(fn))
+                except BaseException as e:
+                    future.set_exception(e)
+
+            self._close_browser()
+        self._playwright = None
+
+    def _call(self, fn):
+        context = self._ensure_context()
+        page = context.new_page()
+        page.set_default_timeout(PAGE_TIMEOUT_MS)
+        try:
+            return fn(page)
+        finally:
+            try:
+                page.close()
+            except Exception as e:
+                logging.warning(f"Failed to close page: {e}")
+
+    def _ensure_context(self):
+        if self._browser and not self._browser.is_connected():
+            logging.warning("⚠️ Browser disconnected. Relaunching.")
+            self._browser = None
+            self._context = None
+
+        if not self._browser:
+            ensure_browser_installed(self._playwright.chromium.executable_path)
+            logging.info("🚀 Launching pooled Chromium browser.")
+            with metrics.span("browser_launch"):
+                self._browser = self._playwright.chromium.launch(headless=True, args=BROWSER_ARGS)
+            self._context = None
+
+        if not self._context:
+            storage_state = self.storage_state_file if os.path.exists(self.storage_state_file) else None
+            if storage_state:
+                logging.info(f"Reusing saved session from {self.storage_state_file}.")
+            self._context = self._browser.new_context(
+                storage_state=storage_state, **replay.context_options(), **resource_policy.context_options())
+            if replay.REPLAY_URL:
+                replay.install_replay(self._context)
+            resource_policy.install(self._context, "sync") # After replay, so it gets each request first
+
+        return self._context
+
+    def _close_browser(self):
+        if self._browser:
+            try:
+                if self._context:
+                    self._context.close() # Also writes the HAR when recording
+                self._browser.close()
+                logging.info("Browser closed.")
+            except Exception as e:
+                logging.warning(f"Failed to close browser cleanly: {e}")
+        self._browser = None
+        self._context = None
+
+    # --- Session handling (call from inside `fn`) ---
+
+    def needs_login(self, page):
+        if page.url.startswith(LOGIN_URL):
+            return True
+        return page.locator("#lgUserName").count() > 0
+
+    def login(self, page):
+        logging.info(f"Navigating to login page: {LOGIN_URL}")
+        check_response(page.goto(LOGIN_URL, wait_until="domcontentloaded", timeout=NAV_TIMEOUT_MS), LOGIN_URL)
+
+        try:
+            with metrics.span("login"):
+                page.wait_for_selector("#lgUserName", state='visible', timeout=AUTH_TIMEOUT_MS)
+                page.fill("#lgUserName", USERNAME)
+                page.fill("#lgPassword", PASSWORD)
+                page.click("#lgLoginButton")
+                # Rejected credentials leave us on the login page, so this is where a bad login times out
+                page.wait_for_url(lambda url: url != LOGIN_URL, wait_until="domcontentloaded", timeout=AUTH_TIMEOUT_MS)
+            logging.info("✅ Initial login successful and redirected.")
+        except Exception as e:
+            logging.error(f"❌ Failed initial login using 'lgUserName' strategy: {e}")
+            raise LoginError(f"Initial login failed: {e}") from e
+
+        # After initial login, check for "ENTER MEMBER AREA" or proceed
+        member_area_button_selector = "button:has-text('ENTER MEMBER AREA')"
+        if page.locator(member_area_button_selector).is_visible():
+            logging.info("✅ 'ENTER MEMBER AREA' button found after initial login. Clicking to proceed.")
+            with metrics.span("member_area_bypass"):
+                with page.expect_navigation(wait_until="domcontentloaded", timeout=NAV_TIMEOUT_MS):
+                    page.click(member_area_button_selector, timeout=LAYOUT_TIMEOUT_MS)
+                logging.info("➡️ Navigating to Member Central page after bypass.")
+                check_response(page.goto(MEMBER_CENTRAL_URL, wait_until="domcontentloaded", timeout=NAV_TIMEOUT_MS), MEMBER_CENTRAL_URL)
+        else:
+            logging.info("No 'ENTER MEMBER AREA' button found. Assuming direct access to member area or proceeding as normal.")
+
+        try:
+            # The async pool may be opening a context from this file right now
+            atomic_write_json(self.storage_state_file, page.context.storage_state())
+            logging.info(f"Saved session state to {self.storage_state_file}.")
+        except Exception as e:
+            logging.warning(f"Failed to save session state: {e}")
+
+    def _goto_tee_sheet(self, page):
+        logging.info(f"➡️ Navigating to tee sheet page: {TEE_SHEET_URL}")
+        check_response(page.goto(TEE_SHEET_URL, wait_until="domcontentloaded", timeout=NAV_TIMEOUT_MS), TEE_SHEET_URL)
+        # Either the ForeTees iframe (logged in) or the login form (session expired) shows up
+        wait_for_layout(page, f"{SHEET_IFRAME_SELECTOR}, #lgUserName", "Tee sheet iframe or login form", state="attached")
+
+    def open_tee_sheet(self, page):
+        """Navigate to the tee sheet, logging in first only if the saved session has expired."""
+        self._goto_tee_sheet(page)
+
+        if self.needs_login(page):
+            logging.info("🔑 Session missing or expired. Logging in.")
+            self.login(page)
+            self._goto_tee_sheet(page)
+        else:
+            logging.info("✅ Saved session still valid. Skipping login.")
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool()
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
@@ -1,79 +1,105 @@
-from playwright.sync_api import sync_playwright
-from bs4 import BeautifulSoup
 from datetime import datetime
 import os
 import logging
-import smtplib
-import json
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 import time
+from contextlib import contextmanager
+from browser_pool import get_pool, wait_for_layout, USERNAME, PASSWORD, STEP_TIMEOUT_MS, NAV_TIMEOUT_MS, SHEET_IFRAME_SELECTOR
+from sheet_fetch import get_fetcher, FETCH_MODE, ALL_COURSES
+from artifacts import artifact_store
+from sheet_parser import parse_sheet
+from slot_store import get_store
+from observations import get_observation_store
+from result_cache import result_cache, CHECK
+from events import broadcaster
+from notifier import notifier, SlotAlert
+from metrics import metrics, record_page_memory
+from failures import breaker, classify, LayoutChanged, AUTH
+from persistence import atomic_write
+from resource_policy import resource_policy
+from log_config import log_context, debug_enabled
+from startup import browser_worked
+import replay
 
 # CONFIG
-# --- IMPORTANT CHANGE: Get USERNAME and PASSWORD from environment variables ---
-USERNAME = os.getenv("PRESTONWOOD_USERNAME")
-PASSWORD = os.getenv("PRESTONWOOD_PASSWORD")
-# --- END IMPORTANT CHANGE ---
-
-LOGIN_URL = "https://www.prestonwood.com/members-login"
-TEE_SHEET_URL = "https://www.prestonwood.com/golf/tee-times-43.html"
+# Credentials and site URLs live in browser_pool.py, which owns the login session.
 # CHECK_DAY will be dynamically set from date_str now
 LOG_FILE = "available_tee_times.txt"
-CACHE_FILE = "cached_results.json"
-SCREENSHOT_DIR = "screenshots" # Directory to save screenshots
-
-# Logging setup
-log_dir = "logs"
-os.makedirs(log_dir, exist_ok=True)
-today_str = datetime.today().strftime("%Y-%m-%d")
-log_path = os.path.join(log_dir, f"tee_times_{today_str}.log")
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s",
-                    handlers=[
-                        logging.FileHandler(log_path),
-                        logging.StreamHandler()
-                    ])
-
-# Ensure screenshot directory exists
-os.makedirs(SCREENSHOT_DIR, exist_ok=True)
-
-# Email setup
-GMAIL_USER = os.getenv("GMAIL_USER")
-GMAIL_PASS = os.getenv("GMAIL_PASS")
-RECIPIENT_EMAIL = os.getenv("RECIPIENT_EMAIL")
-
-def send_email(subject, body):
-    if not GMAIL_USER or not GMAIL_PASS or not RECIPIENT_EMAIL:
-        logging.error("Email credentials or recipient not set. Cannot send email.")
-        return
-
-    msg = MIMEMultipart()
-    msg['From'] = GMAIL_USER
-    msg['To'] = RECIPIENT_EMAIL
-    msg['Subject'] = subject
-
-    msg.attach(MIMEText(body, 'plain'))
+# Served tee times older than this are flagged stale even if the last check didn't fail
+STALE_AFTER_SECONDS = int(os.getenv("STALE_AFTER_SECONDS", "1800"))
+
+# Each step waits on a concrete readiness condition, so STEP_TIMEOUT_MS (browser_pool.py)
+# is only the ceiling for a site that has stopped responding, not padding every check pays.
+ROWS_SELECTOR = "div.member_sheet_table div.rwdTr"
+STALE_ATTR = "data-tt-stale"
+FRESH_ROWS_SELECTOR = f"{ROWS_SELECTOR}:not([{STALE_ATTR}])"
+# Tag the rows that are on screen now. Whether the sheet reloads the whole
+# iframe document or only swaps its rows, untagged rows mean fresh content.
+MARK_ROWS_STALE_JS = f"""() => {{
+    const rows = document.querySelectorAll("{ROWS_SELECTOR}");
+    rows.forEach(row => row.setAttribute("{STALE_ATTR}", "1"));
+    return rows.length;
+}}"""
+SELECTED_OPTION_JS = "el => el.options[el.selectedIndex] && el.options[el.selectedIndex].text.trim()"
+SHEET_HTML_JS = "el => el.outerHTML"
+
+
+def take_screenshot(page, run_id, name, error=False):
+    # Captured only when ARTIFACT_MODE asks for it; written to disk by a background thread
+    artifact_store.capture(page, run_id, name, error=error)
+
+
+@contextmanager
+def step(timings, name):
+    """Time one step of a check, appending (name, seconds) to `timings` and reporting it to /metrics."""
+    with log_context(stage=name), metrics.span(name) as timer:
+        try:
+            yield
+        finally:
+            timings.append((name, timer.elapsed))
+            logging.info(f"⏱️ Step '{name}' took {timer.elapsed:.2f}s")
 
-    try:
-        with smtplib.SMTP_SSL('smtp.gmail.com', 465) as smtp:
-            smtp.login(GMAIL_USER, GMAIL_PASS)
-            smtp.send_message(msg)
-        logging.info("Email sent successfully!")
-    except Exception as e:
-        logging.error(f"Failed to send email: {e}")
 
-def take_screenshot(page, name):
-    screenshot_path = os.path.join(SCREENSHOT_DIR, f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png")
-    try:
-        page.screenshot(path=screenshot_path)
-        logging.info(f"Screenshot saved: {screenshot_path}")
-    except Exception as e:
-        logging.error(f"Failed to take screenshot: {e}")
+def log_timings(timings, label=None):
+    if timings:
+        total = sum(seconds for _, seconds in timings)
+        breakdown = ", ".join(f"{name}={seconds:.2f}s" for name, seconds in timings)
+        logging.info(f"⏱️ Check steps{f' for {label}' if label else ''} took {total:.2f}s ({breakdown})")
 
 
 def check_tee_times(date_str, start_time_str, end_time_str):
-    logging.info(f"Starting check for date: {date_str}, {start_time_str}-{end_time_str}")
-    browser = None
-    found_times = []
+    return check_targets([{"date": date_str, "start": start_time_str, "end": end_time_str}])
+
+
+def parse_targets(targets):
+    """
+    Group targets by date so each calendar day is scraped once.
+
+    Returns an ordered dict of date_str -> (check_day, [(start_time, end_time), ...]).
+    A target without start/end (a date only members' watchlists need) is
+    scraped but adds no window. Raises ValueError on a malformed date or time,
+    or a window that ends before it starts.
+    """
+    by_date = {}
+    for target in targets:
+        check_date_obj = datetime.strptime(target["date"], "%m/%d/%Y")
+        check_day = str(check_date_obj.day)
+        windows = by_date.setdefault(target["date"], (check_day, []))[1]
+        if target.get("start") is not None:
+            start_time = datetime.strptime(target["start"], "%I:%M %p").time()
+            end_time = datetime.strptime(target["end"], "%I:%M %p").time()
+            if end_time < start_time:
+                raise ValueError(f"{target['date']}: end {target['end']} is before start {target['start']}")
+            windows.append((start_time, end_time))
+    return by_date
+
+
+def describe_targets(targets):
+    return ", ".join(f"{t['date']} {t['start']}-{t['end']}" if t.get("start") else f"{t['date']} (watchlists)" for t in targets)
+
+
+def check_targets(targets):
+    """Check every {date, start, end} target in one browser session."""
+    logging.info(f"Starting check for {len(targets)} target(s): " + describe_targets(targets))
     
     # NEW: Check if Prestonwood credentials are set
     if not USERNAME or not PASSWORD:
@@ -82,232 +108,322 @@ def check_tee_times(date_str, start_time_str, end_time_str):
         return [error_msg]
     # END NEW
 
-    try:
-        START_TIME = datetime.strptime(start_time_str, "%I:%M %p").time()
-        END_TIME = datetime.strptime(end_time_str, "%I:%M %p").time()
-        # Parse CHECK_DATE for CHECK_DAY
-        check_date_obj = datetime.strptime(date_str, "%m/%d/%Y")
-        CHECK_DAY = str(check_date_obj.day)
+    if not targets:
+        return ["Error: No dates configured to check."]
 
-    except ValueError as e:
+    try:
+        targets_by_date = parse_targets(targets)
+    except (KeyError, ValueError) as e:
         logging.error(f"Configuration parsing error: {e}. Please check date/time formats.")
         return [f"Error: Invalid date/time format in config: {e}"]
 
-    with sync_playwright() as p:
-        try:
-            browser = p.chromium.launch(
-                headless=True,
-                args=[
-                    '--no-sandbox',
-                    '--disable-setuid-sandbox',
-                    '--disable-dev-shm-usage',
-                    '--no-zygote',
-                    '--single-process'
-                ]
-            )
-            
-            page = browser.new_page()
-            page.set_default_timeout(60000) # 60 seconds timeout for page operations
-
-            # 1. Navigate to login
-            logging.info(f"Navigating to login page: {LOGIN_URL}")
-            page.goto(LOGIN_URL)
-            page.wait_for_load_state('networkidle')
-
-            # Attempting to fill login form with 'lgUserName' selectors...
-            try:
-                page.wait_for_selector("#lgUserName", state='visible', timeout=60000)
-                page.fill("#lgUserName", USERNAME)
-                page.fill("#lgPassword", PASSWORD)
-                page.click("#lgLoginButton")
-                page.wait_for_url(lambda url: url != LOGIN_URL, timeout=60000)
-                take_screenshot(page, "after_successful_initial_login_redirect")
-                logging.info("✅ Initial login successful and redirected.")
-
-            except Exception as e:
-                logging.error(f"❌ Failed initial login using 'lgUserName' strategy: {e}")
-                take_screenshot(page, "failed_initial_login")
-                return [f"Error: Initial login failed: {e}"]
-
-            # After initial login, check for "ENTER MEMBER AREA" or proceed
-            member_area_button_selector = "button:has-text('ENTER MEMBER AREA')"
-            if page.locator(member_area_button_selector).is_visible():
-                logging.info("✅ 'ENTER MEMBER AREA' button found after initial login. Clicking to proceed.")
-                page.click(member_area_button_selector, timeout=30000)
-                page.wait_for_load_state("networkidle", timeout=60000)
-                take_screenshot(page, "after_enter_member_area_click")
-                logging.info("➡️ Navigating to Member Central page after bypass.")
-                page.goto("https://www.prestonwood.com/member-central-18.html", wait_until="networkidle", timeout=90000)
-                take_screenshot(page, "after_member_central_navigation")
-            else:
-                logging.info("No 'ENTER MEMBER AREA' button found. Assuming direct access to member area or proceeding as normal.")
-
-            # 2. Navigate to tee sheet
-            logging.info(f"➡️ Navigating to tee sheet page: {TEE_SHEET_URL}")
-            page.goto(TEE_SHEET_URL)
-            page.wait_for_load_state('networkidle')
-            
-            # Wait for the specific element that indicates page is loaded
-            # This selector was previously 'select#dnn_ctr433_ModuleContent_TeeTime_ddlCourse'
-            # Let's use a more general iframe selector first
-            logging.info("🔍 Searching for iframe 'ifrforetees'.")
-            iframe_handle = page.wait_for_selector("iframe#ifrforetees", timeout=60000)
-            if iframe_handle:
-                logging.info("✅ Found iframe 'ifrforetees'. Waiting for iframe content to load (domcontentloaded).")
-                iframe = iframe_handle.content_frame()
-                iframe.wait_for_load_state("domcontentloaded", timeout=90000)
-                page.wait_for_timeout(2000) # Small wait
-                take_screenshot(page, "after_iframe_dom_load")
-
-                logging.info("✅ Iframe content loaded (domcontentloaded). Waiting for networkidle in iframe.")
-                iframe.wait_for_load_state("networkidle", timeout=90000)
-                page.wait_for_timeout(5000) # Wait 5 seconds for elements to settle
-                take_screenshot(page, "after_iframe_network_idle_and_wait")
-
-                # 3. Select the correct date from the calendar
-                logging.info(f"📅 Attempting to select date: {date_str} (Day: {CHECK_DAY}) by waiting for #member_select_calendar1 within iframe.")
-                iframe.wait_for_selector("#member_select_calendar1", timeout=60000)
-                take_screenshot(page, "before_date_selection_in_iframe")
-                
-                logging.info(f"📆 Clicking on target date: {CHECK_DAY}")
-                try:
-                    iframe.locator(f"td a:has-text('{CHECK_DAY}')").first.click(timeout=30000)
-                except Exception as click_e:
-                    logging.warning(f"Could not click date '{CHECK_DAY}' directly: {click_e}. Trying alternative.")
-                    iframe.locator(f"//td[contains(@class, 'ui-datepicker-week-end') or contains(@class, 'ui-datepicker-unselectable') or contains(@class, 'ui-datepicker-current-day')]//a[text()='{CHECK_DAY}']").click(timeout=30000)
-
-                take_screenshot(page, "after_date_click_in_iframe")
-
-                iframe.wait_for_load_state("networkidle", timeout=90000)
-                page.wait_for_timeout(5000) # Wait 5 seconds for elements to settle
-                take_screenshot(page, "after_date_selection_refresh_iframe_and_wait")
-
-                logging.info("📄 Waiting for tee sheet content to be stable before course selection.")
-                # Ensure the tee sheet table is present and stable *before* attempting course dropdown
-                iframe.wait_for_selector("div.member_sheet_table", state='visible', timeout=60000)
-                logging.info("✅ Tee sheet table visible. Proceeding to course selection.")
-
-
-                logging.info("🔄 Attempting to set course to '-ALL-' using robust search from main.py logic.")
-                course_selected = False
-                select_elements = iframe.query_selector_all("select") 
-                
-                for select_el_handle in select_elements:
-                    try:
-                        select_html = select_el_handle.evaluate("node => node.outerHTML")
-                        if "-ALL-" in select_html: 
-                            select_el_handle.select_option(label="-ALL-")
-                            logging.info("✅ Course set to '-ALL-'.")
-                            course_selected = True
-                            break
-                    except Exception as select_e:
-                        logging.warning(f"Could not process select element or select option: {select_e}")
-                
-                if not course_selected:
-                    logging.warning("❌ '-ALL-' course option not found after iterating through all select elements.")
-                    take_screenshot(page, "course_all_not_found_robust_search")
-                
-                iframe.wait_for_load_state("networkidle", timeout=90000)
-                take_screenshot(page, "after_course_select_robust_search")
-                
-                # --- IMPORTANT CHANGE: Wait for actual tee time rows to appear ---
-                logging.info("⏳ Waiting for tee time rows (div.rwdTr) to be visible in the tee sheet table.")
-                iframe.wait_for_selector("div.member_sheet_table div.rwdTr", state='visible', timeout=60000)
-                logging.info("✅ At least one tee time row is visible. Proceeding to parse HTML.")
-                # --- END IMPORTANT CHANGE ---
-
-                logging.info("📄 Parsing tee sheet content.")
-                # No need to wait for div.member_sheet_table again, as we just waited for its child rows
-                tee_sheet_html = iframe.content()
-                
-                # DEBUG: Temporarily log the full HTML to Render logs for inspection
-                # logging.info(f"DEBUG: Full Tee Sheet HTML Content:\n{tee_sheet_html[:10000]}...") # Log first 10000 chars
-
-                soup = BeautifulSoup(tee_sheet_html, "html.parser")
-                tee_sheet_table = soup.find("div", class_="member_sheet_table")
-
-                if not tee_sheet_table:
-                    logging.warning("⚠️ Tee sheet container not found in HTML. Check selector or page load.")
-                    take_screenshot(page, "error_tee_sheet_table_missing")
-                    return ["No tee sheet table found."]
-
-                logging.info("✅ Tee sheet container found in HTML.")
-                
-                found = []
-                # Use the same parsing logic as main.py
-                for row in tee_sheet_table.find_all("div", class_="rwdTr"):
-                    cols = row.find_all("div", class_="rwdTd")
-                    if len(cols) >= 5:
-                        try:
-                            time_element = cols[0].find("div", class_="time_slot") or cols[0].find("a", class_="teetime_button")
-                            time_text = time_element.get_text(strip=True) if time_element else ""
-                            course = cols[2].get_text(strip=True)
-                            open_slots_text = cols[4].get_text(strip=True)
-
-                            row_time_obj = datetime.strptime(time_text, "%I:%M %p").time()
-
-                            if START_TIME <= row_time_obj <= END_TIME and "Open" in open_slots_text:
-                                num_open = open_slots_text.split(" ")[0]
-                                msg = f"{time_text} - {course} - {num_open} slots open"
-                                found.append(msg)
-                        except ValueError:
-                            continue
-                        except IndexError:
-                            continue
-
-                previous = []
-                if os.path.exists(CACHE_FILE):
-                    try:
-                        with open(CACHE_FILE, "r") as f:
-                            previous_data = json.load(f)
-                            previous = previous_data.get("results", [])
-                    except json.JSONDecodeError:
-                        logging.warning(f"Malformed {CACHE_FILE}, starting fresh for previous times.")
-                        previous = []
-                
-                if "No new tee times" in previous and len(previous) > 1:
-                    previous = [item for item in previous if item != "No new tee times"]
-
-                new_times = [t for t in found if t not in previous]
-
-                current_results = found if found else ["No new tee times found for the selected criteria."]
-                
-                with open(CACHE_FILE, "w") as cache_file:
-                    json.dump({"results": current_results}, cache_file)
-
-
-                if new_times:
-                    logging.info("✅ New tee times found:\n" + "\\n".join(new_times))
-                    with open(LOG_FILE, "w") as f:
-                        f.write("\n".join(found)) # Overwrite log with current found times
-                    send_email("New Tee Times Available", "\n".join(new_times))
-                    return found # Return all found times, not just new ones, for consistency with UI
-                else:
-                    logging.info("🟢 No new tee times found (or no changes since last check).")
-                    return found # Return all found times even if no new ones
+    # Don't launch a browser just to fail the same way again
+    allowed, reason = breaker.allow()
+    if not allowed:
+        logging.warning(f"⛔ Skipping check: {reason}")
+        return [f"Skipped: {reason}"]
 
+    timings = []
+    run_id = artifact_store.begin_run()
 
+    def scrape(page):
+        try:
+            # 1. Navigate to tee sheet (logs in only if the saved session has expired)
+            with step(timings, "tee_sheet_navigation"):
+                pool.open_tee_sheet(page)
+            take_screenshot(page, run_id, "after_tee_sheet_navigation")
+            with step(timings, "iframe_load"):
+                iframe = _open_sheet_iframe(page, run_id)
+
+            slots_by_date = {}
+            for date_str, (check_day, windows) in targets_by_date.items():
+                _select_date(page, iframe, date_str, check_day, timings, run_id)
+                with step(timings, "parse"):
+                    html = _sheet_html(iframe)
+                    slots = parse_sheet_rows(html)
+                replay.save_sheet(date_str, html)
+                if slots is None:
+                    raise LayoutChanged("No tee sheet table found.")
+                slots_by_date[date_str] = slots
+            _sample_page_memory(page)
+            return slots_by_date
         except Exception as e:
-            logging.error(f"💥 Error during scraping: {e}")
-            error_message = f"An error occurred during scraping: {e}"
-            take_screenshot(page, "error_state")
-            
-            with open(CACHE_FILE, "w") as cache_file:
-                json.dump({"results": [error_message]}, cache_file)
-            return [error_message]
+            take_screenshot(page, run_id, f"error_{classify(e)}", error=True)
+            raise
+
+    def fetch_direct():
+        # The browser is only used (inside the fetcher) to log in and export cookies
+        fetcher = get_fetcher()
+        slots_by_date = {}
+        for date_str in targets_by_date:
+            logging.info(f"🌐 Fetching tee sheet for {date_str} directly over HTTP.")
+            with step(timings, "sheet_fetch"):
+                html = fetcher.fetch_sheet(date_str)
+            replay.save_sheet(date_str, html)
+            with step(timings, "parse"):
+                slots = parse_sheet_rows(html)
+            if slots is None:
+                raise LayoutChanged("No tee sheet table found.")
+            slots_by_date[date_str] = slots
+        return slots_by_date
+
+    # Every line logged for this check (on the browser thread too) carries its run_id
+    with log_context(run_id=run_id), breaker.guard():
+        pool = get_pool()
+        savings = resource_policy.begin("sync")
+        started = time.perf_counter()
+        try:
+            slots_by_date = fetch_direct() if FETCH_MODE == "http" else pool.run(scrape)
+        except Exception as e:
+            return record_check_failure(run_id, e, time.perf_counter() - started)
         finally:
-            if browser:
-                browser.close()
-                logging.info("Browser closed.")
+            log_timings(timings)
+            resource_policy.log_savings(savings)
+
+        artifact_store.finish_run(run_id)
+        found = publish_results(targets_by_date, slots_by_date)
+        breaker.record_success()
+        if FETCH_MODE != "http":
+            browser_worked()
+        metrics.observe("check", time.perf_counter() - started)
+        return found
+
+
+def record_check_failure(run_id, exc, elapsed):
+    """
+    Classify a failed check and record it everywhere that cares.
+    The slot store keeps the last good snapshot; only the run status changes.
+    """
+    kind = classify(exc)
+    error_message = f"Error: {exc}" if kind == AUTH else f"An error occurred during scraping: {exc}"
+    logging.error(f"💥 Check failed ({kind}): {exc}")
+    metrics.observe("check", elapsed, ok=False)
+    metrics.count("check_failures_total", kind=kind)
+    artifact_store.finish_run(run_id, error=error_message)
+    get_store().record_run(error=error_message, error_kind=kind)
+    breaker.record_failure(kind)
+    result_cache.invalidate(CHECK)
+    return [error_message]
+
+
+def _sample_page_memory(page):
+    # Chromium's own heap figures for /metrics; one CDP round trip per check
+    try:
+        session = page.context.new_cdp_session(page)
+        session.send("Performance.enable")
+        record_page_memory(session.send("Performance.getMetrics"))
+        session.detach()
+    except Exception as e:
+        logging.debug(f"Could not sample browser memory: {e}")
+
+
+def _open_sheet_iframe(page, run_id):
+    # Wait for the ForeTees iframe to attach, then for its calendar to render.
+    # The calendar is the first thing the date step needs, so it is the readiness signal.
+    logging.info("🔍 Searching for iframe 'ifrforetees'.")
+    iframe_handle = wait_for_layout(page, SHEET_IFRAME_SELECTOR, "ForeTees iframe", state="attached")
+    iframe = iframe_handle.content_frame()
+    # Loading the iframe is a network wait; once it has loaded, a missing calendar means the layout changed
+    iframe.wait_for_load_state("domcontentloaded", timeout=NAV_TIMEOUT_MS)
+    logging.info("✅ Found iframe 'ifrforetees'. Waiting for its calendar (#member_select_calendar1).")
+    wait_for_layout(iframe, "#member_select_calendar1", "Tee sheet calendar")
+    take_screenshot(page, run_id, "after_iframe_calendar_ready")
+    return iframe
+
+
+def _mark_rows_stale(iframe):
+    return iframe.evaluate(MARK_ROWS_STALE_JS)
+
+
+def _wait_for_fresh_rows(iframe):
+    iframe.wait_for_selector(FRESH_ROWS_SELECTOR, state="attached", timeout=STEP_TIMEOUT_MS)
+
 
+def _select_date(page, iframe, date_str, CHECK_DAY, timings, run_id):
+    # 2. Select the correct date from the calendar
+    with step(timings, "date_click"):
+        current_day = iframe.locator("td.ui-datepicker-current-day a")
+        already_selected = current_day.count() > 0 and current_day.first.inner_text().strip() == CHECK_DAY
+        has_rows = iframe.locator(ROWS_SELECTOR).count() > 0
 
-def get_cached_tee_times():
-    if os.path.exists(CACHE_FILE):
+        if already_selected and has_rows:
+            logging.info(f"📆 {date_str} (Day: {CHECK_DAY}) is already selected. Skipping the date click.")
+        else:
+            _mark_rows_stale(iframe)
+            logging.info(f"📆 Clicking on target date: {date_str} (Day: {CHECK_DAY})")
+            try:
+                iframe.locator(f"td a:has-text('{CHECK_DAY}')").first.click(timeout=STEP_TIMEOUT_MS)
+            except Exception as click_e:
+                logging.warning(f"Could not click date '{CHECK_DAY}' directly: {click_e}. Trying alternative.")
+                iframe.locator(f"//td[contains(@class, 'ui-datepicker-week-end') or contains(@class, 'ui-datepicker-unselectable') or contains(@class, 'ui-datepicker-current-day')]//a[text()='{CHECK_DAY}']").click(timeout=STEP_TIMEOUT_MS)
+
+            logging.info("⏳ Waiting for the tee sheet rows for the new date.")
+            _wait_for_fresh_rows(iframe)
+            take_screenshot(page, run_id, "after_date_selection")
+
+    with step(timings, "course_select"):
+        # One query for the dropdown that offers '-ALL-' instead of serialising every <select>
+        course_select = iframe.locator(f"select:has(option:text-is('{ALL_COURSES}'))").first
+        if course_select.count() == 0:
+            logging.warning(f"❌ '{ALL_COURSES}' course option not found on the tee sheet.")
+            take_screenshot(page, run_id, "course_all_not_found", error=True)
+        elif course_select.evaluate(SELECTED_OPTION_JS) == ALL_COURSES:
+            logging.info(f"✅ Course already set to '{ALL_COURSES}'.")
+        else:
+            _mark_rows_stale(iframe)
+            course_select.select_option(label=ALL_COURSES)
+            logging.info(f"✅ Course set to '{ALL_COURSES}'. Waiting for the refreshed rows.")
+            _wait_for_fresh_rows(iframe)
+            take_screenshot(page, run_id, "after_course_select")
+
+    with step(timings, "row_wait"):
+        logging.info("⏳ Waiting for tee time rows (div.rwdTr) to be visible in the tee sheet table.")
+        iframe.wait_for_selector(ROWS_SELECTOR, state='visible', timeout=STEP_TIMEOUT_MS)
+        logging.info("✅ At least one tee time row is visible. Proceeding to parse HTML.")
+
+
+def _sheet_html(iframe):
+    # Only the sheet container is parsed, so don't ship the whole iframe document over CDP
+    return iframe.locator("div.member_sheet_table").first.evaluate(SHEET_HTML_JS)
+
+
+def parse_sheet_rows(tee_sheet_html):
+    """Parse every tee time row on the sheet once. Returns a list of TeeSlot, or None without a sheet table."""
+    logging.info("📄 Parsing tee sheet content.")
+    slots = parse_sheet(tee_sheet_html)
+
+    if slots is None:
+        logging.warning("⚠️ Tee sheet container not found in HTML. Check selector or page load.")
+        return None
+
+    logging.info(f"✅ Tee sheet container found in HTML ({len(slots)} tee time rows).")
+    if debug_enabled():
+        for slot in slots:
+            logging.debug(f"Row: {_format_slot(slot)}")
+    return slots
+
+
+def _in_windows(slot, windows):
+    return any(start <= slot.time <= end for start, end in windows)
+
+
+def _format_slot(slot):
+    return f"{slot.time_text} - {slot.course} - {slot.open_count} slots open"
+
+
+def _match_windows(slots, windows, date_label=None):
+    """Format the open slots that fall inside any of the (start, end) windows."""
+    found = []
+    for slot in slots:
+        if slot.open_count and _in_windows(slot, windows):
+            msg = _format_slot(slot)
+            found.append(f"{date_label} {msg}" if date_label else msg)
+    return found
+
+
+def publish_results(targets_by_date, slots_by_date):
+    """Store each date's slots, diff them against the previous scrape and notify on newly opened times."""
+    store = get_store()
+    observations = get_observation_store()
+    label_dates = len(targets_by_date) > 1
+    found = []
+    new_times = []
+    alerts = []
+
+    for date_str, (check_day, windows) in targets_by_date.items():
+        label = date_str if label_dates else None
+        with metrics.span("diff"):
+            diff = store.apply_snapshot(date_str, slots_by_date[date_str])
+        # Subscribers may watch other courses/times than the targets, so every new slot is offered.
+        # A slot with more room than before is offered too, for min_open filters it may now meet.
+        offered = [(slot, 0) for slot in diff.added]
+        offered += [(after, before.open_count) for before, after in diff.changed if after.open_count > before.open_count]
+        # Judged on the history before this scrape, which is only recorded below
+        routine = {slot for slot, _ in offered
+                   if not _in_windows(slot, windows) and observations.usually_open(date_str, slot)}
         try:
-            with open(CACHE_FILE, "r") as f:
-                data = json.load(f)
-                return data.get("results", ["No cached tee times found or error in cache file."])
-        except json.JSONDecodeError:
-            return ["Error reading cached_results.json, file might be corrupted."]
+            with metrics.span("observe"):
+                observations.record(date_str, slots_by_date[date_str], diff)
+        except Exception as e:
+            # History is a nice-to-have; it must never fail the check that produced it
+            logging.error(f"Failed to record observations for {date_str}: {e}")
+        found.extend(_match_windows(slots_by_date[date_str], windows, label))
+        # Only slots that weren't open before count as new; a 1 -> 4 capacity change doesn't
+        new_for_date = _match_windows(diff.added, windows, label)
+        new_times.extend(new_for_date)
+        alerts.extend(SlotAlert(date_str, slot, _format_slot(slot), _in_windows(slot, windows), previous_open,
+                                slot in routine)
+                      for slot, previous_open in offered)
+
+        if diff.has_changes:
+            broadcaster.publish("slots", {
+                "date": date_str,
+                "added": [slot.to_dict() for slot in diff.added],
+                "removed": [slot.to_dict() for slot in diff.removed],
+                "changed": [{"before": before.to_dict(), "after": after.to_dict()} for before, after in diff.changed],
+                "new_times": new_for_date,
+            })
+    store.record_run()
+    result_cache.invalidate(CHECK)
+    # Queued for the background notifier; delivery never holds up the check
+    notifier.notify(alerts)
+
+    if new_times:
+        logging.info("✅ New tee times found:\n" + "\\n".join(new_times))
+        atomic_write(LOG_FILE, "\n".join(found)) # Overwrite log with current found times
+        return found # Return all found times, not just new ones, for consistency with UI
     else:
-        return ["No cached tee times found (cache file does not exist)."]
+        logging.info("🟢 No new tee times found (or no changes since last check).")
+        return found # Return all found times even if no new ones
+
+
+def get_cached_tee_times(targets):
+    """Current open times for `targets` from the slot store, formatted like a fresh check."""
+    store = get_store()
+    status = store.status()
+    if status is None:
+        return ["No cached tee times found (no scrape has run yet)."]
+    if status["last_success_at"] is None:
+        return [status["last_error"]] if status["last_error"] else ["No cached tee times found (no scrape has run yet)."]
+    # After a failed check keep serving the last good snapshot; check_status() marks it stale
+
+    try:
+        targets_by_date = parse_targets(targets)
+    except (KeyError, ValueError) as e:
+        # A bad stored config mustn't take /check down with it; say what's wrong instead
+        return [f"Error: Invalid date/time format in config: {e}"]
+    label_dates = len(targets_by_date) > 1
+    found = []
+    for date_str, (check_day, windows) in targets_by_date.items():
+        if not windows:
+            continue
+        # One index range scan covering every window for the date
+        slots = store.open_slots(date_str, min(start for start, _ in windows), max(end for _, end in windows))
+        found.extend(_match_windows(slots, windows, date_str if label_dates else None))
+    return found if found else ["No new tee times found for the selected criteria."]
+
+
+def check_status():
+    """The last run's outcome, as stored. Only changes when a run is recorded, so it can be cached."""
+    status = get_store().status() or {}
+    return {
+        "last_success_at": status.get("last_success_at"),
+        "last_error": status.get("last_error"),
+        "error_kind": status.get("last_error_kind"),
+        "breaker": breaker.status(),
+    }
+
+
+def check_freshness(status, breaker_status=None):
+    """
+    How fresh the served tee times are as of now, from a `check_status()`.
+    These change with the clock rather than with any write, so they are
+    worked out per request instead of being cached with the results.
+    """
+    last_success = status.get("last_success_at")
+    age = (datetime.now() - datetime.fromisoformat(last_success)).total_seconds() if last_success else None
+    return {
+        "stale": bool(status.get("last_error")) or age is None or age > STALE_AFTER_SECONDS,
+        "age_seconds": round(age) if age is not None else None,
+        "breaker": breaker_status if breaker_status is not None else status.get("breaker"),
+    }
@@ -0,0 +1,104 @@
+import json
+import asyncio
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+
+# CONFIG
+REPLAY_EVENTS = 100        # Kept for clients reconnecting with Last-Event-ID
+SUBSCRIBER_QUEUE_SIZE = 50 # A subscriber this far behind is disconnected and replays on reconnect
+HEARTBEAT_SECONDS = 15     # Keeps proxies from closing idle streams
+
+
+class Subscriber:
+    def __init__(self):
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.lagging = False
+
+
+class EventBroadcaster:
+    """
+    Fan out scraper events to Server-Sent Events subscribers.
+
+    Subscribers are asyncio queues on the app's event loop. Scraper threads
+    call `publish()`, which hands the event to the loop thread-safely, so one
+    loop serves every open stream without a thread per client.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop = None
+        self._subscribers = set()
+        self._recent = deque(maxlen=REPLAY_EVENTS)
+        self._next_id = 1
+
+    def bind(self, loop):
+        self._loop = loop
+
+    def publish(self, event_type, data):
+        with self._lock:
+            event = {"id": self._next_id, "event": event_type, "data": data, "at": datetime.now().isoformat(timespec="seconds")}
+            self._next_id += 1
+            self._recent.append(event)
+            loop = self._loop
+
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._deliver, event)
+        return event["id"]
+
+    def subscribe(self, last_event_id=None):
+        """Register a subscriber on the running loop. Missed events after `last_event_id` are queued first."""
+        subscriber = Subscriber()
+        with self._lock:
+            if last_event_id is not None:
+                for event in self._recent:
+                    if event["id"] > last_event_id and not subscriber.queue.full():
+                        subscriber.queue.put_nowait(event)
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def _deliver(self, event):
+        # Runs on the event loop
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                logging.warning("Event subscriber is too far behind. Disconnecting it.")
+                subscriber.lagging = True
+                self.unsubscribe(subscriber)
+
+    async def stream(self, request, last_event_id=None):
+        """Async generator of SSE-formatted chunks for one client."""
+        subscriber = self.subscribe(last_event_id)
+        try:
+            yield "retry: 3000\n\n"
+            while not subscriber.lagging:
+                if await request.is_disconnected():
+                    break
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), timeout=HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                yield format_sse(event)
+        finally:
+            self.unsubscribe(subscriber)
+
+
+def format_sse(event):
+    payload = json.dumps({"data": event["data"], "at": event["at"]})
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {payload}\n\n"
+
+
+broadcaster = EventBroadcaster()
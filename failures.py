@@ -0,0 +1,170 @@
+import os
+import time
+import logging
+import threading
+import httpx
+from contextlib import contextmanager
+
+# Failure classes
+AUTH = "auth"               # Login rejected or the session can't be established
+SITE_DOWN = "site_down"     # Connection errors, 5xx responses
+LAYOUT_CHANGED = "layout"   # A page loaded but an element that is always there is missing
+TIMEOUT = "timeout"         # The site is up but too slow
+UNKNOWN = "unknown"
+
+KINDS = (AUTH, SITE_DOWN, LAYOUT_CHANGED, TIMEOUT, UNKNOWN)
+
+# CONFIG
+# Consecutive failures of one class before the breaker opens. A rejected login
+# is retried once at most so we don't get the member account locked.
+THRESHOLDS = {AUTH: 2, SITE_DOWN: 3, LAYOUT_CHANGED: 2, TIMEOUT: 3, UNKNOWN: 3}
+# How long the breaker stays open before letting one probe through; doubles
+# each time a probe fails, up to BREAKER_MAX_COOLDOWN_SECONDS.
+COOLDOWNS = {
+    AUTH: float(os.getenv("BREAKER_AUTH_COOLDOWN_SECONDS", "1800")),
+    SITE_DOWN: float(os.getenv("BREAKER_SITE_DOWN_COOLDOWN_SECONDS", "300")),
+    LAYOUT_CHANGED: float(os.getenv("BREAKER_LAYOUT_COOLDOWN_SECONDS", "1800")),
+    TIMEOUT: float(os.getenv("BREAKER_TIMEOUT_COOLDOWN_SECONDS", "120")),
+    UNKNOWN: float(os.getenv("BREAKER_UNKNOWN_COOLDOWN_SECONDS", "300")),
+}
+MAX_COOLDOWN_SECONDS = float(os.getenv("BREAKER_MAX_COOLDOWN_SECONDS", "7200"))
+# A probe that never reported an outcome stops holding up other checks after this long
+PROBE_TIMEOUT_SECONDS = float(os.getenv("BREAKER_PROBE_TIMEOUT_SECONDS", "900"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CheckFailure(Exception):
+    """A check failure whose class is already known where it was raised."""
+    kind = UNKNOWN
+
+
+class SiteDown(CheckFailure):
+    kind = SITE_DOWN
+
+
+class LayoutChanged(CheckFailure):
+    kind = LAYOUT_CHANGED
+
+
+def classify(exc):
+    if isinstance(exc, CheckFailure):
+        return exc.kind
+    if isinstance(exc, (httpx.ConnectError, httpx.RemoteProtocolError, httpx.NetworkError)):
+        return SITE_DOWN
+    if isinstance(exc, httpx.HTTPStatusError):
+        return SITE_DOWN if exc.response.status_code >= 500 else UNKNOWN
+    if isinstance(exc, (TimeoutError, httpx.TimeoutException)):
+        return TIMEOUT
+    # Playwright's errors carry Chromium's net error codes in the message
+    message = str(exc)
+    if "net::ERR_" in message:
+        return TIMEOUT if "net::ERR_TIMED_OUT" in message else SITE_DOWN
+    if type(exc).__name__ == "TimeoutError":
+        return TIMEOUT # playwright.*.TimeoutError doesn't subclass the builtin
+    return UNKNOWN
+
+
+class CircuitBreaker:
+    """
+    Stops checks (and the browser launches they'd cost) while the site keeps failing the same way.
+
+    Closed: checks run. After THRESHOLDS[kind] consecutive failures of one
+    class the breaker opens for COOLDOWNS[kind]. Once that passes it is
+    half-open: exactly one probe check is let through. Success closes the
+    breaker; failure re-opens it, with double the cooldown if it failed the
+    same way again. Callers wrap their check in `guard()` so a probe that
+    raises before recording an outcome doesn't leave the breaker stuck.
+    """
+
+    def __init__(self, thresholds=THRESHOLDS, cooldowns=COOLDOWNS, clock=time.time):
+        self.thresholds = thresholds
+        self.cooldowns = cooldowns
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._kind = None         # Class of the current failure streak
+        self._streak = 0
+        self._opened_at = None
+        self._cooldown = None
+        self._probing = False
+        self._probe_started = None
+        self._probes = 0          # Identifies the current probe for guard()
+
+    def allow(self):
+        """Returns (allowed, reason). In half-open state only the first caller gets to probe."""
+        with self._lock:
+            if self._state == CLOSED:
+                return True, None
+            if self._state == OPEN:
+                remaining = self._opened_at + self._cooldown - self.clock()
+                if remaining > 0:
+                    return False, f"Circuit open after repeated '{self._kind}' failures. Retrying in {remaining:.0f}s."
+                self._state = HALF_OPEN
+                logging.info(f"🔌 Circuit half-open. Probing after '{self._kind}' failures.")
+            if self._probing and self.clock() - self._probe_started < PROBE_TIMEOUT_SECONDS:
+                return False, "Circuit half-open. A probe check is already running."
+            self._probing = True
+            self._probe_started = self.clock()
+            self._probes += 1
+            return True, None
+
+    @contextmanager
+    def guard(self):
+        """Wrap the check after allow(). If it was the probe and ends without an outcome, the next check may probe."""
+        with self._lock:
+            probe = self._probes if self._probing else None
+        try:
+            yield
+        finally:
+            with self._lock:
+                if probe is not None and self._probing and self._probes == probe:
+                    self._probing = False
+                    logging.warning("🔌 Probe check ended without an outcome. The next check will probe again.")
+
+    def record_success(self):
+        with self._lock:
+            if self._state != CLOSED:
+                logging.info("🔌 Probe succeeded. Circuit closed.")
+            self._state = CLOSED
+            self._kind = None
+            self._streak = 0
+            self._cooldown = None
+            self._probing = False
+
+    def record_failure(self, kind):
+        with self._lock:
+            same_kind = kind == self._kind
+            self._streak = self._streak + 1 if same_kind else 1
+            self._kind = kind
+
+            if self._state == HALF_OPEN:
+                # Only a repeat of the same failure backs off further; a new kind starts from its own cooldown
+                cooldown = self.cooldowns.get(kind, COOLDOWNS[UNKNOWN])
+                self._cooldown = min(MAX_COOLDOWN_SECONDS, self._cooldown * 2) if same_kind and self._cooldown else cooldown
+                self._open()
+            elif self._state == CLOSED and self._streak >= self.thresholds.get(kind, THRESHOLDS[UNKNOWN]):
+                self._cooldown = self.cooldowns.get(kind, COOLDOWNS[UNKNOWN])
+                self._open()
+            self._probing = False
+
+    def _open(self):
+        # Caller holds self._lock
+        self._state = OPEN
+        self._opened_at = self.clock()
+        logging.warning(f"🔌 Circuit open: {self._streak} '{self._kind}' failure(s). Pausing checks for {self._cooldown:.0f}s.")
+
+    def status(self):
+        with self._lock:
+            retry_at = self._opened_at + self._cooldown if self._state == OPEN else None
+            return {
+                "state": self._state,
+                "failure_kind": self._kind,
+                "consecutive_failures": self._streak,
+                "retry_in_seconds": round(max(0, retry_at - self.clock())) if retry_at else None,
+            }
+
+
+breaker = CircuitBreaker()
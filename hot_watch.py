@@ -0,0 +1,246 @@
+"""
+Hot-watch: one page parked on the tee sheet for one date, refreshed in place.
+
+Close to a date, cancellations come and go within minutes, and a full check
+pays for navigation (and sometimes a login) every time. A hot watch opens
+the sheet once, then only re-triggers the sheet's own row reload every
+`interval` seconds and re-reads div.member_sheet_table. Changed rows go
+through checker.publish_results like any scrape, so the slot store, result
+cache, /events and notifications all see them.
+
+It stops by itself after `minutes`, after HOT_WATCH_MAX_FAILURES refreshes
+in a row fail, or when stopped. A dropped session is handled by reopening
+the sheet, which logs in again. It runs only on the scraping leader.
+
+It uses a page of the async browser pool whatever CHECK_ENGINE is. With the
+default CHECK_ENGINE=sync that is a second Chromium next to the sync pool's
+(roughly another 150-300 MB on a small instance) for as long as the watch
+runs, so it is closed as soon as the watch ends instead of after
+BROWSER_IDLE_SECONDS. Set CHECK_ENGINE=async to share one browser.
+"""
+import os
+import time
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from checker import (
+    parse_targets, parse_sheet_rows, publish_results, record_check_failure,
+    FRESH_ROWS_SELECTOR, MARK_ROWS_STALE_JS, SHEET_HTML_JS,
+)
+from async_checker import get_async_pool, take_screenshot, _open_sheet_iframe, _select_date
+from scraper import CHECK_ENGINE
+from browser_pool import USERNAME, PASSWORD, LAYOUT_TIMEOUT_MS
+from artifacts import artifact_store
+from slot_store import get_store
+from metrics import metrics
+from failures import breaker, classify, LayoutChanged, AUTH
+from resource_policy import resource_policy
+from log_config import log_context
+
+# CONFIG
+HOT_WATCH_INTERVAL_SECONDS = float(os.getenv("HOT_WATCH_INTERVAL_SECONDS", "15"))
+HOT_WATCH_MIN_INTERVAL_SECONDS = float(os.getenv("HOT_WATCH_MIN_INTERVAL_SECONDS", "5")) # Don't hammer the club's site
+HOT_WATCH_MINUTES = float(os.getenv("HOT_WATCH_MINUTES", "20"))
+HOT_WATCH_MAX_MINUTES = float(os.getenv("HOT_WATCH_MAX_MINUTES", "60"))
+HOT_WATCH_MAX_FAILURES = int(os.getenv("HOT_WATCH_MAX_FAILURES", "3")) # Failed refreshes in a row before giving up
+# How long a refresh waits for the rows to reload. A click that reloads nothing fails fast and the sheet is reopened.
+HOT_WATCH_REFRESH_TIMEOUT_MS = int(os.getenv("HOT_WATCH_REFRESH_TIMEOUT_MS", "10000"))
+# The sheet's own refresh control. Without one on the page, the selected calendar day is clicked again,
+# which makes ForeTees reload the rows the same way.
+HOT_WATCH_REFRESH_SELECTOR = os.getenv(
+    "HOT_WATCH_REFRESH_SELECTOR", "a:has-text('Refresh'), button:has-text('Refresh'), input[value='Refresh']")
+CURRENT_DAY_SELECTOR = "td.ui-datepicker-current-day a"
+
+# States
+IDLE = "idle"
+STARTING = "starting"
+WATCHING = "watching"
+
+
+class HotWatchBusy(RuntimeError):
+    """A hot watch is already running."""
+
+
+class HotWatch:
+    """
+    The single hot watch of this worker. `start()` and `stop()` run on the
+    app's event loop; `status()` is safe from anywhere.
+    """
+
+    def __init__(self, get_pool=get_async_pool):
+        self.get_pool = get_pool
+        self._task = None
+        self._reset()
+        self.last_session = None
+
+    def _reset(self):
+        self.state = IDLE
+        self.date = None
+        self.interval = None
+        self.started_at = None
+        self.ends_at = None
+        self.refreshes = 0
+        self.changes = 0
+        self.reopens = 0
+        self.last_refresh_at = None
+        self.last_error = None
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def start(self, targets, minutes=None, interval=None):
+        """
+        Start watching the date of `targets` (all for one date; a date-only
+        target matches every time). Raises ValueError for bad input and
+        HotWatchBusy if a watch is already running.
+        """
+        if self.running:
+            raise HotWatchBusy(f"Already hot-watching {self.date} until {self.ends_at.strftime('%H:%M:%S')}.")
+        if not USERNAME or not PASSWORD:
+            raise ValueError("Prestonwood login credentials are not set.")
+        targets_by_date = parse_targets(targets)
+        if len(targets_by_date) != 1:
+            raise ValueError("A hot watch covers exactly one date.")
+        date_str = next(iter(targets_by_date))
+        if datetime.strptime(date_str, "%m/%d/%Y").date() < datetime.now().date():
+            raise ValueError(f"{date_str} is in the past.")
+        minutes = min(float(minutes or HOT_WATCH_MINUTES), HOT_WATCH_MAX_MINUTES)
+        interval = max(float(interval or HOT_WATCH_INTERVAL_SECONDS), HOT_WATCH_MIN_INTERVAL_SECONDS)
+
+        self._reset()
+        self.state = STARTING
+        self.date = date_str
+        self.interval = interval
+        self.started_at = datetime.now()
+        self.ends_at = self.started_at + timedelta(minutes=minutes)
+        run_id = artifact_store.begin_run()
+        with log_context(run_id=run_id, stage="hot_watch"): # The task keeps a copy of this context
+            self._task = asyncio.get_running_loop().create_task(self._run(targets_by_date, minutes * 60, run_id))
+        logging.info(f"🔥 Hot-watching {date_str} every {interval:.0f}s for {minutes:.0f} min.")
+        if CHECK_ENGINE != "async":
+            logging.info("🔥 CHECK_ENGINE is sync, so the hot watch runs its own Chromium until it ends.")
+        return self.status()
+
+    async def stop(self):
+        if self.running:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def status(self):
+        return {
+            "state": self.state, "date": self.date, "interval_seconds": self.interval,
+            "started_at": self.started_at.isoformat(timespec="seconds") if self.started_at else None,
+            "ends_at": self.ends_at.isoformat(timespec="seconds") if self.ends_at else None,
+            "refreshes": self.refreshes, "changes": self.changes, "reopens": self.reopens,
+            "last_refresh_at": self.last_refresh_at, "last_error": self.last_error,
+            "last_session": self.last_session,
+        }
+
+    # --- Event loop task ---
+
+    async def _run(self, targets_by_date, seconds, run_id):
+        date_str, (check_day, _) = next(iter(targets_by_date.items()))
+        deadline = time.monotonic() + seconds
+        pool = self.get_pool()
+        savings = resource_policy.begin("async") # Its own browser with CHECK_ENGINE=sync, shared with checks otherwise
+        started = time.perf_counter()
+        outcome = "time limit reached"
+        try:
+            async with pool.page() as page:
+                iframe = None
+                last_html = None
+                failures = 0
+                while time.monotonic() < deadline:
+                    try:
+                        if iframe is None:
+                            if self.state == WATCHING:
+                                self.reopens += 1
+                            iframe = await self._open(pool, page, date_str, check_day, run_id)
+                            self.state = WATCHING
+                            html = await _rows_html(iframe) # Just loaded; no refresh needed yet
+                        else:
+                            with metrics.span("hot_refresh"):
+                                html = await self._refresh(iframe)
+                            failures = 0 # Reopening alone doesn't count: the refresh itself may be what's broken
+                    except Exception as e:
+                        failures += 1
+                        kind = classify(e)
+                        self.last_error = f"{kind}: {e}"
+                        metrics.count("hot_watch_failures_total", kind=kind)
+                        # A rejected login won't get better by retrying every few seconds
+                        if failures >= HOT_WATCH_MAX_FAILURES or kind == AUTH:
+                            await take_screenshot(page, run_id, f"error_hot_watch_{kind}", error=True)
+                            raise
+                        logging.warning(f"⚠️ Hot-watch refresh failed ({e}). Reopening the tee sheet.")
+                        iframe = None # Reopening logs in again if the session dropped
+                        continue
+
+                    self.refreshes += 1
+                    self.last_refresh_at = datetime.now().isoformat(timespec="seconds")
+                    changed = html != last_html
+                    if changed:
+                        # Only a changed sheet is parsed, diffed and published
+                        slots = await asyncio.to_thread(parse_sheet_rows, html)
+                        if slots is None:
+                            raise LayoutChanged("No tee sheet table found.")
+                        await asyncio.to_thread(publish_results, targets_by_date, {date_str: slots})
+                        self.changes += last_html is not None
+                        last_html = html
+                    else:
+                        # Nothing moved, but the served results are fresh as of now
+                        await asyncio.to_thread(get_store().record_run)
+                    metrics.count("hot_watch_refreshes_total", changed=str(changed).lower())
+                    breaker.record_success()
+                    await asyncio.sleep(max(0, min(self.interval, deadline - time.monotonic())))
+            artifact_store.finish_run(run_id)
+        except asyncio.CancelledError:
+            outcome = "stopped"
+            artifact_store.finish_run(run_id)
+            raise
+        except Exception as e:
+            outcome = f"failed: {e}"
+            await asyncio.to_thread(record_check_failure, run_id, e, time.perf_counter() - started)
+        finally:
+            self.last_session = {
+                "date": date_str, "outcome": outcome, "refreshes": self.refreshes, "changes": self.changes,
+                "reopens": self.reopens, "ended_at": datetime.now().isoformat(timespec="seconds"),
+            }
+            logging.info(f"🔥 Hot watch of {date_str} ended ({outcome}): {self.refreshes} refreshes, "
+                         f"{self.changes} changes, {self.reopens} reopens.")
+            resource_policy.log_savings(savings)
+            self.state = IDLE
+            if CHECK_ENGINE != "async":
+                await pool.close_if_idle() # The sync pool does the regular checks; don't keep a second browser around
+
+    async def _open(self, pool, page, date_str, check_day, run_id):
+        """Navigate to the sheet (logging in again if the session dropped) and select the date."""
+        timings = []
+        await pool.open_tee_sheet(page)
+        iframe = await _open_sheet_iframe(page, run_id)
+        await _select_date(page, iframe, date_str, check_day, timings, run_id)
+        return iframe
+
+    async def _refresh(self, iframe):
+        """Make the sheet reload its rows and return the new rows container's HTML."""
+        if iframe.is_detached():
+            raise RuntimeError("The tee sheet iframe went away (session dropped or page reloaded).")
+        await iframe.evaluate(MARK_ROWS_STALE_JS)
+        refresh = iframe.locator(HOT_WATCH_REFRESH_SELECTOR).first if HOT_WATCH_REFRESH_SELECTOR else None
+        if refresh is not None and await refresh.count():
+            await refresh.click(timeout=LAYOUT_TIMEOUT_MS)
+        else:
+            await iframe.locator(CURRENT_DAY_SELECTOR).first.click(timeout=LAYOUT_TIMEOUT_MS)
+        # A login form or error page in place of the rows ends here too, and _run reopens the sheet
+        await iframe.wait_for_selector(FRESH_ROWS_SELECTOR, state="attached", timeout=HOT_WATCH_REFRESH_TIMEOUT_MS)
+        return await _rows_html(iframe)
+
+
+async def _rows_html(iframe):
+    return await iframe.locator("div.member_sheet_table").first.evaluate(SHEET_HTML_JS)
+
+
+hot_watch = HotWatch()
@@ -0,0 +1,151 @@
+import os
+import uuid
+import queue
+import logging
+import threading
+from datetime import datetime
+
+# CONFIG
+# Every scrape drives a Chromium page, so keep this at what the host can run.
+MAX_WORKERS = int(os.getenv("SCRAPER_MAX_WORKERS", "1"))
+# Jobs waiting for a worker. Further submissions are rejected until one drains.
+MAX_QUEUED = int(os.getenv("SCRAPER_MAX_QUEUED", "5"))
+# Finished jobs kept around for /jobs status lookups
+JOB_HISTORY = int(os.getenv("SCRAPER_JOB_HISTORY", "50"))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class QueueFull(Exception):
+    """Raised when a job is submitted while the queue is at MAX_QUEUED."""
+
+
+class Job:
+    def __init__(self, key, fn, args, kwargs):
+        self.id = uuid.uuid4().hex[:12]
+        self.key = key
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.status = QUEUED
+        self.created_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.done = threading.Event() # Set once the job has finished either way
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "key": list(self.key),
+            "status": self.status,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobQueue:
+    """
+    Bounded scrape queue with a fixed number of worker threads.
+
+    Jobs are keyed (e.g. by date/start/end); submitting a key that is already
+    queued or running returns the existing job instead of starting another
+    browser for the same work.
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS, max_queued=MAX_QUEUED, history=JOB_HISTORY):
+        self.max_workers = max(1, max_workers)
+        self.max_queued = max_queued
+        self.history = history
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._jobs = {}     # id -> Job, insertion ordered
+        self._active = {}   # key -> Job that is queued or running
+        self._workers = []
+
+    def submit(self, key, fn, *args, **kwargs):
+        """Queue `fn(*args, **kwargs)`. Returns (job, created)."""
+        with self._lock:
+            existing = self._active.get(key)
+            if existing:
+                return existing, False
+
+            queued = sum(1 for job in self._active.values() if job.status == QUEUED)
+            if queued >= self.max_queued:
+                raise QueueFull(f"Scraper queue is full ({queued} jobs waiting).")
+
+            job = Job(key, fn, args, kwargs)
+            self._jobs[job.id] = job
+            self._active[key] = job
+            self._prune()
+            self._start_workers()
+
+        self._queue.put(job)
+        logging.info(f"Queued scraper job {job.id} for {key}.")
+        return job, True
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.to_dict() if job else None
+
+    def list(self):
+        with self._lock:
+            return [job.to_dict() for job in reversed(self._jobs.values())]
+
+    def stats(self):
+        with self._lock:
+            statuses = [job.status for job in self._active.values()]
+            return {
+                "workers": self.max_workers,
+                "running": statuses.count(RUNNING),
+                "queued": statuses.count(QUEUED),
+                "max_queued": self.max_queued,
+            }
+
+    def _start_workers(self):
+        # Caller holds self._lock
+        while len(self._workers) < self.max_workers:
+            worker = threading.Thread(target=self._work, name=f"scraper-worker-{len(self._workers)}", daemon=True)
+            self._workers.append(worker)
+            worker.start()
+
+    def _prune(self):
+        # Caller holds self._lock. Drop the oldest finished jobs beyond the history limit.
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in (DONE, FAILED)]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job_id]
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                job.status = RUNNING
+                job.started_at = datetime.now()
+            logging.info(f"Running scraper job {job.id}.")
+
+            try:
+                result = job.fn(*job.args, **job.kwargs)
+                status, error = DONE, None
+            except Exception as e:
+                logging.error(f"Scraper job {job.id} failed: {e}")
+                result, status, error = None, FAILED, str(e)
+
+            with self._lock:
+                job.result = result
+                job.error = error
+                job.status = status
+                job.finished_at = datetime.now()
+                self._active.pop(job.key, None)
+            job.done.set()
+            self._queue.task_done()
+
+
+scrape_queue = JobQueue()
@@ -0,0 +1,247 @@
+"""
+Logging for the app: records are queued and written by a background thread.
+
+`logging.info()` on a check thread or the event loop only puts the record
+on a queue. A QueueListener thread formats it and writes it:
+
+- to the console, as the familiar "time - message" lines
+- once file logging is on (at app startup), to LOG_DIR/tee_times_<date>.log
+  as one JSON object per line, with the run_id and stage it was logged in.
+  With WEB_CONCURRENCY > 1 each worker process writes its own
+  tee_times_<date>.<pid>.log, since rotating one file from several
+  processes would have them rename it under each other.
+
+The log file starts over every day and every LOG_MAX_MB; at most
+LOG_BACKUPS extra files are kept per day and days older than
+LOG_RETENTION_DAYS are deleted.
+
+LOG_LEVEL=DEBUG (or POST /logging?debug=true at runtime) turns on verbose
+logging. Verbose loops check `debug_enabled()` first, so they cost nothing
+when it's off.
+"""
+import os
+import copy
+import json
+import time
+import queue
+import logging
+import threading
+import contextvars
+import logging.handlers
+from contextlib import contextmanager
+from datetime import datetime
+
+# CONFIG
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_DIR = os.getenv("LOG_DIR", "logs")
+LOG_MAX_BYTES = int(float(os.getenv("LOG_MAX_MB", "10")) * 1024 * 1024)
+LOG_BACKUPS = int(os.getenv("LOG_BACKUPS", "5"))             # Extra files per day once LOG_MAX_MB is reached
+LOG_RETENTION_DAYS = int(os.getenv("LOG_RETENTION_DAYS", "7"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))   # Records beyond this are dropped rather than block a check
+LOG_PREFIX = "tee_times"
+# Several uvicorn workers each get their own file (see the module docstring)
+LOG_PER_PROCESS = int(os.getenv("WEB_CONCURRENCY", "1")) > 1
+CONSOLE_FORMAT = "%(asctime)s - %(message)s"
+
+_context = contextvars.ContextVar("log_context", default={})
+
+
+@contextmanager
+def log_context(**fields):
+    """Attach `fields` (run_id, stage) to every record logged inside the block, in this thread or task."""
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def debug_enabled():
+    return logging.getLogger().isEnabledFor(logging.DEBUG)
+
+
+def set_debug(enabled):
+    logging.getLogger().setLevel(logging.DEBUG if enabled else (LOG_LEVEL if LOG_LEVEL != "DEBUG" else logging.INFO))
+    logging.info(f"🪵 Debug logging {'on' if enabled else 'off'}.")
+
+
+class ContextFilter(logging.Filter):
+    """Copies the log_context fields onto the record on the thread that logged it, before it is queued."""
+
+    def filter(self, record):
+        context = _context.get()
+        record.run_id = context.get("run_id")
+        record.stage = context.get("stage")
+        return True
+
+
+_traceback_formatter = logging.Formatter()
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "msg": record.getMessage(),
+            "logger": record.name,
+            "thread": record.threadName,
+            "run_id": getattr(record, "run_id", None),
+            "stage": getattr(record, "stage", None),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """A QueueHandler that never blocks: when the listener falls behind, records are dropped and counted."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        """
+        Like QueueHandler.prepare, but the traceback stays in `exc_text`
+        instead of being folded into `msg`, so JSON lines keep it apart.
+        """
+        record = copy.copy(record)
+        record.message = record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or _traceback_formatter.formatException(record.exc_info)
+            record.exc_info = None # As the stdlib does; the frames needn't live on in the queue
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class DailyRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    <directory>/<prefix>_<YYYY-MM-DD><suffix>.log, switching to a new file at
+    midnight and rolling over to .1, .2... within a day at `max_bytes`.
+    Files of days older than `retention_days` are deleted at each switch.
+    Only one process may write a given file.
+    """
+
+    def __init__(self, directory=LOG_DIR, prefix=LOG_PREFIX, max_bytes=LOG_MAX_BYTES,
+                 backups=LOG_BACKUPS, retention_days=LOG_RETENTION_DAYS, suffix=""):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.prefix = prefix
+        self.suffix = suffix
+        self.retention_days = retention_days
+        self.day = time.strftime("%Y-%m-%d")
+        super().__init__(self._path(self.day), maxBytes=max_bytes, backupCount=backups, encoding="utf-8", delay=True)
+        self._prune()
+
+    def _path(self, day):
+        return os.path.join(self.directory, f"{self.prefix}_{day}{self.suffix}.log")
+
+    def shouldRollover(self, record):
+        if time.strftime("%Y-%m-%d", time.localtime(record.created)) != self.day:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        day = time.strftime("%Y-%m-%d")
+        if day == self.day:
+            return super().doRollover()
+        if self.stream:
+            self.stream.close()
+            self.stream = None # Reopened on the next emit
+        self.day = day
+        self.baseFilename = os.path.abspath(self._path(day))
+        self._prune()
+
+    def _prune(self):
+        cutoff = time.time() - self.retention_days * 86400
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.startswith(self.prefix + "_") and path != self.baseFilename and not path.startswith(self.baseFilename + "."):
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                except OSError:
+                    continue
+
+
+_lock = threading.Lock()
+_queue_handler = None
+_listener = None
+_handlers = []
+
+
+def _console_handler():
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+    return handler
+
+
+def _start_listener(handlers):
+    global _listener, _handlers
+    if _listener:
+        _listener.stop() # Writes out everything already queued first
+    _handlers = handlers
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def configure_logging():
+    """Route the root logger through the queue, to the console for now. Safe to call more than once."""
+    global _queue_handler
+    with _lock:
+        if _queue_handler is not None:
+            return
+        _queue_handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+        _queue_handler.addFilter(ContextFilter())
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(_queue_handler)
+        root.setLevel(LOG_LEVEL)
+        _start_listener([_console_handler()])
+
+
+def add_file_logging():
+    """Also write JSON lines to LOG_DIR. Called at startup rather than on import."""
+    configure_logging()
+    with _lock:
+        if any(isinstance(h, DailyRotatingFileHandler) for h in _handlers):
+            return
+        file_handler = DailyRotatingFileHandler(suffix=f".{os.getpid()}" if LOG_PER_PROCESS else "")
+        file_handler.setFormatter(JsonFormatter())
+        _start_listener(_handlers + [file_handler])
+
+
+def stop_logging():
+    """Write out what's queued and close the files (at shutdown). Later records go straight to the console."""
+    global _listener, _queue_handler, _handlers
+    with _lock:
+        if _listener:
+            _listener.stop()
+            _listener = None
+        for handler in _handlers:
+            handler.close()
+        _handlers = []
+        if _queue_handler:
+            root = logging.getLogger()
+            root.removeHandler(_queue_handler)
+            root.addHandler(_console_handler())
+            _queue_handler = None
+
+
+def status():
+    return {
+        "level": logging.getLevelName(logging.getLogger().level),
+        "queued": _queue_handler.queue.qsize() if _queue_handler else 0,
+        "dropped": _queue_handler.dropped if _queue_handler else 0,
+        "files": [h.baseFilename for h in _handlers if isinstance(h, logging.FileHandler)],
+    }
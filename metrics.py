@@ -0,0 +1,308 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+# CONFIG
+SAMPLE_WINDOW = int(os.getenv("METRICS_SAMPLE_WINDOW", "500")) # Recent durations per stage kept for p50/p95
+# Histogram buckets (seconds) for /metrics; stages range from a few ms (parse) to tens of seconds (login)
+BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+PREFIX = "teetimes"
+
+SUCCESS = "success"
+FAILURE = "failure"
+
+
+class StageStats:
+    def __init__(self):
+        self.samples = deque(maxlen=SAMPLE_WINDOW)
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.outcomes = {SUCCESS: 0, FAILURE: 0}
+
+    def observe(self, seconds, ok):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+        self.outcomes[SUCCESS if ok else FAILURE] += 1
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+
+
+class SpanTimer:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stopped = None
+
+    @property
+    def elapsed(self):
+        return (self.stopped or time.perf_counter()) - self.started
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[rank]
+
+
+class Metrics:
+    """
+    In-process stage timings, outcome counters, event counters and gauges.
+
+    Check stages report through `observe()` (checker.step does this for every
+    step) or the `span()` context manager. `render_prometheus()` produces the
+    text exposition format for /metrics and `summary()` the /stats JSON.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._gauges = {} # (name, labels tuple) -> value
+        self._counters = {} # (name, labels tuple) -> count
+        self.profiler = None # A StageProfiler while benchmarking
+
+    def observe(self, stage, seconds, ok=True):
+        with self._lock:
+            stats = self._stages.get(stage)
+            if stats is None:
+                stats = self._stages[stage] = StageStats()
+            stats.observe(seconds, ok)
+
+    @contextmanager
+    def span(self, stage):
+        """Time a block as `stage`; an exception leaving the block counts as a failure. Yields a SpanTimer."""
+        profiler = self.profiler
+        token = profiler.start(stage) if profiler else None
+        timer = SpanTimer()
+        ok = False
+        try:
+            yield timer
+            ok = True
+        finally:
+            timer.stopped = time.perf_counter()
+            self.observe(stage, timer.elapsed, ok)
+            if token is not None:
+                profiler.stop(token, timer.elapsed)
+
+    def count(self, name, amount=1, **labels):
+        """Add to a counter; `name` is without the teetimes_ prefix."""
+        key = (f"{PREFIX}_{name}", tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self._gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def summary(self):
+        with self._lock:
+            stages = {name: (sorted(s.samples), s.count, s.total, dict(s.outcomes)) for name, s in self._stages.items()}
+            gauges = dict(self._gauges)
+            counters = dict(self._counters)
+
+        result = {"stages": {}, "counters": {}, "gauges": {}}
+        for name, (samples, count, total, outcomes) in sorted(stages.items()):
+            result["stages"][name] = {
+                "count": count,
+                "failures": outcomes[FAILURE],
+                "mean_seconds": round(total / count, 4) if count else None,
+                "p50_seconds": _round(percentile(samples, 0.50)),
+                "p95_seconds": _round(percentile(samples, 0.95)),
+                "max_seconds": _round(samples[-1] if samples else None),
+                "window": len(samples),
+            }
+        for (name, labels), value in sorted(counters.items()):
+            key = name[len(PREFIX) + 1:] + "".join(f"[{v}]" for _, v in labels)
+            result["counters"][key] = value
+        for (name, labels), value in sorted(gauges.items()):
+            key = name[len(PREFIX) + 1:] + "".join(f"[{v}]" for _, v in labels)
+            result["gauges"][key] = value
+        for key, value in process_memory().items():
+            result["gauges"][key] = value
+        return result
+
+    def render_prometheus(self):
+        with self._lock:
+            stages = {name: (list(s.buckets), s.count, s.total, dict(s.outcomes)) for name, s in self._stages.items()}
+            gauges = dict(self._gauges)
+            counters = dict(self._counters)
+
+        lines = [
+            f"# HELP {PREFIX}_stage_seconds Time spent in each stage of a tee time check.",
+            f"# TYPE {PREFIX}_stage_seconds histogram",
+        ]
+        for name, (buckets, count, total, _) in sorted(stages.items()):
+            for bound, value in zip(BUCKETS, buckets):
+                lines.append(f'{PREFIX}_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {value}')
+            lines.append(f'{PREFIX}_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {count}')
+            lines.append(f'{PREFIX}_stage_seconds_sum{{stage="{name}"}} {total:.6f}')
+            lines.append(f'{PREFIX}_stage_seconds_count{{stage="{name}"}} {count}')
+
+        lines.append(f"# HELP {PREFIX}_stage_total Completed stages by outcome.")
+        lines.append(f"# TYPE {PREFIX}_stage_total counter")
+        for name, (_, _, _, outcomes) in sorted(stages.items()):
+            for outcome, value in outcomes.items():
+                lines.append(f'{PREFIX}_stage_total{{stage="{name}",outcome="{outcome}"}} {value}')
+
+        seen = set()
+        for (name, labels), value in sorted(counters.items()):
+            if name not in seen:
+                lines.append(f"# TYPE {name} counter")
+                seen.add(name)
+            label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+        memory = process_memory()
+        gauges.update({(f"{PREFIX}_process_rss_bytes", (("process", key.split("_")[0]),)): value for key, value in memory.items()})
+        seen = set()
+        for (name, labels), value in sorted(gauges.items()):
+            if name not in seen:
+                lines.append(f"# TYPE {name} gauge")
+                seen.add(name)
+            label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _round(value):
+    return round(value, 4) if value is not None else None
+
+
+def _rss_bytes(pid):
+    with open(f"/proc/{pid}/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def _cpu_seconds(pid):
+    with open(f"/proc/{pid}/stat") as f:
+        # The command name may contain spaces; utime/stime are the 12th/13th fields after ')'
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def _child_pids():
+    """Every process descended from this one (Playwright's driver and Chromium)."""
+    parents = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    parents[int(entry)] = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+
+    children, frontier = [], [os.getpid()]
+    while frontier:
+        parent = frontier.pop()
+        for pid, ppid in parents.items():
+            if ppid == parent:
+                children.append(pid)
+                frontier.append(pid)
+    return children
+
+
+def _sum_over(pids, read):
+    total = 0
+    for pid in pids:
+        try:
+            total += read(pid)
+        except OSError:
+            continue # Exited while we were looking
+    return total
+
+
+def process_memory():
+    """
+    RSS of this process and of everything it spawned. Read from /proc, so
+    it's empty on platforms without one.
+    """
+    if not os.path.isdir("/proc/self"):
+        return {}
+    try:
+        return {"app_rss_bytes": _rss_bytes(os.getpid()), "children_rss_bytes": _sum_over(_child_pids(), _rss_bytes)}
+    except OSError as e:
+        logging.warning(f"Failed to read process memory: {e}")
+        return {}
+
+
+class StageProfiler:
+    """
+    CPU time and peak RSS per stage, for benchmarks.
+
+    CPU is read from /proc for this process and its children at the start
+    and end of each stage. A sampler thread polls total RSS every
+    `interval` seconds and raises the peak of every stage open at the time.
+    Overlapping stages (the async checker) each see the whole process tree.
+    That is too much /proc scanning to leave on for every production check.
+    """
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._open = {}     # token -> [stage, app_cpu, child_cpu, peak_rss]
+        self._results = {}  # stage -> list of (wall, app_cpu, child_cpu, peak_rss)
+        self._next = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample_loop, name="stage-profiler", daemon=True)
+        self._thread.start()
+
+    def _snapshot(self):
+        children = _child_pids()
+        app_rss = _rss_bytes(os.getpid())
+        return (_cpu_seconds(os.getpid()), _sum_over(children, _cpu_seconds),
+                app_rss + _sum_over(children, _rss_bytes))
+
+    def start(self, stage):
+        app_cpu, child_cpu, rss = self._snapshot()
+        with self._lock:
+            token = self._next
+            self._next += 1
+            self._open[token] = [stage, app_cpu, child_cpu, rss]
+        return token
+
+    def stop(self, token, wall):
+        app_cpu, child_cpu, rss = self._snapshot()
+        with self._lock:
+            stage, app_start, child_start, peak = self._open.pop(token)
+            self._results.setdefault(stage, []).append(
+                (wall, app_cpu - app_start, max(0.0, child_cpu - child_start), max(peak, rss)))
+
+    def _sample_loop(self):
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                if not self._open:
+                    continue
+            try:
+                rss = self._snapshot()[2]
+            except OSError:
+                continue
+            with self._lock:
+                for entry in self._open.values():
+                    entry[3] = max(entry[3], rss)
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+
+    def results(self):
+        with self._lock:
+            return {stage: list(rows) for stage, rows in self._results.items()}
+
+
+def record_page_memory(cdp_metrics):
+    """Store Chromium's JS heap figures from a CDP Performance.getMetrics response."""
+    values = {m["name"]: m["value"] for m in cdp_metrics.get("metrics", [])}
+    for name, kind in (("JSHeapUsedSize", "used"), ("JSHeapTotalSize", "total")):
+        if name in values:
+            metrics.set_gauge(f"{PREFIX}_browser_js_heap_bytes", int(values[name]), kind=kind)
+    if "Nodes" in values:
+        metrics.set_gauge(f"{PREFIX}_browser_dom_nodes", int(values["Nodes"]))
+
+
+metrics = Metrics()
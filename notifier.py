@@ -0,0 +1,293 @@
+import os
+import json
+import time
+import queue
+import random
+import smtplib
+import logging
+import threading
+from datetime import datetime
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from typing import NamedTuple
+from sheet_parser import TeeSlot, parse_time
+from metrics import metrics
+from watchlists import get_watch_store
+
+# CONFIG
+# Defaults match the old Gmail setup. For a local stand-in:
+#   python -m aiosmtpd -n -l localhost:1025  and  SMTP_HOST=localhost SMTP_PORT=1025 SMTP_SSL=0
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "465"))
+SMTP_SSL = os.getenv("SMTP_SSL", "1") != "0"
+SMTP_USER = os.getenv("SMTP_USER", os.getenv("GMAIL_USER"))
+SMTP_PASS = os.getenv("SMTP_PASS", os.getenv("GMAIL_PASS"))
+SENDER_EMAIL = os.getenv("SENDER_EMAIL", SMTP_USER or "tee-times@localhost")
+RECIPIENT_EMAIL = os.getenv("RECIPIENT_EMAIL") # Comma-separated; follows the configured targets
+SUBSCRIBERS_FILE = os.getenv("NOTIFY_SUBSCRIBERS_FILE", "subscribers.json")
+
+COALESCE_SECONDS = float(os.getenv("NOTIFY_COALESCE_SECONDS", "5"))   # Batch alerts arriving this close together
+SMTP_IDLE_SECONDS = float(os.getenv("SMTP_IDLE_SECONDS", "120"))      # Drop the connection after this long unused
+MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", "4"))
+RETRY_BASE_SECONDS = float(os.getenv("NOTIFY_RETRY_BASE_SECONDS", "2"))
+
+
+class SlotAlert(NamedTuple):
+    date: str
+    slot: TeeSlot
+    text: str        # Formatted like the /check results
+    in_target: bool  # Inside one of the configured target windows
+    previous_open: int = 0 # Open spots before this scrape; 0 for a newly opened slot
+    routine: bool = False  # History says this slot is nearly always open; only news to explicit filters
+
+    def reaches(self, min_open):
+        """Whether this scrape took the slot from below `min_open` open spots to at least that many."""
+        return self.previous_open < min_open <= self.slot.open_count
+
+
+class Subscriber:
+    """
+    One notification recipient and the alerts they want.
+
+    With `follow_targets` only alerts inside the configured target windows
+    match; the other filters narrow that (or everything) further. Routine
+    alerts only reach subscribers who picked dates or a time window.
+    """
+
+    def __init__(self, email, follow_targets=True, dates=None, courses=None, min_open=1, start=None, end=None):
+        self.email = email
+        self.follow_targets = follow_targets
+        self.dates = set(dates) if dates else None
+        self.courses = {c.lower() for c in courses} if courses else None
+        self.min_open = min_open
+        self.start = parse_time(start) if isinstance(start, str) else start
+        self.end = parse_time(end) if isinstance(end, str) else end
+
+    @property
+    def broad(self):
+        """Gets everything rather than the targets or dates/times of their own."""
+        return not self.follow_targets and not (self.dates or self.start or self.end)
+
+    def matches(self, alert):
+        slot = alert.slot
+        if self.follow_targets and not alert.in_target:
+            return False
+        if alert.routine and self.broad:
+            return False
+        if self.dates and alert.date not in self.dates:
+            return False
+        if self.courses and slot.course.lower() not in self.courses:
+            return False
+        if not alert.reaches(self.min_open):
+            return False
+        if self.start and slot.time < self.start:
+            return False
+        if self.end and slot.time > self.end:
+            return False
+        return True
+
+
+def load_subscribers(path=SUBSCRIBERS_FILE, recipients=RECIPIENT_EMAIL):
+    subscribers = [Subscriber(email.strip()) for email in (recipients or "").split(",") if email.strip()]
+    if os.path.exists(path):
+        try:
+            with open(path, "r") as f:
+                for entry in json.load(f):
+                    subscribers.append(Subscriber(**entry))
+        except (OSError, ValueError, TypeError) as e:
+            logging.error(f"Failed to load notification subscribers from {path}: {e}")
+    return subscribers
+
+
+class SmtpConnection:
+    """A reused SMTP session that reconnects when the server has dropped it."""
+
+    def __init__(self, host=SMTP_HOST, port=SMTP_PORT, use_ssl=SMTP_SSL, user=SMTP_USER, password=SMTP_PASS):
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.user = user
+        self.password = password
+        self._smtp = None
+        self._last_used = 0
+
+    def send(self, msg):
+        smtp = self._connection()
+        try:
+            smtp.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            # Servers drop idle sessions without telling us; one fresh connection, then give up
+            self.close()
+            smtp = self._connection()
+            smtp.send_message(msg)
+        self._last_used = time.monotonic()
+
+    def close_if_idle(self, idle_seconds=SMTP_IDLE_SECONDS):
+        if self._smtp and time.monotonic() - self._last_used > idle_seconds:
+            self.close()
+
+    def close(self):
+        if self._smtp:
+            try:
+                self._smtp.quit()
+            except Exception:
+                pass
+            self._smtp = None
+
+    def _connection(self):
+        if self._smtp is not None:
+            try:
+                if self._smtp.noop()[0] == 250:
+                    return self._smtp
+            except smtplib.SMTPException:
+                pass
+            self.close()
+
+        logging.info(f"📧 Connecting to SMTP server {self.host}:{self.port}.")
+        smtp_class = smtplib.SMTP_SSL if self.use_ssl else smtplib.SMTP
+        self._smtp = smtp_class(self.host, self.port, timeout=30)
+        if self.user and self.password:
+            self._smtp.login(self.user, self.password)
+        self._last_used = time.monotonic()
+        return self._smtp
+
+
+class Notifier:
+    """
+    Background email delivery for new tee time alerts.
+
+    `notify()` only queues; a single delivery thread waits COALESCE_SECONDS
+    for more alerts, sends each matching subscriber or watchlist owner one
+    digest over a reused SMTP connection, and retries failed sends with
+    exponential backoff.
+    """
+
+    def __init__(self, subscribers=None, connection=None, coalesce_seconds=COALESCE_SECONDS, watches=None):
+        self._subscribers = subscribers
+        self._watches = watches # Anything with match(alerts) -> {email: [alerts]}; the watch store by default
+        self.connection = connection or SmtpConnection()
+        self.coalesce_seconds = coalesce_seconds
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def subscribers(self):
+        if self._subscribers is None:
+            self._subscribers = load_subscribers()
+        return self._subscribers
+
+    def add_subscriber(self, subscriber):
+        with self._lock:
+            self.subscribers.append(subscriber)
+
+    def remove_subscriber(self, email):
+        with self._lock:
+            self._subscribers = [s for s in self.subscribers if s.email != email]
+
+    def notify(self, alerts):
+        if not alerts:
+            return
+        self._ensure_thread()
+        for alert in alerts:
+            self._queue.put(alert)
+
+    def flush(self, timeout=30):
+        """Block until everything queued so far has been handled (used at shutdown)."""
+        done = threading.Event()
+        self._ensure_thread()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="notifier", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=SMTP_IDLE_SECONDS)
+            except queue.Empty:
+                self.connection.close_if_idle()
+                continue
+
+            batch, markers = [], []
+            (markers if isinstance(first, threading.Event) else batch).append(first)
+            if batch:
+                # Coalesce everything that arrives within the window into one digest
+                deadline = time.monotonic() + self.coalesce_seconds
+                while (remaining := deadline - time.monotonic()) > 0:
+                    try:
+                        item = self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    (markers if isinstance(item, threading.Event) else batch).append(item)
+                    if markers:
+                        break # Flushing: send now
+
+            if batch:
+                self._deliver(batch)
+            for marker in markers:
+                marker.set()
+
+    def _deliver(self, alerts):
+        with self._lock:
+            subscribers = list(self.subscribers)
+
+        # One digest per address, whether it subscribed, has watches, or both
+        by_recipient = {}
+        for subscriber in subscribers:
+            matched = [alert for alert in alerts if subscriber.matches(alert)]
+            if matched:
+                by_recipient.setdefault(subscriber.email, []).extend(matched)
+        try:
+            for email, matched in (self._watches or get_watch_store()).match(alerts).items():
+                existing = by_recipient.setdefault(email, [])
+                existing.extend(alert for alert in matched if alert not in existing)
+        except Exception as e:
+            logging.error(f"Failed to match alerts against watchlists: {e}")
+
+        if not by_recipient:
+            if not subscribers:
+                logging.info("No subscriber or watch matches the new tee times. No email sent.")
+            return
+
+        started = time.perf_counter()
+        ok = True
+        for email, matched in by_recipient.items():
+            ok = self._send_with_retry(email, build_digest(email, matched)) and ok
+        metrics.observe("notify", time.perf_counter() - started, ok)
+
+    def _send_with_retry(self, recipient, msg):
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                self.connection.send(msg)
+                logging.info(f"Email sent successfully to {recipient}!")
+                return True
+            except Exception as e:
+                self.connection.close()
+                if attempt == MAX_ATTEMPTS:
+                    logging.error(f"Failed to send email to {recipient} after {attempt} attempts: {e}")
+                    return False
+                delay = RETRY_BASE_SECONDS * 2 ** (attempt - 1) * random.uniform(0.8, 1.2)
+                logging.warning(f"Failed to send email to {recipient} (attempt {attempt}): {e}. Retrying in {delay:.1f}s.")
+                time.sleep(delay)
+
+
+def build_digest(recipient, alerts):
+    msg = MIMEMultipart()
+    msg['From'] = SENDER_EMAIL
+    msg['To'] = recipient
+    msg['Subject'] = "New Tee Time Available" if len(alerts) == 1 else f"{len(alerts)} New Tee Times Available"
+
+    lines = []
+    for date_str in sorted({alert.date for alert in alerts}, key=lambda d: datetime.strptime(d, "%m/%d/%Y")):
+        lines.append(date_str)
+        lines.extend(f"  {alert.text}" for alert in alerts if alert.date == date_str)
+    msg.attach(MIMEText("\n".join(lines), 'plain'))
+    return msg
+
+
+notifier = Notifier()
@@ -0,0 +1,333 @@
+"""
+Every tee sheet row we've parsed, kept for good, plus rollups of it.
+
+`slots` only holds what's open now and `slot_history` only the changes, so
+neither can say when Saturday 8 AM slots on a course usually open up. Each
+published scrape appends every parsed row to `observations`: five
+integers per row, course names in a lookup table, and no secondary index.
+The rows are never updated or deleted (unless OBSERVATION_RETENTION_DAYS
+is set).
+
+The same transaction adds the scrape to the rollups:
+
+- `rollups`, keyed by weekday of the tee time, BUCKET_MINUTES time bucket,
+  course and lead time (how long before the tee time it was observed).
+  Holds how often the slot was seen open, how many spots, and how often it
+  opened up (closed or missing before, open now) or filled.
+- `opening_hours`, keyed by weekday and hour of the clock: how long each
+  was watched and how many openings happened in it. An opening happened
+  some time since the date's previous scrape, so it and the watched time
+  are spread over that gap instead of landing on the hour it was seen;
+  otherwise the hours polled most would look busiest and be polled more.
+  It says when cancellations tend to show up, which the scheduler asks.
+
+Reads go to the rollups only, which stay a few thousand rows however
+long the raw history gets.
+"""
+import os
+import sqlite3
+import logging
+import threading
+from bisect import bisect_right
+from datetime import datetime, timedelta
+
+# CONFIG
+OBSERVATION_DB = os.getenv("OBSERVATION_DB", "observations.db")
+BUCKET_MINUTES = int(os.getenv("OBSERVATION_BUCKET_MINUTES", "30"))
+# Lead time buckets, in hours before the tee time: <2h, 2-6h, 6-24h, 1-2d, 2-3d, 3-7d, 7d+
+LEAD_BUCKET_HOURS = (2, 6, 24, 48, 72, 168)
+OBSERVATION_RETENTION_DAYS = int(os.getenv("OBSERVATION_RETENTION_DAYS", "0")) # 0 keeps raw rows forever
+# History only starts steering polling once it has seen this many openings
+MIN_OPENINGS_FOR_POLLING = int(os.getenv("HISTORY_MIN_OPENINGS", "30"))
+ACTIVITY_MIN_FACTOR = float(os.getenv("HISTORY_ACTIVITY_MIN_FACTOR", "0.5"))  # Busiest hours poll up to 2x as often...
+ACTIVITY_MAX_FACTOR = float(os.getenv("HISTORY_ACTIVITY_MAX_FACTOR", "2"))    # ...and quiet ones half as often
+# Openings after a longer gap between scrapes of a date (e.g. a restart) can't be placed in an hour
+OPENING_MAX_GAP_HOURS = float(os.getenv("HISTORY_OPENING_MAX_GAP_HOURS", "6"))
+# A newly open slot that's open at least this often at the same weekday/time/course/lead isn't news
+# for broad subscribers (targets, watches and date/time filters are always alerted). 1 turns this off.
+ALERT_USUALLY_OPEN_RATE = float(os.getenv("ALERT_USUALLY_OPEN_RATE", "0.95"))
+ALERT_MIN_OBSERVATIONS = int(os.getenv("ALERT_MIN_OBSERVATIONS", "100"))
+
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+LEAD_LABELS = ("<2h", "2-6h", "6-24h", "1-2d", "2-3d", "3-7d", "7d+")
+EPOCH_ORDINAL = datetime(1970, 1, 1).toordinal()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS courses (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS observations (
+    observed_at INTEGER NOT NULL, -- unix seconds
+    play_day INTEGER NOT NULL,    -- tee date as days since 1970-01-01
+    minute INTEGER NOT NULL,      -- tee time, minutes since midnight
+    course INTEGER NOT NULL,      -- courses.id
+    open_count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rollups (
+    weekday INTEGER NOT NULL,     -- of the tee date, 0 = Monday
+    bucket INTEGER NOT NULL,      -- minute // BUCKET_MINUTES
+    course INTEGER NOT NULL,
+    lead INTEGER NOT NULL,        -- index into LEAD_BUCKET_HOURS
+    observations INTEGER NOT NULL DEFAULT 0,
+    open_observations INTEGER NOT NULL DEFAULT 0,
+    open_spots INTEGER NOT NULL DEFAULT 0,
+    openings INTEGER NOT NULL DEFAULT 0,
+    fills INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (weekday, bucket, course, lead)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS opening_hours (
+    weekday INTEGER NOT NULL,     -- of the clock, 0 = Monday
+    hour INTEGER NOT NULL,
+    openings REAL NOT NULL DEFAULT 0,
+    watched_seconds REAL NOT NULL DEFAULT 0, -- summed over dates, like the openings
+    PRIMARY KEY (weekday, hour)
+) WITHOUT ROWID;
+"""
+
+
+def lead_bucket(hours):
+    return bisect_right(LEAD_BUCKET_HOURS, hours)
+
+
+def _clock_hours(start, end):
+    """(weekday, hour, seconds) for each clock hour between `start` and `end`."""
+    while start < end:
+        next_hour = min(end, start.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1))
+        yield start.weekday(), start.hour, (next_hour - start).total_seconds()
+        start = next_hour
+
+
+def _bucket_label(bucket):
+    minute = bucket * BUCKET_MINUTES
+    return datetime(2000, 1, 1, minute // 60, minute % 60).strftime("%I:%M %p").lstrip("0")
+
+
+class ObservationStore:
+    """Append-only observations and their rollups in their own SQLite file."""
+
+    def __init__(self, path=OBSERVATION_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(opening_hours)")}
+        if columns and "watched_seconds" not in columns:
+            # Openings counted at the hour they were seen can't be spread back over their gaps
+            logging.info("🧾 Restarting opening_hours, which now also counts the time each hour was watched.")
+            self._conn.execute("DROP TABLE opening_hours")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        self._courses = dict(self._conn.execute("SELECT name, id FROM courses"))
+        self._pruned_on = None
+        self._last_scraped = {} # date -> when it was last recorded, in this process
+
+    def _course_id(self, name):
+        # Called with the lock held
+        course_id = self._courses.get(name)
+        if course_id is None:
+            self._conn.execute("INSERT OR IGNORE INTO courses (name) VALUES (?)", (name,))
+            course_id = self._conn.execute("SELECT id FROM courses WHERE name = ?", (name,)).fetchone()[0]
+            self._courses[name] = course_id
+        return course_id
+
+    def record(self, date_str, slots, diff, observed_at=None):
+        """Append one scrape of `date_str` and fold it into the rollups. `diff` is its SlotDiff."""
+        observed_at = observed_at or datetime.now()
+        play_date = datetime.strptime(date_str, "%m/%d/%Y")
+        play_day = play_date.toordinal() - EPOCH_ORDINAL
+        weekday = play_date.weekday()
+        opened = {(s.time, s.course) for s in diff.added}
+        filled = {(s.time, s.course) for s in diff.removed}
+        stamp = int(observed_at.timestamp())
+        previous, self._last_scraped[date_str] = self._last_scraped.get(date_str), observed_at
+        hours = []
+        if previous and previous < observed_at and observed_at - previous <= timedelta(hours=OPENING_MAX_GAP_HOURS):
+            gap = (observed_at - previous).total_seconds()
+            hours = [(w, hour, len(diff.added) * seconds / gap, seconds) for w, hour, seconds in _clock_hours(previous, observed_at)]
+
+        rollups = {}
+        for slot in slots:
+            minute = slot.time.hour * 60 + slot.time.minute
+            lead_hours = (play_date.replace(hour=slot.time.hour, minute=slot.time.minute) - observed_at).total_seconds() / 3600
+            key = (weekday, minute // BUCKET_MINUTES, slot.course, lead_bucket(lead_hours))
+            totals = rollups.setdefault(key, [0, 0, 0, 0, 0])
+            totals[0] += 1
+            totals[1] += slot.open_count > 0
+            totals[2] += slot.open_count
+            totals[3] += (slot.time, slot.course) in opened
+            totals[4] += (slot.time, slot.course) in filled
+        # A filled slot may have vanished from the sheet entirely; count it in its own bucket
+        on_sheet = {(s.time, s.course) for s in slots}
+        for slot in diff.removed:
+            if (slot.time, slot.course) not in on_sheet:
+                lead_hours = (play_date.replace(hour=slot.time.hour, minute=slot.time.minute) - observed_at).total_seconds() / 3600
+                key = (weekday, (slot.time.hour * 60 + slot.time.minute) // BUCKET_MINUTES, slot.course, lead_bucket(lead_hours))
+                rollups.setdefault(key, [0, 0, 0, 0, 0])[4] += 1
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO observations (observed_at, play_day, minute, course, open_count) VALUES (?, ?, ?, ?, ?)",
+                [(stamp, play_day, s.time.hour * 60 + s.time.minute, self._course_id(s.course), s.open_count) for s in slots],
+            )
+            self._conn.executemany(
+                "INSERT INTO rollups (weekday, bucket, course, lead, observations, open_observations, open_spots, openings, fills) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (weekday, bucket, course, lead) DO UPDATE SET "
+                "observations = observations + excluded.observations, "
+                "open_observations = open_observations + excluded.open_observations, "
+                "open_spots = open_spots + excluded.open_spots, "
+                "openings = openings + excluded.openings, fills = fills + excluded.fills",
+                [(w, b, self._course_id(c), lead, *totals) for (w, b, c, lead), totals in rollups.items()],
+            )
+            self._conn.executemany(
+                "INSERT INTO opening_hours (weekday, hour, openings, watched_seconds) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (weekday, hour) DO UPDATE SET openings = openings + excluded.openings, "
+                "watched_seconds = watched_seconds + excluded.watched_seconds",
+                hours,
+            )
+            self._prune(observed_at)
+
+    def _prune(self, now):
+        # Raw rows only, at most daily; the rollups keep what they summarised
+        if not OBSERVATION_RETENTION_DAYS or self._pruned_on == now.date():
+            return
+        self._pruned_on = now.date()
+        cutoff = int(now.timestamp()) - OBSERVATION_RETENTION_DAYS * 86400
+        # observed_at only grows with rowid, so the old rows are a rowid prefix; binary search for its end
+        # instead of scanning a table with no index on observed_at
+        lo, hi = self._conn.execute("SELECT MIN(rowid), MAX(rowid) FROM observations").fetchone()
+        if lo is None:
+            return
+        hi += 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            row = self._conn.execute(
+                "SELECT observed_at FROM observations WHERE rowid >= ? ORDER BY rowid LIMIT 1", (mid,)).fetchone()
+            if row is not None and row[0] < cutoff:
+                lo = mid + 1
+            else:
+                hi = mid
+        removed = self._conn.execute("DELETE FROM observations WHERE rowid < ?", (lo,)).rowcount
+        if removed:
+            logging.info(f"🧾 Pruned {removed} observations older than {OBSERVATION_RETENTION_DAYS} days.")
+
+    # --- Queries (rollups only) ---
+
+    def _where(self, weekday=None, course=None, start_minute=None, end_minute=None):
+        clauses, params = [], []
+        if weekday is not None:
+            clauses.append("r.weekday = ?")
+            params.append(weekday)
+        if course:
+            clauses.append("c.name = ? COLLATE NOCASE")
+            params.append(course)
+        if start_minute is not None:
+            clauses.append("r.bucket >= ?")
+            params.append(start_minute // BUCKET_MINUTES)
+        if end_minute is not None:
+            clauses.append("r.bucket <= ?")
+            params.append(end_minute // BUCKET_MINUTES)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def availability(self, weekday=None, course=None, start_minute=None, end_minute=None):
+        """Per time bucket and course: how often it was open, and when it opened up by lead time."""
+        where, params = self._where(weekday, course, start_minute, end_minute)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT r.weekday, r.bucket, c.name, r.lead, r.observations, r.open_observations, r.open_spots, r.openings, r.fills "
+                f"FROM rollups r JOIN courses c ON c.id = r.course{where} ORDER BY r.weekday, r.bucket, c.name, r.lead",
+                params).fetchall()
+
+        groups = {}
+        for w, bucket, name, lead, observations, open_observations, open_spots, openings, fills in rows:
+            group = groups.setdefault((w, bucket, name), {
+                "weekday": WEEKDAYS[w], "time": _bucket_label(bucket), "course": name,
+                "observations": 0, "open_observations": 0, "open_spots": 0, "openings": 0, "fills": 0, "by_lead": [],
+            })
+            group["observations"] += observations
+            group["open_observations"] += open_observations
+            group["open_spots"] += open_spots
+            group["openings"] += openings
+            group["fills"] += fills
+            group["by_lead"].append({"lead": LEAD_LABELS[lead], "observations": observations, "openings": openings,
+                                     "open_rate": round(open_observations / observations, 3) if observations else None})
+        for group in groups.values():
+            group["open_rate"] = round(group["open_observations"] / group["observations"], 3) if group["observations"] else None
+            group["avg_open_spots"] = round(group["open_spots"] / group["open_observations"], 2) if group["open_observations"] else None
+        return list(groups.values())
+
+    def opening_hours(self):
+        """Openings by weekday and hour they happened in, and per hour that hour was watched."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT weekday, hour, openings, watched_seconds FROM opening_hours ORDER BY weekday, hour").fetchall()
+        return [{"weekday": WEEKDAYS[w], "hour": hour, "openings": round(openings, 2),
+                 "watched_hours": round(seconds / 3600, 2),
+                 "openings_per_hour": round(openings * 3600 / seconds, 3) if seconds else None}
+                for w, hour, openings, seconds in rows]
+
+    def summary(self):
+        with self._lock:
+            # MAX(rowid) instead of COUNT(*): rows are only appended, so it counts them without a scan
+            last_rowid, = self._conn.execute("SELECT MAX(rowid) FROM observations").fetchone()
+            first = self._conn.execute("SELECT observed_at FROM observations ORDER BY rowid LIMIT 1").fetchone()
+            last = self._conn.execute("SELECT observed_at FROM observations ORDER BY rowid DESC LIMIT 1").fetchone()
+            rollup_rows, openings = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(openings), 0) FROM rollups").fetchone()
+        return {
+            "observations_recorded": last_rowid or 0, # Including any pruned since
+            "first_observed_at": datetime.fromtimestamp(first[0]).isoformat() if first else None,
+            "last_observed_at": datetime.fromtimestamp(last[0]).isoformat() if last else None,
+            "rollup_rows": rollup_rows,
+            "openings": openings,
+            "courses": sorted(self._courses),
+        }
+
+    # --- What the scheduler and notifier ask ---
+
+    def activity_factor(self, now):
+        """
+        Multiplier for the polling interval at `now`: below 1 in the weekday
+        hours when openings usually show up, above 1 when they rarely do.
+        Compares openings per hour watched, so how often an hour was polled
+        doesn't count. 1 until there's enough history, overall and for this hour.
+        """
+        with self._lock:
+            total, total_seconds, openings, seconds = self._conn.execute(
+                "SELECT COALESCE(SUM(openings), 0), COALESCE(SUM(watched_seconds), 0), "
+                "COALESCE(SUM(CASE WHEN weekday = ? AND hour = ? THEN openings END), 0), "
+                "COALESCE(SUM(CASE WHEN weekday = ? AND hour = ? THEN watched_seconds END), 0) "
+                "FROM opening_hours", (now.weekday(), now.hour) * 2).fetchone()
+        if total < MIN_OPENINGS_FOR_POLLING or seconds < 3600:
+            return 1.0
+        factor = (total / total_seconds) / (openings / seconds) if openings else ACTIVITY_MAX_FACTOR
+        return min(max(factor, ACTIVITY_MIN_FACTOR), ACTIVITY_MAX_FACTOR)
+
+    def usually_open(self, date_str, slot, now=None):
+        """True if this weekday/time/course is open at least ALERT_USUALLY_OPEN_RATE of the time at this lead."""
+        if ALERT_USUALLY_OPEN_RATE >= 1:
+            return False
+        now = now or datetime.now()
+        play_date = datetime.strptime(date_str, "%m/%d/%Y")
+        lead_hours = (play_date.replace(hour=slot.time.hour, minute=slot.time.minute) - now).total_seconds() / 3600
+        with self._lock:
+            course_id = self._courses.get(slot.course)
+            if course_id is None:
+                return False
+            row = self._conn.execute(
+                "SELECT observations, open_observations FROM rollups WHERE weekday = ? AND bucket = ? AND course = ? AND lead = ?",
+                (play_date.weekday(), (slot.time.hour * 60 + slot.time.minute) // BUCKET_MINUTES, course_id,
+                 lead_bucket(lead_hours))).fetchone()
+        return bool(row) and row[0] >= ALERT_MIN_OBSERVATIONS and row[1] / row[0] >= ALERT_USUALLY_OPEN_RATE
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_observation_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ObservationStore()
+        return _store
@@ -0,0 +1,186 @@
+import os
+import json
+import logging
+import tempfile
+import threading
+from datetime import datetime
+from typing import NamedTuple, Tuple
+
+
+def atomic_write(path, data):
+    """
+    Replace `path` with `data` (str or bytes) in one step.
+
+    The data goes to a temp file in the same directory, which is flushed to
+    disk and then renamed over `path`. Readers (in this process or any other)
+    see either the old file or the new one, never a half-written one.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data.encode("utf-8") if isinstance(data, str) else data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write_json(path, obj):
+    atomic_write(path, json.dumps(obj))
+
+
+def read_json(path, default=None):
+    """Load a JSON file written by atomic_write_json; `default` if it's missing or unreadable."""
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+    except (OSError, json.JSONDecodeError) as e:
+        logging.warning(f"Failed to read {path}: {e}")
+        return default
+
+
+class Target(NamedTuple):
+    date: str
+    start: str
+    end: str
+
+
+class ConfigSnapshot(NamedTuple):
+    """
+    One immutable version of the runtime config.
+
+    A job is handed the snapshot that was current when it was queued and
+    keeps using it even if /set or /targets change the config mid-run.
+    """
+    version: int
+    targets: Tuple[Target, ...]
+    is_paused: bool
+    saved_at: str = None
+
+    def target_dicts(self):
+        """Fresh target dicts in the shape checker.parse_targets takes."""
+        return [target._asdict() for target in self.targets]
+
+    def to_dict(self):
+        # "date"/"start"/"end" mirror the first target for older clients
+        first = self.targets[0]
+        return {
+            "date": first.date,
+            "start": first.start,
+            "end": first.end,
+            "is_paused": self.is_paused,
+            "targets": self.target_dicts(),
+            "version": self.version,
+        }
+
+
+def _targets_from(config):
+    """Targets from a config dict, falling back to its single date/start/end window."""
+    if config.get("targets"):
+        return tuple(Target(t["date"], t["start"], t["end"]) for t in config["targets"])
+    return (Target(config["date"], config["start"], config["end"]),)
+
+
+def _snapshot_from(config, version, fallback):
+    return ConfigSnapshot(
+        version=version,
+        targets=_targets_from(config) if ("targets" in config or "date" in config) else fallback.targets,
+        is_paused=bool(config.get("is_paused", fallback.is_paused)),
+        saved_at=config.get("saved_at"),
+    )
+
+
+class ConfigStore:
+    """
+    The runtime config as a series of immutable snapshots, persisted to `path`.
+
+    `current()` is a plain attribute read: no lock, and the snapshot it
+    returns never changes underneath the caller. `update()` serializes
+    writers, writes the new snapshot to disk with atomic_write and only then
+    makes it current, so memory and file never disagree about a version.
+
+    With a shared_state backend the backend holds the config instead of the
+    file (which only seeds it the first time), so every worker shares one
+    version sequence. `update()` then compare-and-sets against the latest
+    version, and other workers pick the change up through `adopt()`.
+    """
+
+    def __init__(self, path, defaults, backend=None, key="config"):
+        self.path = path
+        self.backend = backend
+        self.key = key
+        self._write_lock = threading.RLock()
+        self._snapshot = self._load(defaults)
+
+    def _load(self, defaults):
+        snapshot = ConfigSnapshot(0, _targets_from(defaults), defaults.get("is_paused", False))
+        config = read_json(self.path)
+        if config is not None:
+            try:
+                snapshot = _snapshot_from(config, int(config.get("version", 0)), snapshot)
+                logging.info(f"Loaded config version {snapshot.version} from {self.path}: {snapshot.to_dict()}")
+            except (KeyError, TypeError, ValueError) as e:
+                logging.error(f"Failed to load runtime config from {self.path}: {e}. Using default config.")
+
+        if self.backend is None:
+            return snapshot
+        version, shared = self.backend.get(self.key)
+        if shared is None:
+            # First worker on a fresh backend: carry over the file's config
+            version = self.backend.put(self.key, snapshot.to_dict(), expected_version=0)
+            if version is not None:
+                return snapshot._replace(version=version)
+            version, shared = self.backend.get(self.key) # Another worker seeded it first
+        return _snapshot_from(shared, version, snapshot)
+
+    def current(self):
+        return self._snapshot
+
+    def adopt(self, version, config):
+        """Switch to a newer version written by another worker. Returns True if it was newer."""
+        with self._write_lock:
+            if config is None or version <= self._snapshot.version:
+                return False
+            self._snapshot = _snapshot_from(config, version, self._snapshot)
+            return True
+
+    def update(self, targets=None, is_paused=None):
+        """
+        Save and switch to a new snapshot with the given fields changed. Raises
+        (and keeps the old snapshot) if it can't be written.
+        """
+        with self._write_lock:
+            while True:
+                old = self._snapshot
+                if self.backend is not None:
+                    version, shared = self.backend.get(self.key)
+                    self.adopt(version, shared)
+                    old = self._snapshot
+                new = ConfigSnapshot(
+                    version=old.version + 1,
+                    targets=tuple(Target(t["date"], t["start"], t["end"]) for t in targets) if targets is not None else old.targets,
+                    is_paused=old.is_paused if is_paused is None else is_paused,
+                    saved_at=datetime.now().isoformat(timespec="seconds"),
+                )
+                if self.backend is None:
+                    atomic_write_json(self.path, dict(new.to_dict(), saved_at=new.saved_at))
+                elif self.backend.put(self.key, dict(new.to_dict(), saved_at=new.saved_at), expected_version=old.version) is None:
+                    continue # Another worker wrote a version in between; apply the change on top of theirs
+                self._snapshot = new
+                return new
+
+    def toggle_pause(self):
+        # Read and write under one lock so two toggles can't both flip from the same state
+        with self._write_lock:
+            if self.backend is not None:
+                self.adopt(*self.backend.get(self.key))
+            return self.update(is_paused=not self._snapshot.is_paused)
@@ -0,0 +1,283 @@
+"""
+Record real check runs and replay them offline.
+
+Recording needs the live site and credentials:
+
+    python replay.py record --out recordings/2026-10-17 --target "07/23/2025,08:00 AM,09:00 AM"
+
+That writes <out>/traffic.har, which holds every browser request with its
+body embedded. It also writes <out>/sheets/MM-DD-YYYY.html, the sheet HTML
+that was parsed for each date. Setting RECORD_DIR has the same effect on a
+normally running app.
+
+To replay, start a server for the recording:
+
+    python replay.py serve --recording recordings/2026-10-17 --latency-ms 150
+
+Then run anything that checks with REPLAY_URL=http://127.0.0.1:8766. The
+browser pools then answer every request from the replay server instead of
+the network, so a whole check runs offline, login included.
+benchmarks/bench_scrape.py drives this end to end.
+"""
+import os
+import sys
+import json
+import base64
+import random
+import logging
+import argparse
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+import httpx
+
+# CONFIG
+RECORD_DIR = os.getenv("RECORD_DIR")  # Record HAR + sheet HTML of every check into this directory
+REPLAY_URL = os.getenv("REPLAY_URL")  # Serve every browser request from this replay server instead
+HAR_NAME = "traffic.har"
+SHEETS_DIR = "sheets"
+
+REPLAY_URL_HEADER = "X-Replay-URL"
+REPLAY_METHOD_HEADER = "X-Replay-Method"
+# Bodies are stored decoded, so these no longer describe what we send back
+DROP_RESPONSE_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+
+# --- Recording ---
+
+def context_options():
+    """Extra new_context() arguments for the browser pools."""
+    if not RECORD_DIR:
+        return {}
+    os.makedirs(RECORD_DIR, exist_ok=True)
+    return {"record_har_path": os.path.join(RECORD_DIR, HAR_NAME), "record_har_content": "embed"}
+
+
+def save_sheet(date_str, html):
+    if not RECORD_DIR or html is None:
+        return
+    sheet_dir = os.path.join(RECORD_DIR, SHEETS_DIR)
+    os.makedirs(sheet_dir, exist_ok=True)
+    with open(os.path.join(sheet_dir, f"{date_str.replace('/', '-')}.html"), "w", encoding="utf-8") as f:
+        f.write(html)
+
+
+# --- Browser side of replay ---
+
+def _replay_headers(request):
+    return {REPLAY_URL_HEADER: request.url, REPLAY_METHOD_HEADER: request.method}
+
+
+def _fulfill_headers(response):
+    # Playwright takes one value per header; repeated ones (Set-Cookie) are newline-joined
+    headers = {}
+    for name, value in response.headers.multi_items():
+        headers[name] = f"{headers[name]}\n{value}" if name in headers else value
+    return headers
+
+
+def install_replay(context):
+    """Answer every request in a sync Playwright context from REPLAY_URL."""
+    client = httpx.Client(base_url=REPLAY_URL, timeout=30)
+
+    def handle(route):
+        request = route.request
+        try:
+            response = client.post("/replay", headers=_replay_headers(request), content=request.post_data_buffer or b"")
+            route.fulfill(status=response.status_code, headers=_fulfill_headers(response), body=response.content)
+        except Exception as e:
+            logging.warning(f"Replay failed for {request.method} {request.url}: {e}")
+            route.abort()
+
+    context.route("**/*", handle)
+    logging.info(f"⏯️ Replaying browser traffic from {REPLAY_URL}.")
+
+
+async def install_replay_async(context):
+    """Answer every request in an async Playwright context from REPLAY_URL."""
+    client = httpx.AsyncClient(base_url=REPLAY_URL, timeout=30)
+
+    async def handle(route):
+        request = route.request
+        try:
+            response = await client.post("/replay", headers=_replay_headers(request), content=request.post_data_buffer or b"")
+            await route.fulfill(status=response.status_code, headers=_fulfill_headers(response), body=response.content)
+        except Exception as e:
+            logging.warning(f"Replay failed for {request.method} {request.url}: {e}")
+            await route.abort()
+
+    await context.route("**/*", handle)
+    logging.info(f"⏯️ Replaying browser traffic from {REPLAY_URL}.")
+
+
+# --- Replay server ---
+
+class HarArchive:
+    """
+    Recorded responses looked up by request, most specific match first:
+    method + URL + body, method + URL, method + host/path, then method + path.
+
+    A request recorded several times (e.g. the tee sheet before and after
+    login) is answered with each recorded response in turn, so a replayed
+    run walks through the same sequence as the recording.
+    """
+
+    def __init__(self, path):
+        with open(path, "r", encoding="utf-8") as f:
+            entries = json.load(f)["log"]["entries"]
+        self._lock = threading.Lock()
+        self._index = {}
+        self._cursors = {}
+        for entry in entries:
+            request = entry["request"]
+            body = (request.get("postData") or {}).get("text", "")
+            for key in self._keys(request["method"], request["url"], body):
+                self._index.setdefault(key, []).append(entry["response"])
+        logging.info(f"Loaded {len(entries)} recorded requests from {path}.")
+
+    @staticmethod
+    def _keys(method, url, body):
+        parts = urlsplit(url.split("#")[0])
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        return [
+            ("body", method, url.split("#")[0], body),
+            ("url", method, url.split("#")[0]),
+            ("host", method, parts.netloc, parts.path),
+            ("path", method, path),
+        ]
+
+    def lookup(self, method, url, body=""):
+        with self._lock:
+            for key in self._keys(method, url, body):
+                responses = self._index.get(key)
+                if responses:
+                    cursor = self._cursors.get(key, 0)
+                    self._cursors[key] = cursor + 1
+                    return responses[cursor % len(responses)]
+        return None
+
+
+def _response_parts(response):
+    content = response.get("content", {})
+    text = content.get("text", "")
+    body = base64.b64decode(text) if content.get("encoding") == "base64" else text.encode("utf-8")
+    headers = [(h["name"], h["value"]) for h in response.get("headers", [])
+               if h["name"].lower() not in DROP_RESPONSE_HEADERS and not h["name"].startswith(":")]
+    return response.get("status", 200), headers, body
+
+
+def make_handler(archive, sheet_dir, latency_ms, jitter_ms):
+    # Imported here: browser_pool imports this module, and these import browser_pool
+    from stub_sheet_server import recorded_sheet_path
+    from sheet_fetch import FORETEES_DATE_PARAM
+
+    class ReplayHandler(BaseHTTPRequestHandler):
+        def _answer(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else b""
+
+            if latency_ms or jitter_ms:
+                time.sleep((latency_ms + random.uniform(0, jitter_ms)) / 1000)
+
+            # Requests from the browser pools carry the original URL; anything else
+            # (e.g. the direct HTTP fetcher pointed here) is looked up by its path
+            url = self.headers.get(REPLAY_URL_HEADER) or self.path
+            method = self.headers.get(REPLAY_METHOD_HEADER) or self.command
+            response = archive.lookup(method, url, body.decode("utf-8", "replace")) if archive else None
+            if response is not None:
+                return self._send(*_response_parts(response))
+
+            date_str = parse_qs(urlsplit(url).query).get(FORETEES_DATE_PARAM, [""])[0]
+            sheet_path = recorded_sheet_path(sheet_dir, date_str) if sheet_dir else None
+            if sheet_path:
+                with open(sheet_path, "rb") as f:
+                    return self._send(200, [("Content-Type", "text/html; charset=utf-8")], f.read())
+
+            logging.warning(f"Nothing recorded for {method} {url}")
+            self._send(404, [("Content-Type", "text/plain")], f"Nothing recorded for {method} {url}".encode("utf-8"))
+
+        do_GET = do_POST = do_PUT = do_DELETE = do_HEAD = do_OPTIONS = _answer
+
+        def _send(self, status, headers, body):
+            self.send_response(status)
+            for name, value in headers:
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logging.debug("replay server: " + format % args)
+
+    return ReplayHandler
+
+
+def serve(recording_dir, host="127.0.0.1", port=8766, latency_ms=0, jitter_ms=0):
+    har_path = os.path.join(recording_dir, HAR_NAME)
+    archive = HarArchive(har_path) if os.path.exists(har_path) else None
+    sheet_dir = os.path.join(recording_dir, SHEETS_DIR)
+    server = ThreadingHTTPServer((host, port), make_handler(archive, sheet_dir if os.path.isdir(sheet_dir) else None, latency_ms, jitter_ms))
+    logging.info(f"⏯️ Replaying {recording_dir} on http://{host}:{server.server_port}/ (latency {latency_ms}ms + up to {jitter_ms}ms).")
+    return server
+
+
+# --- CLI ---
+
+def parse_target(text):
+    date_str, start, end = (part.strip() for part in text.split(","))
+    return {"date": date_str, "start": start, "end": end}
+
+
+def record(out, targets):
+    # Run as a script this file is __main__; the checker and browser pool read the imported `replay` module
+    import replay
+    replay.RECORD_DIR = out
+    from checker import check_targets
+    from browser_pool import get_pool, shutdown_pool
+
+    # Start from a clean session so the recording includes the login flow, and leave
+    # the app's saved session alone while doing it
+    get_pool().storage_state_file = os.path.join(tempfile.mkdtemp(prefix="tee-record-"), "storage_state.json")
+
+    results = check_targets(targets)
+    shutdown_pool() # Closing the context is what writes the HAR
+    print("\n".join(results))
+    har_path = os.path.join(out, HAR_NAME)
+    sheet_dir = os.path.join(out, SHEETS_DIR)
+    if not os.path.exists(har_path) or not (os.path.isdir(sheet_dir) and os.listdir(sheet_dir)):
+        print(f"Nothing usable was recorded to {out} (a HAR and at least one sheet are needed).")
+        return 1
+    print(f"Recorded to {out}")
+    return 0
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Record and replay tee sheet checks.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record_cmd = commands.add_parser("record", help="Run one live check and record its traffic")
+    record_cmd.add_argument("--out", required=True, help="Recording directory")
+    record_cmd.add_argument("--target", action="append", required=True, type=parse_target,
+                            help='"MM/DD/YYYY,HH:MM AM,HH:MM AM" (repeatable)')
+
+    serve_cmd = commands.add_parser("serve", help="Serve a recording")
+    serve_cmd.add_argument("--recording", required=True)
+    serve_cmd.add_argument("--host", default="127.0.0.1")
+    serve_cmd.add_argument("--port", type=int, default=8766)
+    serve_cmd.add_argument("--latency-ms", type=float, default=0, help="Added to every response")
+    serve_cmd.add_argument("--jitter-ms", type=float, default=0, help="Random extra latency, up to this much")
+
+    args = parser.parse_args()
+    if args.command == "record":
+        return record(args.out, args.target)
+    else:
+        serve(args.recording, args.host, args.port, args.latency_ms, args.jitter_ms).serve_forever()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
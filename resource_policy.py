@@ -0,0 +1,296 @@
+"""
+What the scraping browser is allowed to download.
+
+Only the login form, the tee sheet calendar and div.member_sheet_table
+matter to a check. The club's pages also pull in images, fonts, video and
+third-party analytics, which cost page-load time, bandwidth and memory in
+the single-process Chromium. Every request in the pools' browser context
+goes through `ResourcePolicy`:
+
+- blocked: its resource type is in BLOCK_RESOURCE_TYPES, or its host is
+  (a subdomain of) one in BLOCK_DOMAINS
+- cached: a static stylesheet or script the pages do need is answered from
+  ASSET_CACHE_DIR after the first download
+- anything else goes to the network (or to the replay server) untouched
+
+RESOURCE_POLICY=0 turns all of it off.
+"""
+import os
+import time
+import hashlib
+import functools
+import logging
+import threading
+from urllib.parse import urlsplit
+from metrics import metrics
+from persistence import atomic_write, atomic_write_json, read_json
+import replay
+
+# CONFIG
+RESOURCE_POLICY = os.getenv("RESOURCE_POLICY", "1") == "1"
+BLOCK_RESOURCE_TYPES = {t.strip() for t in os.getenv("BLOCK_RESOURCE_TYPES", "image,media,font").split(",") if t.strip()}
+BLOCK_DOMAINS = [d.strip().lower() for d in os.getenv("BLOCK_DOMAINS", ",".join([
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net", "googlesyndication.com",
+    "facebook.net", "facebook.com", "connect.facebook.net", "hotjar.com", "newrelic.com", "nr-data.net",
+    "youtube.com", "ytimg.com", "vimeo.com", "typekit.net", "fonts.googleapis.com", "fonts.gstatic.com",
+])).split(",") if d.strip()]
+ASSET_CACHE_DIR = os.getenv("ASSET_CACHE_DIR", ".asset_cache")
+ASSET_CACHE_MAX_BYTES = int(float(os.getenv("ASSET_CACHE_MAX_MB", "20")) * 1024 * 1024)
+ASSET_CACHE_TTL_SECONDS = float(os.getenv("ASSET_CACHE_TTL_HOURS", "24")) * 3600
+
+# Resource types that are never blocked by type: without them there is no page to scrape
+REQUIRED_TYPES = {"document"}
+CACHED_TYPES = {"stylesheet", "script"}
+# Only URLs that look like static files are cached; scripts served by .aspx/.php etc. may differ per session
+CACHED_EXTENSIONS = (".css", ".js", ".mjs")
+
+# Decisions
+BLOCK = "blocked"
+CACHE = "cached"
+PASS = "passed"
+
+
+def _host_blocked(host, domains):
+    return any(host == d or host.endswith("." + d) for d in domains)
+
+
+class AssetCache:
+    """
+    Response bodies of static assets on disk, one <sha1>.body + <sha1>.json
+    pair per URL. Entries expire after `ttl` seconds, and the oldest are
+    evicted once the bodies add up to more than `max_bytes`.
+    """
+
+    def __init__(self, path=ASSET_CACHE_DIR, max_bytes=ASSET_CACHE_MAX_BYTES, ttl=ASSET_CACHE_TTL_SECONDS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._size = None # Bytes on disk, computed on first use
+
+    def _files(self, url):
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.path, key + ".body"), os.path.join(self.path, key + ".json")
+
+    def get(self, url):
+        """Returns (status, headers, body), or None if `url` isn't cached or has expired."""
+        body_path, meta_path = self._files(url)
+        meta = read_json(meta_path, None)
+        if not meta or meta.get("url") != url or time.time() - meta["stored_at"] > self.ttl:
+            return None
+        try:
+            with open(body_path, "rb") as f:
+                body = f.read()
+        except OSError:
+            return None
+        return meta["status"], meta["headers"], body
+
+    def put(self, url, status, headers, body):
+        if len(body) > self.max_bytes:
+            return
+        body_path, meta_path = self._files(url)
+        with self._lock:
+            previous = os.path.getsize(body_path) if os.path.exists(body_path) else 0
+            atomic_write(body_path, body)
+            atomic_write_json(meta_path, {"url": url, "status": status, "headers": headers, "stored_at": time.time()})
+            self._size = self._disk_size() if self._size is None else self._size + len(body) - previous
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _disk_size(self):
+        return sum(os.path.getsize(os.path.join(self.path, name)) for name in os.listdir(self.path) if name.endswith(".body"))
+
+    def _evict(self):
+        bodies = sorted((os.path.getmtime(os.path.join(self.path, name)), name)
+                        for name in os.listdir(self.path) if name.endswith(".body"))
+        for _, name in bodies:
+            if self._size <= self.max_bytes * 0.8:
+                break
+            body_path = os.path.join(self.path, name)
+            try:
+                self._size -= os.path.getsize(body_path)
+                os.remove(body_path)
+                os.remove(body_path[:-len(".body")] + ".json")
+            except OSError:
+                continue
+
+    def clear(self):
+        with self._lock:
+            if os.path.isdir(self.path):
+                for name in os.listdir(self.path):
+                    os.remove(os.path.join(self.path, name))
+            self._size = 0
+
+
+class ResourcePolicy:
+    """
+    Playwright route handlers that block, cache or pass each request, with
+    running totals for /stats and the per-run report (`log_savings`).
+
+    Each pool installs the handlers with its own scope ("sync", "async"),
+    which keeps separate totals, so a run only reports requests from its own
+    browser. Runs sharing a browser at the same time can't be told apart;
+    their reports say so.
+
+    The handlers are registered after the replay handler, so they run
+    first and hand whatever they don't answer to it with route.fallback().
+    """
+
+    def __init__(self, block_types=BLOCK_RESOURCE_TYPES, block_domains=BLOCK_DOMAINS, cache=None, enabled=RESOURCE_POLICY):
+        self.block_types = set(block_types) - REQUIRED_TYPES
+        self.block_domains = list(block_domains)
+        self.cache = cache if cache is not None else AssetCache()
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._totals = self._counters()
+        self._scopes = {} # scope -> its own counters
+        self._runs = {}   # scope -> runs counting there now (see begin())
+
+    @staticmethod
+    def _counters():
+        return {"blocked": 0, "cache_hits": 0, "cache_stores": 0, "cache_bytes": 0, "passed": 0, "by_reason": {}}
+
+    def context_options(self):
+        """Extra new_context() arguments. A service worker's requests would skip routing, so they're off."""
+        return {"service_workers": "block"} if self.enabled else {}
+
+    def decide(self, resource_type, url, method="GET"):
+        """(decision, reason) for one request."""
+        if resource_type in self.block_types:
+            return BLOCK, resource_type
+        host = (urlsplit(url).hostname or "").lower()
+        if _host_blocked(host, self.block_domains): # Embedded players and widgets are documents too
+            return BLOCK, "domain"
+        # Under replay every response has to come from the recording
+        if (method == "GET" and resource_type in CACHED_TYPES and not replay.REPLAY_URL
+                and urlsplit(url).path.lower().endswith(CACHED_EXTENSIONS)):
+            return CACHE, resource_type
+        return PASS, None
+
+    def _record(self, scope, key, reason=None, size=0):
+        with self._lock:
+            for totals in (self._totals, self._scopes.setdefault(scope, self._counters())):
+                totals[key] += 1
+                if reason:
+                    totals["by_reason"][reason] = totals["by_reason"].get(reason, 0) + 1
+                if key == "cache_hits":
+                    totals["cache_bytes"] += size
+        if key == "blocked":
+            metrics.count("browser_requests", action="blocked", reason=reason)
+        elif key == "cache_hits":
+            metrics.count("browser_requests", action="cache_hit")
+            metrics.count("browser_cache_bytes", size)
+        elif key == "cache_stores":
+            metrics.count("browser_requests", action="cache_store")
+
+    def _storable(self, response):
+        cache_control = response.headers.get("cache-control", "").lower()
+        return response.status == 200 and "no-store" not in cache_control and "private" not in cache_control
+
+    @staticmethod
+    def _headers(headers):
+        # The cached body is already decoded, so the original encoding and length no longer apply
+        return {k: v for k, v in headers.items() if k.lower() not in replay.DROP_RESPONSE_HEADERS}
+
+    def handle(self, route, scope="sync"):
+        """Route handler for sync Playwright contexts."""
+        request = route.request
+        decision, reason = self.decide(request.resource_type, request.url, request.method)
+        if decision == BLOCK:
+            self._record(scope, "blocked", reason)
+            return route.abort("blockedbyclient")
+        if decision == CACHE:
+            cached = self.cache.get(request.url)
+            if cached:
+                status, headers, body = cached
+                self._record(scope, "cache_hits", size=len(body))
+                return route.fulfill(status=status, headers=headers, body=body)
+            try:
+                response = route.fetch()
+                body = response.body()
+            except Exception as e:
+                logging.debug(f"Fetching {request.url} for the asset cache failed: {e}")
+                return route.fallback()
+            if self._storable(response):
+                self.cache.put(request.url, response.status, self._headers(response.headers), body)
+                self._record(scope, "cache_stores")
+            return route.fulfill(response=response, body=body)
+        self._record(scope, "passed")
+        route.fallback()
+
+    async def handle_async(self, route, scope="async"):
+        """Route handler for async Playwright contexts."""
+        request = route.request
+        decision, reason = self.decide(request.resource_type, request.url, request.method)
+        if decision == BLOCK:
+            self._record(scope, "blocked", reason)
+            return await route.abort("blockedbyclient")
+        if decision == CACHE:
+            cached = self.cache.get(request.url)
+            if cached:
+                status, headers, body = cached
+                self._record(scope, "cache_hits", size=len(body))
+                return await route.fulfill(status=status, headers=headers, body=body)
+            try:
+                response = await route.fetch()
+                body = await response.body()
+            except Exception as e:
+                logging.debug(f"Fetching {request.url} for the asset cache failed: {e}")
+                return await route.fallback()
+            if self._storable(response):
+                self.cache.put(request.url, response.status, self._headers(response.headers), body)
+                self._record(scope, "cache_stores")
+            return await route.fulfill(response=response, body=body)
+        self._record(scope, "passed")
+        await route.fallback()
+
+    def install(self, context, scope="sync"):
+        if self.enabled:
+            context.route("**/*", functools.partial(self.handle, scope=scope))
+
+    async def install_async(self, context, scope="async"):
+        if self.enabled:
+            await context.route("**/*", functools.partial(self.handle_async, scope=scope))
+
+    def totals(self, scope=None):
+        """Counts since startup, of every browser or of the `scope` one."""
+        with self._lock:
+            totals = self._totals if scope is None else self._scopes.get(scope, self._counters())
+            return {**totals, "by_reason": dict(totals["by_reason"])}
+
+    def status(self):
+        return {"enabled": self.enabled, "block_types": sorted(self.block_types),
+                "block_domains": len(self.block_domains), **self.totals()}
+
+    def begin(self, scope):
+        """Start a run's report of what the `scope` browser's requests saved; hand the result to log_savings()."""
+        run = {"scope": scope, "before": self.totals(scope), "shared": False}
+        with self._lock:
+            running = self._runs.setdefault(scope, [])
+            for other in running:
+                other["shared"] = run["shared"] = True
+            running.append(run)
+        return run
+
+    def log_savings(self, run):
+        """Log what the policy saved since `run` began."""
+        with self._lock:
+            self._runs[run["scope"]].remove(run)
+        if not self.enabled:
+            return
+        before, now = run["before"], self.totals(run["scope"])
+        blocked = now["blocked"] - before["blocked"]
+        hits = now["cache_hits"] - before["cache_hits"]
+        cached_bytes = now["cache_bytes"] - before["cache_bytes"]
+        stored = now["cache_stores"] - before["cache_stores"]
+        passed = now["passed"] - before["passed"]
+        if not (blocked or hits or stored or passed):
+            return
+        reasons = {r: n - before["by_reason"].get(r, 0) for r, n in now["by_reason"].items()}
+        breakdown = ", ".join(f"{r}={n}" for r, n in sorted(reasons.items()) if n)
+        shared = ", with another run sharing the browser" if run["shared"] else ""
+        logging.info(f"🧹 Resource policy ({run['scope']} browser{shared}): {blocked} request(s) blocked ({breakdown or 'none'}), "
+                     f"{hits} served from cache ({cached_bytes / 1024:.0f} KB), {stored} newly cached, {passed} went to the network.")
+
+
+resource_policy = ResourcePolicy()
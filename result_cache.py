@@ -0,0 +1,77 @@
+import time
+import logging
+import threading
+
+# Cache keys
+CHECK = "check"   # /check results for the configured targets
+CONFIG = "config" # /get payload
+
+# Versions restart at 0 with the process, so ETags also carry a per-process token
+_BOOT_ID = format(int(time.time() * 1000), "x")
+
+
+class ResultCache:
+    """
+    Versioned in-process cache for API payloads.
+
+    Writers (the scraper, config endpoints) call `invalidate(key)` when the
+    underlying data changes; that bumps the key's version and drops the cached
+    payload. Readers rebuild a payload at most once per version, and the
+    version doubles as the ETag so polling clients get a 304 until something
+    actually changes. Listeners registered with `add_listener` are called as
+    `fn(key, version)` after every change.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = {}
+        self._payloads = {}
+        self._listeners = []
+
+    def version(self, key):
+        with self._lock:
+            return self._versions.get(key, 0)
+
+    @staticmethod
+    def etag(key, version):
+        return f'"{key}-{_BOOT_ID}-{version}"'
+
+    def get(self, key, build):
+        """Return (etag, payload), calling `build()` only if this version isn't cached yet."""
+        with self._lock:
+            version = self._versions.get(key, 0)
+            if key in self._payloads:
+                return self.etag(key, version), self._payloads[key]
+
+        payload = build()
+        with self._lock:
+            # Don't cache a payload built from data that changed while we were building it
+            if self._versions.get(key, 0) == version:
+                self._payloads[key] = payload
+        return self.etag(key, version), payload
+
+    def invalidate(self, key):
+        with self._lock:
+            version = self._versions.get(key, 0) + 1
+            self._versions[key] = version
+            self._payloads.pop(key, None)
+            listeners = list(self._listeners)
+
+        for listener in listeners:
+            try:
+                listener(key, version)
+            except Exception as e:
+                logging.error(f"Result cache listener failed for '{key}': {e}")
+        return version
+
+    def add_listener(self, fn):
+        with self._lock:
+            self._listeners.append(fn)
+
+    def remove_listener(self, fn):
+        with self._lock:
+            if fn in self._listeners:
+                self._listeners.remove(fn)
+
+
+result_cache = ResultCache()
@@ -0,0 +1,244 @@
+import os
+import random
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+# CONFIG
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "1") != "0"
+# Base seconds between scrapes by local time of day, as "HH:MM-HH:MM=seconds" ranges.
+# Overnight nothing changes, so poll rarely; daytime cancellations get the normal cadence.
+SCHEDULE = os.getenv("SCHEDULER_CADENCE", "00:00-05:00=3600,05:00-06:00=600,06:00-21:00=300,21:00-24:00=1200")
+# Times the club releases new tee times ("07:00,19:00"). Polling speeds up around them.
+RELEASE_TIMES = os.getenv("SCHEDULER_RELEASE_TIMES", "")
+RELEASE_WINDOW_MINUTES = int(os.getenv("SCHEDULER_RELEASE_WINDOW_MINUTES", "10")) # Before and after each release time
+RELEASE_INTERVAL_SECONDS = float(os.getenv("SCHEDULER_RELEASE_INTERVAL_SECONDS", "30"))
+
+MIN_INTERVAL_SECONDS = float(os.getenv("SCHEDULER_MIN_INTERVAL_SECONDS", "30"))
+MAX_INTERVAL_SECONDS = float(os.getenv("SCHEDULER_MAX_INTERVAL_SECONDS", "3600"))
+CHURN_RUNS = int(os.getenv("SCHEDULER_CHURN_RUNS", "3"))           # Fast runs after a scrape that saw slots change
+CHURN_SPEEDUP = float(os.getenv("SCHEDULER_CHURN_SPEEDUP", "3"))   # Base interval is divided by this while churning
+QUIET_BACKOFF = float(os.getenv("SCHEDULER_QUIET_BACKOFF", "1.25")) # Growth per consecutive unchanged scrape...
+QUIET_BACKOFF_MAX = float(os.getenv("SCHEDULER_QUIET_BACKOFF_MAX", "3")) # ...up to this multiple of the base interval
+ERROR_BACKOFF_SECONDS = float(os.getenv("SCHEDULER_ERROR_BACKOFF_SECONDS", "60")) # Doubles per consecutive failure
+JITTER = float(os.getenv("SCHEDULER_JITTER", "0.15"))              # +/- fraction, so we never poll on a fixed beat
+START_DELAY_SECONDS = float(os.getenv("SCHEDULER_START_DELAY_SECONDS", "10"))
+RUN_TIMEOUT_SECONDS = float(os.getenv("SCHEDULER_RUN_TIMEOUT_SECONDS", "600"))
+
+
+def _minutes(hhmm):
+    hour, minute = hhmm.strip().split(":")
+    return int(hour) * 60 + int(minute)
+
+
+def parse_cadence(spec):
+    """'05:00-21:00=300,...' -> [(start_minute, end_minute, seconds), ...]"""
+    cadence = []
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        window, seconds = part.split("=")
+        start, end = window.split("-")
+        cadence.append((_minutes(start), _minutes(end), float(seconds)))
+    return cadence
+
+
+def parse_release_times(spec):
+    return sorted(_minutes(t) for t in spec.split(",") if t.strip())
+
+
+class PollPolicy:
+    """
+    Decides how long to wait before the next scrape.
+
+    Starts from the time-of-day cadence, drops to RELEASE_INTERVAL_SECONDS
+    around release times, speeds up for a few runs after the slot diffs
+    changed, stretches while nothing changes and backs off exponentially
+    while the site errors. Every interval gets jitter, and a wait never runs
+    past the start of the next release window.
+
+    `activity(now)`, if given, scales the cadence: below 1 in hours when
+    openings have historically shown up, above 1 in hours when they rarely do.
+    """
+
+    def __init__(self, cadence=SCHEDULE, release_times=RELEASE_TIMES, rng=random, activity=None):
+        self.cadence = parse_cadence(cadence) if isinstance(cadence, str) else cadence
+        self.release_times = parse_release_times(release_times) if isinstance(release_times, str) else release_times
+        self.rng = rng
+        self.activity = activity
+        self.quiet_runs = 0
+        self.errors = 0
+        self.churn_runs_left = 0
+
+    def record(self, changed, error):
+        if error:
+            self.errors += 1
+            return
+        self.errors = 0
+        if changed:
+            self.quiet_runs = 0
+            self.churn_runs_left = CHURN_RUNS
+        else:
+            self.quiet_runs += 1
+            self.churn_runs_left = max(0, self.churn_runs_left - 1)
+
+    def base_interval(self, now):
+        minute = now.hour * 60 + now.minute
+        for start, end, seconds in self.cadence:
+            if start <= minute < end:
+                return seconds
+        return MAX_INTERVAL_SECONDS
+
+    def _release_distance(self, now):
+        """Minutes from `now` to the nearest release time (negative if it has passed)."""
+        minute = now.hour * 60 + now.minute + now.second / 60
+        distances = []
+        for release in self.release_times:
+            # Consider yesterday's/tomorrow's occurrence too so windows wrap past midnight
+            distances.extend(release + day - minute for day in (-1440, 0, 1440))
+        return min(distances, key=abs) if distances else None
+
+    def in_release_window(self, now):
+        distance = self._release_distance(now)
+        return distance is not None and abs(distance) <= RELEASE_WINDOW_MINUTES
+
+    def seconds_until_release_window(self, now):
+        waits = []
+        minute = now.hour * 60 + now.minute + now.second / 60
+        for release in self.release_times:
+            opens = (release - RELEASE_WINDOW_MINUTES - minute) % 1440
+            waits.append(opens * 60)
+        return min(waits) if waits else None
+
+    def next_interval(self, now):
+        """Returns (seconds, reason)."""
+        if self.errors:
+            interval = min(MAX_INTERVAL_SECONDS, ERROR_BACKOFF_SECONDS * 2 ** (self.errors - 1))
+            reason = f"error backoff ({self.errors} in a row)"
+        elif self.in_release_window(now):
+            interval, reason = RELEASE_INTERVAL_SECONDS, "release window"
+        elif self.churn_runs_left:
+            interval, reason = self.base_interval(now) / CHURN_SPEEDUP, "recent slot changes"
+        else:
+            interval = self.base_interval(now) * min(QUIET_BACKOFF ** self.quiet_runs, QUIET_BACKOFF_MAX)
+            reason = "cadence" if not self.quiet_runs else f"cadence, {self.quiet_runs} unchanged run(s)"
+
+        if self.activity and not self.errors and not self.in_release_window(now):
+            factor = self._activity_factor(now)
+            if factor != 1:
+                interval *= factor
+                reason += f", history x{factor:.2f}"
+
+        interval *= self.rng.uniform(1 - JITTER, 1 + JITTER)
+        interval = min(max(interval, MIN_INTERVAL_SECONDS), MAX_INTERVAL_SECONDS)
+
+        until_release = self.seconds_until_release_window(now)
+        if until_release is not None and 0 < until_release < interval and not self.errors:
+            interval, reason = until_release, "release window opening"
+        return interval, reason
+
+    def _activity_factor(self, now):
+        try:
+            return self.activity(now)
+        except Exception as e:
+            logging.warning(f"Failed to read opening history for the poll interval: {e}")
+            return 1
+
+    def to_dict(self):
+        return {"quiet_runs": self.quiet_runs, "errors": self.errors, "churn_runs_left": self.churn_runs_left}
+
+
+class Scheduler:
+    """
+    Background task on the app's event loop that triggers scrapes on its own.
+
+    `run(targets)` is awaited for each scrape and must return
+    (changed, error). `is_paused()` and `is_leader()` are checked before
+    every run; `wake()` re-evaluates right away (e.g. after the pause flag or
+    targets change, or this worker becomes the scraping leader), but runs
+    never start less than MIN_INTERVAL_SECONDS apart.
+    """
+
+    def __init__(self, get_targets, is_paused, run, policy=None, is_leader=lambda: True):
+        self.get_targets = get_targets
+        self.is_paused = is_paused
+        self.is_leader = is_leader
+        self.run = run
+        self.policy = policy or PollPolicy()
+        self._task = None
+        self._wake = None
+        self.next_run_at = None
+        self.next_reason = None
+        self.last_run_at = None
+        self.runs = 0
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+            logging.info("🗓️ Scrape scheduler started.")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def wake(self):
+        # May be called from sync routes running in worker threads
+        if self._wake is not None and self._task is not None:
+            self._task.get_loop().call_soon_threadsafe(self._wake.set)
+
+    async def _sleep(self, seconds, reason):
+        self.next_run_at = datetime.now() + timedelta(seconds=seconds)
+        self.next_reason = reason
+        self._wake.clear()
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout=seconds)
+            return True # Woken early
+        except asyncio.TimeoutError:
+            return False
+
+    async def _loop(self):
+        await self._sleep(START_DELAY_SECONDS, "startup")
+        while True:
+            if self.is_paused():
+                # Nothing to do until someone unpauses; wake() cuts this short
+                await self._sleep(MAX_INTERVAL_SECONDS, "paused")
+                continue
+            if not self.is_leader():
+                # Another worker scrapes; we take over when the lease says so
+                await self._sleep(MAX_INTERVAL_SECONDS, "standby")
+                continue
+            since_last = (datetime.now() - self.last_run_at).total_seconds() if self.last_run_at else None
+            if since_last is not None and since_last < MIN_INTERVAL_SECONDS:
+                # Woken early, maybe by a burst of /set calls: don't hit the club's site back to back
+                await self._sleep(MIN_INTERVAL_SECONDS - since_last, "minimum interval")
+                continue
+
+            self.last_run_at = datetime.now()
+            self.runs += 1
+            try:
+                changed, error = await asyncio.wait_for(self.run(self.get_targets()), timeout=RUN_TIMEOUT_SECONDS)
+            except Exception as e:
+                logging.error(f"Scheduled scrape failed: {e}")
+                changed, error = False, True
+            self.policy.record(changed, error)
+
+            interval, reason = self.policy.next_interval(datetime.now())
+            logging.info(f"🗓️ Next scheduled scrape in {interval:.0f}s ({reason}).")
+            if await self._sleep(interval, reason):
+                logging.info("🗓️ Scheduler woken early. Re-evaluating.")
+
+    def status(self):
+        return {
+            "enabled": self._task is not None and not self._task.done(),
+            "paused": self.is_paused(),
+            "leader": self.is_leader(),
+            "runs": self.runs,
+            "last_run_at": self.last_run_at.isoformat(timespec="seconds") if self.last_run_at else None,
+            "next_run_at": self.next_run_at.isoformat(timespec="seconds") if self.next_run_at else None,
+            "next_reason": self.next_reason,
+            **self.policy.to_dict(),
+        }
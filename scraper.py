@@ -2,15 +2,27 @@ import os
 import json
 import logging
 # ONLY import check_tee_times. Remove cached_results from here.
-from checker import check_tee_times
+from checker import check_tee_times, check_targets
+from async_checker import run_check_threadsafe
+
+# "sync": one thread drives its own browser session per run (checker.py).
+# "async": the run is handed to the app's event loop and each date gets its own page (async_checker.py).
+CHECK_ENGINE = os.getenv("CHECK_ENGINE", "sync")
 
 # In scraper.py, we will remove the old CONFIG_FILE and in_memory_config.
 # This file will now strictly use the parameters passed to run_scraper from app.py.
 
-def run_scraper(date=None, start=None, end=None):
+def run_scraper(date=None, start=None, end=None, targets=None):
     # Remove 'global cached_results' as it's not needed here and caused the import error.
     # global cached_results # REMOVE THIS LINE IF IT WAS PRESENT IN YOUR FILE
 
+    if targets:
+        # Multiple date/window targets are all checked in one browser session
+        logging.info(f"Starting scraper with received targets: {targets}")
+        results = run_check_threadsafe(targets) if CHECK_ENGINE == "async" else check_targets(targets)
+        logging.info("Scraper run completed.")
+        return results
+
     # This log will show what config run_scraper actually received from app.py
     logging.info(f"Starting scraper with received config: Date={date}, Start={start}, End={end}")
 
@@ -27,3 +39,4 @@ def run_scraper(date=None, start=None, end=None):
     # cached_results = results # REMOVE OR COMMENT OUT THIS LINE IF PRESENT
     
     logging.info("Scraper run completed.") # More generic message here as checker.py logs details
+    return results
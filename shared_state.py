@@ -0,0 +1,352 @@
+"""
+State shared by every worker process and instance serving the app.
+
+Running uvicorn with several workers, or several instances, needs one place
+for the things that would otherwise split per process:
+
+- the runtime config, versioned (see persistence.ConfigStore)
+- the /check payload the leader last published
+- manual scrape and hot-watch requests made on a worker that isn't the leader
+- the leader lease: only the holder runs the scheduler, the browser and
+  notifications. Every worker serves /check, /get and /events.
+
+STATE_BACKEND=sqlite (the default) keeps it in a SQLite file, which is
+enough for several workers on one host. STATE_BACKEND=redis uses REDIS_URL
+and works across hosts; it needs the optional `redis` package.
+"""
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import asyncio
+import logging
+import threading
+
+# CONFIG
+STATE_BACKEND = os.getenv("STATE_BACKEND", "sqlite")
+STATE_DB = os.getenv("STATE_DB", "shared_state.db")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_PREFIX = os.getenv("REDIS_PREFIX", "teetimes")
+LEASE_TTL_SECONDS = float(os.getenv("LEASE_TTL_SECONDS", "30"))   # A dead leader is replaced after at most this long
+STATE_POLL_SECONDS = float(os.getenv("STATE_POLL_SECONDS", "2")) # How quickly workers see each other's changes
+
+# Keys
+CONFIG_KEY = "config"
+CHECK_PAYLOAD_KEY = "check_payload"
+SCRAPE_REQUEST_KEY = "scrape_request"
+HOT_WATCH_KEY = "hot_watch_request"
+SCRAPER_LEASE = "scraper"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+class SqliteStateBackend:
+    """
+    Versioned keys and leases in a SQLite file.
+
+    SQLite's file lock is what makes this safe across processes: every
+    read-modify-write runs in a BEGIN IMMEDIATE transaction, so only one
+    process at a time can be between reading a version and writing the next.
+    """
+
+    def __init__(self, path=STATE_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        # Autocommit mode, so the explicit BEGIN IMMEDIATEs below are the only transactions
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def _write(self, fn):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._conn)
+                self._conn.execute("COMMIT")
+                return result
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def get(self, key):
+        """Returns (version, value), or (0, None) if the key was never set."""
+        with self._lock:
+            row = self._conn.execute("SELECT version, value FROM state WHERE key = ?", (key,)).fetchone()
+        return (row[0], json.loads(row[1])) if row else (0, None)
+
+    def versions(self, keys):
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key, version FROM state WHERE key IN ({','.join('?' * len(keys))})", tuple(keys)).fetchall()
+        found = dict(rows)
+        return {key: found.get(key, 0) for key in keys}
+
+    def put(self, key, value, expected_version=None):
+        """
+        Store `value` as the key's next version and return that version. With
+        `expected_version`, only if the key is still at it; otherwise None.
+        """
+        def write(conn):
+            row = conn.execute("SELECT version FROM state WHERE key = ?", (key,)).fetchone()
+            current = row[0] if row else 0
+            if expected_version is not None and current != expected_version:
+                return None
+            conn.execute(
+                "INSERT INTO state (key, version, value) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET version = excluded.version, value = excluded.value",
+                (key, current + 1, json.dumps(value)),
+            )
+            return current + 1
+        return self._write(write)
+
+    def acquire_lease(self, name, holder, ttl):
+        """Take or renew `name` for `ttl` seconds. True if `holder` has it afterwards."""
+        def write(conn):
+            now = time.time()
+            row = conn.execute("SELECT holder, expires_at FROM leases WHERE name = ?", (name,)).fetchone()
+            if row and row[0] != holder and row[1] > now:
+                return False
+            conn.execute(
+                "INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at",
+                (name, holder, now + ttl),
+            )
+            return True
+        return self._write(write)
+
+    def release_lease(self, name, holder):
+        self._write(lambda conn: conn.execute("DELETE FROM leases WHERE name = ? AND holder = ?", (name, holder)))
+
+    def lease_holder(self, name):
+        with self._lock:
+            row = self._conn.execute("SELECT holder, expires_at FROM leases WHERE name = ?", (name,)).fetchone()
+        return row[0] if row and row[1] > time.time() else None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# Each script runs atomically in Redis, so check-and-set needs no WATCH retries
+_PUT_SCRIPT = """
+local current = tonumber(redis.call('HGET', KEYS[1], 'version') or '0')
+if ARGV[2] ~= '' and current ~= tonumber(ARGV[2]) then return nil end
+redis.call('HSET', KEYS[1], 'version', current + 1, 'value', ARGV[1])
+return current + 1
+"""
+_ACQUIRE_SCRIPT = """
+local holder = redis.call('GET', KEYS[1])
+if holder and holder ~= ARGV[1] then return 0 end
+redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+return 1
+"""
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1]) end
+return 0
+"""
+
+
+class RedisStateBackend:
+    """The same interface as SqliteStateBackend on a Redis-compatible server, for instances on different hosts."""
+
+    def __init__(self, url=REDIS_URL, prefix=REDIS_PREFIX):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("STATE_BACKEND=redis needs the 'redis' package (pip install redis).") from e
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url, decode_responses=True)
+        self._put = self._client.register_script(_PUT_SCRIPT)
+        self._acquire = self._client.register_script(_ACQUIRE_SCRIPT)
+        self._release = self._client.register_script(_RELEASE_SCRIPT)
+
+    def _key(self, kind, name):
+        return f"{self.prefix}:{kind}:{name}"
+
+    def get(self, key):
+        version, value = self._client.hmget(self._key("state", key), "version", "value")
+        return (int(version), json.loads(value)) if version else (0, None)
+
+    def versions(self, keys):
+        pipe = self._client.pipeline()
+        for key in keys:
+            pipe.hget(self._key("state", key), "version")
+        return {key: int(version or 0) for key, version in zip(keys, pipe.execute())}
+
+    def put(self, key, value, expected_version=None):
+        version = self._put(keys=[self._key("state", key)],
+                            args=[json.dumps(value), "" if expected_version is None else expected_version])
+        return int(version) if version is not None else None
+
+    def acquire_lease(self, name, holder, ttl):
+        return bool(self._acquire(keys=[self._key("lease", name)], args=[holder, int(ttl * 1000)]))
+
+    def release_lease(self, name, holder):
+        self._release(keys=[self._key("lease", name)], args=[holder])
+
+    def lease_holder(self, name):
+        return self._client.get(self._key("lease", name))
+
+    def close(self):
+        self._client.close()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_state_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if STATE_BACKEND == "redis":
+                _backend = RedisStateBackend()
+            elif STATE_BACKEND == "sqlite":
+                _backend = SqliteStateBackend()
+            else:
+                raise ValueError(f"Unknown STATE_BACKEND '{STATE_BACKEND}' (expected 'sqlite' or 'redis').")
+            logging.info(f"Shared state backend: {STATE_BACKEND}.")
+        return _backend
+
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+class LeaderLease:
+    """
+    Holds the scraper lease for this worker while it can.
+
+    Every worker tries to take the lease every ttl/3 seconds, and the holder
+    renews it the same way, so a crashed leader is replaced within about
+    `ttl`. `on_change(is_leader)` is called on the event loop whenever this
+    worker gains or loses the lease. Without a `backend` it uses
+    get_state_backend(), opened on first use rather than at construction.
+    """
+
+    def __init__(self, backend=None, name=SCRAPER_LEASE, ttl=LEASE_TTL_SECONDS, on_change=None):
+        self._backend = backend
+        self.name = name
+        self.ttl = ttl
+        self.on_change = on_change
+        self.holder = worker_id()
+        self.is_leader = False
+        self._task = None
+
+    @property
+    def backend(self):
+        return self._backend or get_state_backend()
+
+    async def start(self):
+        # First attempt before returning, so a single worker is leader as soon as startup finishes
+        await self._attempt()
+        self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.is_leader:
+            # Hand over now instead of making the next leader wait out the TTL
+            await asyncio.to_thread(self.backend.release_lease, self.name, self.holder)
+            self._set(False)
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.ttl / 3)
+            await self._attempt()
+
+    async def _attempt(self):
+        try:
+            leader = await asyncio.to_thread(self.backend.acquire_lease, self.name, self.holder, self.ttl)
+        except Exception as e:
+            # Can't prove we still hold it, so stop acting as leader
+            logging.error(f"Failed to renew the '{self.name}' lease: {e}")
+            leader = False
+        self._set(leader)
+
+    def _set(self, leader):
+        if leader == self.is_leader:
+            return
+        self.is_leader = leader
+        logging.info(f"👑 {self.holder} {'is now' if leader else 'is no longer'} the {self.name} leader.")
+        if self.on_change:
+            self.on_change(leader)
+
+    def status(self):
+        return {"worker": self.holder, "is_leader": self.is_leader, "leader": self.backend.lease_holder(self.name)}
+
+
+class StateWatcher:
+    """
+    Polls the backend for new versions of some keys and calls
+    `callback(version, value)` for each change: on the event loop, or on a
+    worker thread for callbacks watched with `in_thread=True` (ones that
+    touch SQLite or wait on locks). Changes this worker wrote itself are
+    reported too; callbacks must be idempotent. Like LeaderLease, it uses
+    get_state_backend() unless given a `backend`.
+    """
+
+    def __init__(self, backend=None, interval=STATE_POLL_SECONDS):
+        self._backend = backend
+        self.interval = interval
+        self._callbacks = {}
+        self._in_thread = set()
+        self._seen = {}
+        self._task = None
+
+    @property
+    def backend(self):
+        return self._backend or get_state_backend()
+
+    def watch(self, key, callback, in_thread=False):
+        self._callbacks[key] = callback
+        if in_thread:
+            self._in_thread.add(key)
+
+    async def start(self):
+        # Whatever is there now is the starting point, not a change
+        self._seen = await asyncio.to_thread(self.backend.versions, list(self._callbacks))
+        self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                versions = await asyncio.to_thread(self.backend.versions, list(self._callbacks))
+                for key, version in versions.items():
+                    if version > self._seen.get(key, 0):
+                        self._seen[key] = version
+                        _, value = await asyncio.to_thread(self.backend.get, key)
+                        if key in self._in_thread:
+                            await asyncio.to_thread(self._callbacks[key], version, value)
+                        else:
+                            self._callbacks[key](version, value)
+            except Exception as e:
+                logging.error(f"Failed to poll shared state: {e}")
@@ -0,0 +1,130 @@
+import os
+import logging
+import threading
+from urllib.parse import urlsplit, urlunsplit
+import httpx
+from browser_pool import get_pool, wait_for_layout, LOGIN_URL, SHEET_IFRAME_SELECTOR, NAV_TIMEOUT_MS
+from failures import CheckFailure, AUTH
+
+# CONFIG
+# "browser" drives the ForeTees iframe in Chromium for every check.
+# "http" logs in with the browser once, then requests the sheet HTML directly.
+FETCH_MODE = os.getenv("FETCH_MODE", "browser")
+
+# The iframe's sheet URL is discovered from iframe#ifrforetees after login.
+# Set this to pin it (e.g. to a local stub_sheet_server.py).
+FORETEES_SHEET_URL = os.getenv("FORETEES_SHEET_URL")
+FORETEES_DATE_PARAM = os.getenv("FORETEES_DATE_PARAM", "calDate")
+FORETEES_COURSE_PARAM = os.getenv("FORETEES_COURSE_PARAM", "course")
+ALL_COURSES = "-ALL-"
+
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "20"))
+SHEET_MARKER = "member_sheet_table"
+
+
+class SessionExpired(CheckFailure):
+    """Raised when a direct sheet request comes back without the tee sheet (usually a login redirect)."""
+    kind = AUTH
+
+
+def browser_authenticate():
+    """
+    Log in through the browser pool and export what a plain HTTP client needs.
+
+    Returns (sheet_url, cookies, headers): the ForeTees iframe URL without its
+    query string, the context's cookies, and the browser's User-Agent.
+    """
+    pool = get_pool()
+
+    def export_session(page):
+        pool.open_tee_sheet(page)
+        iframe_handle = wait_for_layout(page, SHEET_IFRAME_SELECTOR, "ForeTees iframe", state="attached")
+        iframe = iframe_handle.content_frame()
+        iframe.wait_for_load_state("domcontentloaded", timeout=NAV_TIMEOUT_MS)
+        parts = urlsplit(iframe.url)
+        sheet_url = urlunsplit((parts.scheme, parts.netloc, parts.path, "", ""))
+        user_agent = page.evaluate("() => navigator.userAgent")
+        return sheet_url, page.context.cookies(), {"User-Agent": user_agent}
+
+    sheet_url, cookies, headers = pool.run(export_session)
+    logging.info(f"🔑 Exported {len(cookies)} session cookies for direct sheet requests to {sheet_url}.")
+    return sheet_url, cookies, headers
+
+
+class SheetFetcher:
+    """
+    Fetch tee sheet HTML over a pooled HTTP client using browser-issued cookies.
+
+    `authenticate` returns (sheet_url, cookies, headers) and is only called when
+    there is no session yet or the current one has expired.
+    """
+
+    def __init__(self, sheet_url=FORETEES_SHEET_URL, authenticate=browser_authenticate):
+        self.sheet_url = sheet_url
+        self.authenticate = authenticate
+        self._client = None
+        self._lock = threading.Lock()
+
+    def fetch_sheet(self, date_str):
+        """Return the tee sheet HTML for `date_str` (MM/DD/YYYY), re-authenticating once if needed."""
+        client = self._client or self.refresh_auth()
+        try:
+            return self._get(client, date_str)
+        except SessionExpired as e:
+            logging.info(f"🔑 Direct sheet session expired ({e}). Refreshing auth through the browser.")
+            return self._get(self.refresh_auth(client), date_str)
+
+    def refresh_auth(self, stale_client=None):
+        with self._lock:
+            # Another thread may have refreshed while we waited for the lock
+            if self._client is not None and self._client is not stale_client:
+                return self._client
+
+            sheet_url, cookies, headers = self.authenticate()
+            if not self.sheet_url:
+                self.sheet_url = sheet_url
+
+            jar = httpx.Cookies()
+            for cookie in cookies:
+                jar.set(cookie["name"], cookie["value"], domain=cookie.get("domain", ""), path=cookie.get("path", "/"))
+
+            old_client = self._client
+            self._client = httpx.Client(
+                cookies=jar,
+                headers=headers,
+                follow_redirects=True,
+                timeout=HTTP_TIMEOUT_SECONDS,
+                limits=httpx.Limits(max_connections=4, max_keepalive_connections=4),
+            )
+            if old_client is not None:
+                old_client.close()
+            return self._client
+
+    def close(self):
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+    def _get(self, client, date_str):
+        params = {FORETEES_DATE_PARAM: date_str, FORETEES_COURSE_PARAM: ALL_COURSES}
+        response = client.get(self.sheet_url, params=params)
+
+        if str(response.url).startswith(LOGIN_URL) or response.status_code in (401, 403):
+            raise SessionExpired(f"HTTP {response.status_code} from {response.url}")
+        response.raise_for_status()
+        if SHEET_MARKER not in response.text:
+            raise SessionExpired(f"no {SHEET_MARKER} in response from {response.url}")
+        return response.text
+
+
+_fetcher = None
+_fetcher_lock = threading.Lock()
+
+
+def get_fetcher():
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None:
+            _fetcher = SheetFetcher()
+        return _fetcher
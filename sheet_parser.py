@@ -0,0 +1,181 @@
+import os
+import re
+import logging
+from datetime import time as dtime
+from functools import lru_cache
+from typing import NamedTuple
+
+# CONFIG
+# "auto" picks the fastest installed backend: selectolax, then lxml, then BeautifulSoup.
+PARSER_BACKEND = os.getenv("PARSER_BACKEND", "auto")
+
+TIME_RE = re.compile(r"^\s*(\d{1,2}):(\d{2})\s*([AaPp])[Mm]\s*$")
+OPEN_COUNT_RE = re.compile(r"^\s*(\d+)")
+
+
+class TeeSlot(NamedTuple):
+    time: dtime
+    time_text: str
+    course: str
+    open_count: int # 0 when the row isn't open
+
+    def to_dict(self):
+        return {"time": self.time_text, "course": self.course, "open_count": self.open_count}
+
+
+@lru_cache(maxsize=512)
+def parse_time(text):
+    """Parse 'H:MM AM' into a time, or None. The sheet repeats the same few dozen values, so it's cached."""
+    match = TIME_RE.match(text)
+    if not match:
+        return None
+    hour, minute, period = int(match.group(1)), int(match.group(2)), match.group(3).upper()
+    if not 1 <= hour <= 12 or minute > 59:
+        return None
+    if period == "P" and hour != 12:
+        hour += 12
+    elif period == "A" and hour == 12:
+        hour = 0
+    return dtime(hour, minute)
+
+
+def _open_count(open_slots_text):
+    if "Open" not in open_slots_text:
+        return 0
+    match = OPEN_COUNT_RE.match(open_slots_text)
+    return int(match.group(1)) if match else 1
+
+
+def _make_slot(time_text, course, open_slots_text):
+    row_time = parse_time(time_text)
+    if row_time is None:
+        return None # Header rows, blocked times, etc.
+    return TeeSlot(row_time, time_text, course, _open_count(open_slots_text))
+
+
+# --- Backends ---
+# Each returns a list of TeeSlot, or None when div.member_sheet_table isn't in the HTML.
+
+def _parse_bs4(html):
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    tee_sheet_table = soup.find("div", class_="member_sheet_table")
+    if not tee_sheet_table:
+        return None
+
+    slots = []
+    for row in tee_sheet_table.find_all("div", class_="rwdTr"):
+        cols = row.find_all("div", class_="rwdTd")
+        if len(cols) < 5:
+            continue
+        time_element = cols[0].find("div", class_="time_slot") or cols[0].find("a", class_="teetime_button")
+        time_text = time_element.get_text(strip=True) if time_element else ""
+        slot = _make_slot(time_text, cols[2].get_text(strip=True), cols[4].get_text(strip=True))
+        if slot:
+            slots.append(slot)
+    return slots
+
+
+def _has_class(name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+_LXML_XPATH = {}
+
+
+def _parse_lxml(html):
+    import lxml.html
+    from lxml import etree
+
+    if not _LXML_XPATH:
+        _LXML_XPATH.update(
+            table=etree.XPath(f"//div[{_has_class('member_sheet_table')}]"),
+            rows=etree.XPath(f".//div[{_has_class('rwdTr')}]"),
+            cols=etree.XPath(f".//div[{_has_class('rwdTd')}]"),
+            time=etree.XPath(f"(.//div[{_has_class('time_slot')}] | .//a[{_has_class('teetime_button')}])[1]"),
+        )
+    xp = _LXML_XPATH
+
+    def text(node):
+        # Same as BeautifulSoup's get_text(strip=True)
+        return "".join(part.strip() for part in node.itertext())
+
+    tables = xp["table"](lxml.html.fromstring(html))
+    if not tables:
+        return None
+
+    slots = []
+    for row in xp["rows"](tables[0]):
+        cols = xp["cols"](row)
+        if len(cols) < 5:
+            continue
+        time_element = xp["time"](cols[0])
+        time_text = text(time_element[0]) if time_element else ""
+        slot = _make_slot(time_text, text(cols[2]), text(cols[4]))
+        if slot:
+            slots.append(slot)
+    return slots
+
+
+def _parse_selectolax(html):
+    from selectolax.lexbor import LexborHTMLParser
+
+    tee_sheet_table = LexborHTMLParser(html).css_first("div.member_sheet_table")
+    if tee_sheet_table is None:
+        return None
+
+    slots = []
+    for row in tee_sheet_table.css("div.rwdTr"):
+        cols = row.css("div.rwdTd")
+        if len(cols) < 5:
+            continue
+        time_element = cols[0].css_first("div.time_slot") or cols[0].css_first("a.teetime_button")
+        time_text = time_element.text(separator="", strip=True) if time_element else ""
+        slot = _make_slot(time_text, cols[2].text(separator="", strip=True), cols[4].text(separator="", strip=True))
+        if slot:
+            slots.append(slot)
+    return slots
+
+
+BACKENDS = {
+    "selectolax": ("selectolax.lexbor", _parse_selectolax),
+    "lxml": ("lxml.html", _parse_lxml),
+    "bs4": ("bs4", _parse_bs4),
+}
+
+
+def available_backends():
+    import importlib.util
+
+    names = []
+    for name, (module, _) in BACKENDS.items():
+        try:
+            if importlib.util.find_spec(module) is not None:
+                names.append(name)
+        except ModuleNotFoundError:
+            continue
+    return names
+
+
+@lru_cache(maxsize=None)
+def resolve_backend(name=PARSER_BACKEND):
+    available = available_backends()
+    if name == "auto":
+        if not available:
+            raise RuntimeError("No HTML parser installed (need selectolax, lxml or beautifulsoup4).")
+        name = available[0]
+    elif name not in available:
+        fallback = available[0] if available else None
+        logging.warning(f"Parser backend '{name}' not available. Falling back to '{fallback}'.")
+        if fallback is None:
+            raise RuntimeError("No HTML parser installed (need selectolax, lxml or beautifulsoup4).")
+        name = fallback
+    logging.info(f"Using '{name}' tee sheet parser backend.")
+    return name
+
+
+def parse_sheet(html, backend=None):
+    """Parse every tee time row in `html`. Returns a list of TeeSlot, or None if there's no sheet table."""
+    name = resolve_backend(backend or PARSER_BACKEND)
+    return BACKENDS[name][1](html)
@@ -0,0 +1,190 @@
+import os
+import sqlite3
+import logging
+import threading
+from datetime import datetime, time as dtime
+from typing import List, NamedTuple, Tuple
+from sheet_parser import TeeSlot
+
+# CONFIG
+SLOT_DB = os.getenv("SLOT_DB", "tee_times.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS slots (
+    date TEXT NOT NULL,          -- MM/DD/YYYY, as configured
+    minute INTEGER NOT NULL,     -- minutes since midnight, for range lookups
+    course TEXT NOT NULL,
+    time_text TEXT NOT NULL,
+    open_count INTEGER NOT NULL,
+    first_seen TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (date, minute, course)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS slot_history (
+    id INTEGER PRIMARY KEY,
+    observed_at TEXT NOT NULL,
+    date TEXT NOT NULL,
+    minute INTEGER NOT NULL,
+    course TEXT NOT NULL,
+    time_text TEXT NOT NULL,
+    change TEXT NOT NULL,        -- added / removed / changed
+    old_open INTEGER,
+    new_open INTEGER
+);
+CREATE INDEX IF NOT EXISTS slot_history_date ON slot_history (date, minute);
+
+CREATE TABLE IF NOT EXISTS scrape_status (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    last_run_at TEXT,
+    last_success_at TEXT,
+    last_error TEXT,
+    last_error_kind TEXT         -- failures.classify() of last_error
+);
+"""
+
+
+class SlotDiff(NamedTuple):
+    date: str
+    added: List[TeeSlot]
+    removed: List[TeeSlot]
+    changed: List[Tuple[TeeSlot, TeeSlot]] # (before, after) open count changed
+
+    @property
+    def has_changes(self):
+        return bool(self.added or self.removed or self.changed)
+
+
+def _minute(slot_time):
+    return slot_time.hour * 60 + slot_time.minute
+
+
+def _slot(minute, time_text, course, open_count):
+    return TeeSlot(dtime(minute // 60, minute % 60), time_text, course, open_count)
+
+
+class SlotStore:
+    """
+    Open tee times keyed by (date, time, course) in SQLite.
+
+    `slots` holds what is open right now for each scraped date; every change
+    between scrapes is appended to `slot_history`.
+    """
+
+    def __init__(self, path=SLOT_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+        self._conn.commit()
+
+    def _migrate(self):
+        # Databases created before failures were classified
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(scrape_status)")}
+        if "last_error_kind" not in columns:
+            self._conn.execute("ALTER TABLE scrape_status ADD COLUMN last_error_kind TEXT")
+
+    def apply_snapshot(self, date_str, slots):
+        """Replace the open slots for `date_str` with a fresh scrape and return what changed."""
+        now = datetime.now().isoformat(timespec="seconds")
+        current = {(_minute(s.time), s.course): s for s in slots if s.open_count > 0}
+
+        with self._lock, self._conn:
+            previous = {
+                (minute, course): _slot(minute, time_text, course, open_count)
+                for minute, course, time_text, open_count in self._conn.execute(
+                    "SELECT minute, course, time_text, open_count FROM slots WHERE date = ?", (date_str,))
+            }
+
+            added = [slot for key, slot in current.items() if key not in previous]
+            removed = [slot for key, slot in previous.items() if key not in current]
+            changed = [(previous[key], slot) for key, slot in current.items()
+                       if key in previous and previous[key].open_count != slot.open_count]
+
+            self._conn.executemany(
+                "INSERT INTO slots (date, minute, course, time_text, open_count, first_seen, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (date, minute, course) DO UPDATE SET open_count = excluded.open_count, updated_at = excluded.updated_at",
+                [(date_str, _minute(s.time), s.course, s.time_text, s.open_count, now, now)
+                 for s in added + [after for _, after in changed]],
+            )
+            self._conn.executemany(
+                "DELETE FROM slots WHERE date = ? AND minute = ? AND course = ?",
+                [(date_str, _minute(s.time), s.course) for s in removed],
+            )
+            self._conn.executemany(
+                "INSERT INTO slot_history (observed_at, date, minute, course, time_text, change, old_open, new_open) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(now, date_str, _minute(s.time), s.course, s.time_text, "added", None, s.open_count) for s in added]
+                + [(now, date_str, _minute(s.time), s.course, s.time_text, "removed", s.open_count, None) for s in removed]
+                + [(now, date_str, _minute(a.time), a.course, a.time_text, "changed", b.open_count, a.open_count) for b, a in changed],
+            )
+
+        diff = SlotDiff(date_str, added, removed, changed)
+        if diff.has_changes:
+            logging.info(f"🗂️ {date_str}: {len(added)} added, {len(removed)} removed, {len(changed)} changed.")
+        return diff
+
+    def open_slots(self, date_str, start=None, end=None):
+        """Open slots for a date, optionally limited to start <= time <= end. Served from the primary key index."""
+        query = "SELECT minute, time_text, course, open_count FROM slots WHERE date = ?"
+        params = [date_str]
+        if start is not None:
+            query += " AND minute >= ?"
+            params.append(_minute(start))
+        if end is not None:
+            query += " AND minute <= ?"
+            params.append(_minute(end))
+        query += " ORDER BY minute, course"
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [_slot(minute, time_text, course, open_count) for minute, time_text, course, open_count in rows]
+
+    def history(self, date_str=None, limit=100):
+        query = "SELECT observed_at, date, time_text, course, change, old_open, new_open FROM slot_history"
+        params = []
+        if date_str:
+            query += " WHERE date = ?"
+            params.append(date_str)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        keys = ("observed_at", "date", "time", "course", "change", "old_open", "new_open")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def record_run(self, error=None, error_kind=None):
+        """Remember when the last scrape ran and whether (and how) it failed."""
+        now = datetime.now().isoformat(timespec="seconds")
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO scrape_status (id, last_run_at, last_success_at, last_error, last_error_kind) VALUES (1, ?, ?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET last_run_at = excluded.last_run_at, last_error = excluded.last_error, "
+                "last_error_kind = excluded.last_error_kind, "
+                "last_success_at = COALESCE(excluded.last_success_at, scrape_status.last_success_at)",
+                (now, None if error else now, error, error_kind if error else None),
+            )
+
+    def status(self):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_run_at, last_success_at, last_error, last_error_kind FROM scrape_status WHERE id = 1").fetchone()
+        if row is None:
+            return None
+        return {"last_run_at": row[0], "last_success_at": row[1], "last_error": row[2], "last_error_kind": row[3]}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SlotStore()
+        return _store
@@ -0,0 +1,105 @@
+import os
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from browser_pool import ensure_browser_installed
+
+# CONFIG
+# Launch Chromium (and load the saved session) right after startup instead of on the first check
+BROWSER_WARMUP = os.getenv("BROWSER_WARMUP", "1") == "1"
+# A failed install check or warm-up is tried again this often, so one bad start doesn't fail /ready for good
+BROWSER_PREPARE_RETRY_SECONDS = float(os.getenv("BROWSER_PREPARE_RETRY_SECONDS", "300"))
+
+# Component states
+PENDING = "pending"
+OK = "ok"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+
+class Readiness:
+    """
+    What /ready reports. The API serves cached data as soon as the process
+    is up (that's /); /ready says whether it can also run checks.
+    """
+
+    def __init__(self, components):
+        self._lock = threading.Lock()
+        self._components = {name: {"state": PENDING, "detail": None} for name in components}
+        self.started_at = datetime.now()
+
+    def set(self, name, state, detail=None):
+        with self._lock:
+            self._components[name] = {"state": state, "detail": detail}
+
+    def state(self, name):
+        with self._lock:
+            return self._components[name]["state"]
+
+    @property
+    def ready(self):
+        with self._lock:
+            return all(c["state"] in (OK, SKIPPED) for c in self._components.values())
+
+    def status(self):
+        with self._lock:
+            components = {name: dict(c) for name, c in self._components.items()}
+        return {
+            "ready": all(c["state"] in (OK, SKIPPED) for c in components.values()),
+            "uptime_seconds": round((datetime.now() - self.started_at).total_seconds(), 1),
+            "components": components,
+        }
+
+
+readiness = Readiness(["browser_install", "browser_warmup"])
+
+
+async def prepare_browser(should_warm, warm):
+    """
+    Background startup task: make sure Chromium is installed, then (if
+    `should_warm()`) launch it with `await warm()`. Nothing here holds up
+    the app from binding its port or serving requests. A failed step is
+    tried again every BROWSER_PREPARE_RETRY_SECONDS, until it works or a
+    check has used the browser successfully (see browser_worked()).
+    """
+    while not await _prepare_browser_once(should_warm, warm):
+        await asyncio.sleep(BROWSER_PREPARE_RETRY_SECONDS)
+        if readiness.state("browser_warmup") == OK:
+            return
+
+
+async def _prepare_browser_once(should_warm, warm):
+    """True once there's nothing left to retry."""
+    try:
+        await asyncio.to_thread(ensure_browser_installed)
+        readiness.set("browser_install", OK)
+    except Exception as e:
+        logging.error(f"❌ Chromium install check failed: {e}")
+        readiness.set("browser_install", FAILED, str(e))
+        readiness.set("browser_warmup", SKIPPED, "Chromium is not installed")
+        return False
+
+    if not BROWSER_WARMUP:
+        readiness.set("browser_warmup", SKIPPED, "BROWSER_WARMUP=0")
+        return True
+    if not should_warm():
+        readiness.set("browser_warmup", SKIPPED, "Another worker runs the checks")
+        return True
+    try:
+        await warm()
+        readiness.set("browser_warmup", OK)
+        logging.info("🔥 Browser warmed up.")
+        return True
+    except Exception as e:
+        logging.error(f"❌ Browser warm-up failed: {e}")
+        readiness.set("browser_warmup", FAILED, str(e))
+        return False
+
+
+def browser_worked():
+    """A check just ran in the browser, so it's installed and up whatever startup said."""
+    if not readiness.ready:
+        logging.info("✅ A check ran in the browser; ready.")
+    readiness.set("browser_install", OK)
+    readiness.set("browser_warmup", OK)
@@ -63,7 +63,10 @@ document.addEventListener("DOMContentLoaded", () => {
             const data = await response.json();
             if (response.ok) {
                 const config = data.current_config;
-                currentConfigP.textContent = `Date: ${config.date}\nStart: ${config.start}\nEnd: ${config.end}`;
+                const targets = config.targets || [config];
+                currentConfigP.textContent = targets
+                    .map(t => `Date: ${t.date}\nStart: ${t.start}\nEnd: ${t.end}`)
+                    .join('\n\n');
                 // Pre-fill input fields with current values, converting to input format
                 dateInput.value = convertDateToInputFormat(config.date);
                 startTimeInput.value = convertTimeToInputFormat(config.start);
@@ -180,6 +183,71 @@ document.addEventListener("DOMContentLoaded", () => {
         }, 5000); // Clear message after 5 seconds
     }
 
+    // Live results: load the current list once, then let the server push changes
+    const resultsList = document.getElementById("results");
+    const liveStatusP = document.getElementById("liveStatus");
+    const staleNoticeP = document.getElementById("staleNotice");
+
+    function renderStaleNotice(data) {
+        // The last check failed or is old: say so instead of passing the list off as current
+        if (!data.stale || !data.last_success_at) {
+            staleNoticeP.hidden = true;
+            return;
+        }
+        const updated = new Date(data.last_success_at).toLocaleString();
+        let notice = `Showing tee times from ${updated}.`;
+        if (data.error_kind) {
+            notice += ` The latest check failed (${data.error_kind.replace('_', ' ')}).`;
+        }
+        if (data.breaker && data.breaker.retry_in_seconds) {
+            notice += ` Retrying in ${Math.ceil(data.breaker.retry_in_seconds / 60)} min.`;
+        }
+        staleNoticeP.textContent = notice;
+        staleNoticeP.hidden = false;
+    }
+
+    function renderResults(data) {
+        renderStaleNotice(data);
+        resultsList.innerHTML = '';
+        (data.results || [data.error]).forEach(result => {
+            const item = document.createElement("li");
+            item.textContent = result;
+            resultsList.appendChild(item);
+        });
+    }
+
+    async function fetchResults() {
+        try {
+            const response = await fetch(`${API_BASE_URL}/check`);
+            const data = await response.json();
+            renderResults(data);
+        } catch (error) {
+            console.error("Error fetching results:", error);
+        }
+    }
+
+    function subscribeToEvents() {
+        const source = new EventSource(`${API_BASE_URL}/events`);
+        source.onopen = () => {
+            liveStatusP.textContent = "Live";
+        };
+        source.onerror = () => {
+            // EventSource reconnects on its own and resumes from the last event ID
+            liveStatusP.textContent = "Reconnecting...";
+        };
+        source.addEventListener("results", (event) => {
+            renderResults(JSON.parse(event.data).data);
+        });
+        source.addEventListener("slots", (event) => {
+            const diff = JSON.parse(event.data).data;
+            if (diff.new_times && diff.new_times.length) {
+                showMessage(`New tee times: ${diff.new_times.join(', ')}`, "success");
+            }
+        });
+    }
+
     // Fetch config on page load
     fetchCurrentConfig();
+    fetchResults();
+    subscribeToEvents();
 });
@@ -0,0 +1,69 @@
+"""
+Local stand-in for the ForeTees tee sheet endpoint.
+
+Serves recorded sheet HTML so the direct HTTP fetch mode can be exercised
+without the live site:
+
+    python stub_sheet_server.py --dir recordings/sheets --port 8765
+    FETCH_MODE=http FORETEES_SHEET_URL=http://127.0.0.1:8765/Member_sheet ...
+
+A request for date MM/DD/YYYY is answered with MM-DD-YYYY.html from --dir,
+falling back to sheet.html. Anything else is a 404.
+"""
+import os
+import argparse
+import logging
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+from sheet_fetch import FORETEES_DATE_PARAM
+
+
+def recorded_sheet_path(sheet_dir, date_str):
+    """MM-DD-YYYY.html for `date_str` in `sheet_dir`, else sheet.html, else None."""
+    candidates = [f"{date_str.replace('/', '-')}.html", "sheet.html"] if date_str else ["sheet.html"]
+    for name in candidates:
+        path = os.path.join(sheet_dir, name)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def make_handler(sheet_dir):
+    class SheetHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            query = parse_qs(urlsplit(self.path).query)
+            date_str = query.get(FORETEES_DATE_PARAM, [""])[0]
+            path = recorded_sheet_path(sheet_dir, date_str)
+
+            if path is None:
+                self.send_error(404, f"No recorded sheet for {date_str or 'request'}")
+                return
+
+            with open(path, "rb") as f:
+                body = f.read()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logging.info("stub sheet server: " + format % args)
+
+    return SheetHandler
+
+
+def serve(sheet_dir, host="127.0.0.1", port=8765):
+    server = ThreadingHTTPServer((host, port), make_handler(sheet_dir))
+    logging.info(f"Serving recorded tee sheets from {sheet_dir} on http://{host}:{server.server_port}/")
+    return server
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Serve recorded ForeTees sheet HTML.")
+    parser.add_argument("--dir", default="recordings/sheets", help="Directory of recorded sheet HTML files")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    serve(args.dir, args.host, args.port).serve_forever()
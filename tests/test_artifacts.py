@@ -0,0 +1,75 @@
+"""
+GET /artifacts/{run_id}/{name} must only ever serve files of a check run.
+
+    python -m unittest discover tests
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SCRATCH = tempfile.mkdtemp(prefix="tee-test-artifacts-")
+# Module-level CONFIG is read at import, so the app's stores go to the scratch directory
+for name, file in (("RUNTIME_CONFIG_FILE", "current_config.json"), ("SLOT_DB", "tee_times.db"),
+                   ("OBSERVATION_DB", "observations.db"), ("STATE_DB", "shared_state.db"),
+                   ("NOTIFY_SUBSCRIBERS_FILE", "subscribers.json")):
+    os.environ[name] = os.path.join(SCRATCH, file)
+os.environ["SCHEDULER_ENABLED"] = "0"
+
+from fastapi.testclient import TestClient  # noqa: E402
+from artifacts import artifact_store  # noqa: E402
+import app  # noqa: E402
+
+RUN_ID = "20261017_101500_000001"
+
+
+class ArtifactPathTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # root/<run>/error.html is servable; root/../secret.txt and root/../.env are not
+        base = tempfile.mkdtemp(prefix="tee-test-", dir=SCRATCH)
+        cls.root = os.path.join(base, "screenshots")
+        os.makedirs(os.path.join(cls.root, RUN_ID))
+        for path, body in ((os.path.join(cls.root, RUN_ID, "error.html"), "<html></html>"),
+                           (os.path.join(base, "secret.txt"), "secret"), (os.path.join(base, ".env"), "GMAIL_PASS=x"),
+                           (os.path.join(cls.root, RUN_ID, ".hidden"), "hidden")):
+            with open(path, "w") as f:
+                f.write(body)
+        os.symlink(os.path.join(base, "secret.txt"), os.path.join(cls.root, RUN_ID, "link.html"))
+        cls.previous_root = artifact_store.root
+        artifact_store.root = cls.root
+        cls.client = TestClient(app.app)
+
+    @classmethod
+    def tearDownClass(cls):
+        artifact_store.root = cls.previous_root
+
+    def test_serves_a_run_file(self):
+        response = self.client.get(f"/artifacts/{RUN_ID}/error.html")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.text, "<html></html>")
+
+    def test_refuses_paths_outside_the_run(self):
+        for path in (
+            "/artifacts/%2E%2E/.env", "/artifacts/%2e%2e/secret.txt", "/artifacts/%2E%2E/app.py",
+            "/artifacts/../secret.txt", f"/artifacts/{RUN_ID}/%2E%2E%2Fsecret.txt",
+            f"/artifacts/{RUN_ID}/..%2F..%2Fsecret.txt", "/artifacts/..%2F../secret.txt",
+            f"/artifacts/{RUN_ID}/link.html", f"/artifacts/{RUN_ID}/.hidden", "/artifacts/./error.html",
+            f"/artifacts/{RUN_ID}%2F..%2F../secret.txt",
+        ):
+            with self.subTest(path=path):
+                self.assertEqual(self.client.get(path).status_code, 404)
+
+    def test_artifact_path_checks_both_parts(self):
+        self.assertIsNotNone(artifact_store.artifact_path(RUN_ID, "error.html"))
+        for run_id, name in (("..", ".env"), ("..", "secret.txt"), (RUN_ID, "../../secret.txt"),
+                             (RUN_ID + "/..", "secret.txt"), (RUN_ID, ".hidden"), ("", "error.html")):
+            with self.subTest(run_id=run_id, name=name):
+                self.assertIsNone(artifact_store.artifact_path(run_id, name))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+"""
+The circuit breaker's open / half-open / closed transitions, on a fake clock.
+
+    python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import failures  # noqa: E402
+from failures import CircuitBreaker, CLOSED, OPEN, HALF_OPEN, SITE_DOWN, TIMEOUT, AUTH  # noqa: E402
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.breaker = CircuitBreaker(thresholds={SITE_DOWN: 3, TIMEOUT: 3, AUTH: 2},
+                                      cooldowns={SITE_DOWN: 300, TIMEOUT: 120, AUTH: 1800}, clock=self.clock)
+
+    def trip(self, kind=SITE_DOWN, times=3):
+        for _ in range(times):
+            self.breaker.record_failure(kind)
+
+    def probe(self):
+        """Wait out the cooldown and take the probe."""
+        self.clock.now += self.breaker.status()["retry_in_seconds"]
+        allowed, _ = self.breaker.allow()
+        self.assertTrue(allowed)
+        self.assertEqual(self.breaker.status()["state"], HALF_OPEN)
+
+    def test_opens_after_threshold_of_one_kind(self):
+        self.trip(times=2)
+        self.assertEqual(self.breaker.status()["state"], CLOSED)
+        self.breaker.record_failure(SITE_DOWN)
+        self.assertEqual(self.breaker.status()["state"], OPEN)
+        self.assertEqual(self.breaker.allow()[0], False)
+
+    def test_mixed_kinds_restart_the_streak(self):
+        self.trip(SITE_DOWN, 2)
+        self.breaker.record_failure(TIMEOUT)
+        self.breaker.record_failure(SITE_DOWN)
+        self.assertEqual(self.breaker.status()["state"], CLOSED)
+
+    def test_only_one_probe_when_half_open(self):
+        self.trip()
+        self.clock.now += 299
+        self.assertFalse(self.breaker.allow()[0])
+        self.probe()
+        self.assertFalse(self.breaker.allow()[0])
+
+    def test_successful_probe_closes(self):
+        self.trip()
+        self.probe()
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.status(), {"state": CLOSED, "failure_kind": None,
+                                                 "consecutive_failures": 0, "retry_in_seconds": None})
+        self.assertTrue(self.breaker.allow()[0])
+
+    def test_same_failure_doubles_the_cooldown_up_to_the_max(self):
+        self.trip()
+        cooldowns = []
+        for _ in range(7):
+            self.probe()
+            self.breaker.record_failure(SITE_DOWN)
+            cooldowns.append(self.breaker.status()["retry_in_seconds"])
+        self.assertEqual(cooldowns, [600, 1200, 2400, 4800, failures.MAX_COOLDOWN_SECONDS,
+                                     failures.MAX_COOLDOWN_SECONDS, failures.MAX_COOLDOWN_SECONDS])
+
+    def test_new_failure_kind_uses_its_own_cooldown(self):
+        self.trip()
+        self.probe()
+        self.breaker.record_failure(TIMEOUT)
+        self.assertEqual(self.breaker.status()["retry_in_seconds"], 120)
+        self.assertEqual(self.breaker.status()["failure_kind"], TIMEOUT)
+
+    def test_probe_without_an_outcome_is_released_by_guard(self):
+        self.trip()
+        self.probe()
+        with self.assertRaises(RuntimeError):
+            with self.breaker.guard():
+                raise RuntimeError("Browser crashed before the check recorded anything")
+        self.assertTrue(self.breaker.allow()[0])
+
+    def test_guard_leaves_a_newer_probe_alone(self):
+        self.trip()
+        self.probe()
+        with self.breaker.guard():
+            self.breaker.record_failure(SITE_DOWN) # Reopens
+            self.probe()                           # A later probe starts before this guard exits
+        self.assertFalse(self.breaker.allow()[0])
+
+    def test_stuck_probe_times_out(self):
+        self.trip()
+        self.probe()
+        self.clock.now += failures.PROBE_TIMEOUT_SECONDS - 1
+        self.assertFalse(self.breaker.allow()[0])
+        self.clock.now += 1
+        self.assertTrue(self.breaker.allow()[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
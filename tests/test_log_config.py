@@ -0,0 +1,55 @@
+"""
+JSON log lines keep a logged exception's traceback in its own field.
+
+    python -m unittest discover tests
+"""
+import os
+import sys
+import json
+import queue
+import logging
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from log_config import DroppingQueueHandler, JsonFormatter  # noqa: E402
+
+
+class QueuedExceptionTest(unittest.TestCase):
+    def queued(self, log):
+        handler = DroppingQueueHandler(queue.Queue())
+        logger = logging.getLogger("tee-test-log-config")
+        logger.propagate = False
+        logger.addHandler(handler)
+        self.addCleanup(logger.removeHandler, handler)
+        log(logger)
+        return handler.queue.get_nowait()
+
+    def test_traceback_stays_out_of_msg(self):
+        def log(logger):
+            try:
+                1 / 0
+            except ZeroDivisionError:
+                logger.exception("Check %s failed", "abc")
+        entry = json.loads(JsonFormatter().format(self.queued(log)))
+        self.assertEqual(entry["msg"], "Check abc failed")
+        self.assertIn("ZeroDivisionError", entry["exc"])
+
+    def test_console_still_shows_the_traceback(self):
+        def log(logger):
+            try:
+                1 / 0
+            except ZeroDivisionError:
+                logger.error("Check failed", exc_info=True)
+        line = logging.Formatter("%(message)s").format(self.queued(log))
+        self.assertTrue(line.startswith("Check failed\nTraceback"))
+
+    def test_no_exc_without_an_exception(self):
+        entry = json.loads(JsonFormatter().format(self.queued(lambda logger: logger.warning("%d left", 3))))
+        self.assertEqual(entry["msg"], "3 left")
+        self.assertNotIn("exc", entry)
+
+
+if __name__ == "__main__":
+    unittest.main()
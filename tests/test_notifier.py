@@ -0,0 +1,158 @@
+"""
+Notifier digests: coalescing, one email per address, retries, and the
+subscriber filters, against a fake SMTP connection.
+
+    python -m unittest discover tests
+"""
+import os
+import sys
+import smtplib
+import tempfile
+import unittest
+from datetime import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ["NOTIFY_SUBSCRIBERS_FILE"] = os.path.join(tempfile.mkdtemp(prefix="tee-test-notifier-"), "subscribers.json")
+
+import notifier  # noqa: E402
+from notifier import Notifier, Subscriber, SlotAlert, SmtpConnection, build_digest  # noqa: E402
+from sheet_parser import TeeSlot  # noqa: E402
+
+
+def alert(date="11/09/2030", hour=8, course="Highlands", open_count=2, in_target=True):
+    slot = TeeSlot(time(hour, 0), f"{hour}:00 AM", course, open_count)
+    return SlotAlert(date, slot, f"{slot.time_text} {course} ({open_count} open)", in_target)
+
+
+class FakeConnection:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.sent = []
+        self.closed = 0
+
+    def send(self, msg):
+        if self.failures:
+            self.failures -= 1
+            raise smtplib.SMTPDataError(451, "Try again later")
+        self.sent.append(msg)
+
+    def close(self):
+        self.closed += 1
+
+    def close_if_idle(self):
+        pass
+
+
+class NoWatches:
+    def match(self, alerts):
+        return {}
+
+
+def body(msg):
+    return msg.get_payload()[0].get_payload()
+
+
+class DigestTest(unittest.TestCase):
+    def test_subject_counts_the_alerts(self):
+        self.assertEqual(build_digest("a@example.com", [alert()])["Subject"], "New Tee Time Available")
+        self.assertEqual(build_digest("a@example.com", [alert(), alert(hour=9)])["Subject"], "2 New Tee Times Available")
+
+    def test_dates_in_calendar_order(self):
+        msg = build_digest("a@example.com", [alert("01/04/2031"), alert("12/28/2030", hour=9), alert("01/04/2031", hour=10)])
+        self.assertEqual(body(msg).splitlines(), ["12/28/2030", "  9:00 AM Highlands (2 open)",
+                                                  "01/04/2031", "  8:00 AM Highlands (2 open)", "  10:00 AM Highlands (2 open)"])
+
+
+class DeliveryTest(unittest.TestCase):
+    def setUp(self):
+        self.previous_retry = notifier.RETRY_BASE_SECONDS
+        notifier.RETRY_BASE_SECONDS = 0
+
+    def tearDown(self):
+        notifier.RETRY_BASE_SECONDS = self.previous_retry
+
+    def notifier(self, subscribers, connection=None, watches=None):
+        return Notifier(subscribers=subscribers, connection=connection or FakeConnection(),
+                        coalesce_seconds=0.2, watches=watches or NoWatches())
+
+    def test_alerts_close_together_share_one_digest(self):
+        sender = self.notifier([Subscriber("a@example.com")])
+        sender.notify([alert()])
+        sender.notify([alert(hour=9)])
+        sender.flush()
+        self.assertEqual(len(sender.connection.sent), 1)
+        self.assertEqual(sender.connection.sent[0]["Subject"], "2 New Tee Times Available")
+
+    def test_subscription_and_watch_of_one_address_send_one_email(self):
+        class Watches:
+            def match(self, alerts):
+                return {"a@example.com": alerts[:1]}
+        sender = self.notifier([Subscriber("a@example.com"), Subscriber("b@example.com", courses=["Fairways"])],
+                               watches=Watches())
+        sender.notify([alert(), alert(hour=9)])
+        sender.flush()
+        self.assertEqual([msg["To"] for msg in sender.connection.sent], ["a@example.com"])
+        self.assertEqual(sender.connection.sent[0]["Subject"], "2 New Tee Times Available")
+
+    def test_failed_send_is_retried(self):
+        sender = self.notifier([Subscriber("a@example.com")], FakeConnection(failures=notifier.MAX_ATTEMPTS - 1))
+        sender.notify([alert()])
+        sender.flush()
+        self.assertEqual(len(sender.connection.sent), 1)
+        self.assertEqual(sender.connection.closed, notifier.MAX_ATTEMPTS - 1) # A fresh connection for every retry
+
+    def test_gives_up_after_max_attempts(self):
+        sender = self.notifier([Subscriber("a@example.com"), Subscriber("b@example.com")],
+                               FakeConnection(failures=notifier.MAX_ATTEMPTS))
+        sender.notify([alert()])
+        sender.flush()
+        self.assertEqual([msg["To"] for msg in sender.connection.sent], ["b@example.com"]) # The next one still goes out
+
+
+class SubscriberTest(unittest.TestCase):
+    def test_follows_targets_by_default(self):
+        self.assertTrue(Subscriber("a@example.com").matches(alert()))
+        self.assertFalse(Subscriber("a@example.com").matches(alert(in_target=False)))
+        self.assertTrue(Subscriber("a@example.com", follow_targets=False).matches(alert(in_target=False)))
+
+    def test_filters(self):
+        subscriber = Subscriber("a@example.com", follow_targets=False, dates=["11/09/2030"], courses=["highlands"],
+                                min_open=2, start="07:30 AM", end="09:00 AM")
+        self.assertTrue(subscriber.matches(alert()))
+        for other in (alert(date="11/10/2030"), alert(course="Fairways"), alert(open_count=1), alert(hour=7), alert(hour=10)):
+            with self.subTest(alert=other):
+                self.assertFalse(subscriber.matches(other))
+
+
+class SmtpConnectionTest(unittest.TestCase):
+    def test_reconnects_once_when_the_server_dropped_the_session(self):
+        sessions = []
+
+        class FakeSmtp:
+            def __init__(self, host, port, timeout):
+                self.sent = []
+                sessions.append(self)
+
+            def noop(self):
+                return (250, b"OK")
+
+            def send_message(self, msg):
+                if len(sessions) == 1:
+                    raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+                self.sent.append(msg)
+
+            def quit(self):
+                pass
+
+        previous, smtplib.SMTP = smtplib.SMTP, FakeSmtp
+        try:
+            SmtpConnection(host="localhost", port=1025, use_ssl=False, user=None, password=None).send("msg")
+        finally:
+            smtplib.SMTP = previous
+        self.assertEqual([s.sent for s in sessions], [[], ["msg"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
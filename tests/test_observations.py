@@ -0,0 +1,69 @@
+"""
+The opening history the scheduler polls by must not depend on how often
+each hour was polled.
+
+    python -m unittest discover tests
+"""
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime, time, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import observations  # noqa: E402
+from observations import ObservationStore  # noqa: E402
+from sheet_parser import TeeSlot  # noqa: E402
+from slot_store import SlotDiff  # noqa: E402
+
+DATE = "11/07/2030"
+MONDAY = datetime(2030, 11, 4)
+TUESDAY = MONDAY + timedelta(days=1) # Far enough from Monday that the gap between isn't credited
+
+
+def opened(count):
+    return SlotDiff(DATE, [TeeSlot(time(8, 30), "8:30 AM", "Highlands", 1)] * count, [], [])
+
+
+class ActivityFactorTest(unittest.TestCase):
+    def setUp(self):
+        self.store = ObservationStore(os.path.join(tempfile.mkdtemp(prefix="tee-test-observations-"), "observations.db"))
+
+    def watch(self, start, hours, every_minutes, openings_per_hour):
+        """Scrape every `every_minutes`, finding the openings since the last scrape each time."""
+        steps = int(hours * 60 / every_minutes)
+        per_scrape = openings_per_hour * every_minutes / 60
+        for step in range(steps + 1):
+            self.store.record(DATE, [], opened(round(per_scrape) if step else 0), start + timedelta(minutes=step * every_minutes))
+
+    def test_same_rate_polled_more_often_is_not_busier(self):
+        self.watch(MONDAY.replace(hour=8), 1, 1, 60)   # Polled every minute
+        self.watch(TUESDAY.replace(hour=14), 1, 10, 60) # Polled every 10 minutes
+        hours = {row["hour"]: row for row in self.store.opening_hours()}
+        self.assertEqual(hours[8]["openings_per_hour"], hours[14]["openings_per_hour"])
+        self.assertEqual(self.store.activity_factor(MONDAY.replace(hour=8)), 1.0)
+        self.assertEqual(self.store.activity_factor(TUESDAY.replace(hour=14)), 1.0)
+
+    def test_busier_hour_polls_faster(self):
+        # Polled less often, but openings come four times as fast
+        self.watch(MONDAY.replace(hour=8), 1, 10, 120)
+        self.watch(TUESDAY.replace(hour=14), 1, 2, 30)
+        self.assertEqual(self.store.activity_factor(MONDAY.replace(hour=8)), 0.625)
+        self.assertEqual(self.store.activity_factor(TUESDAY.replace(hour=14)), observations.ACTIVITY_MAX_FACTOR)
+
+    def test_openings_spread_over_the_gap(self):
+        self.store.record(DATE, [], opened(0), MONDAY.replace(hour=8, minute=30))
+        self.store.record(DATE, [], opened(4), MONDAY.replace(hour=9, minute=30))
+        hours = {row["hour"]: row for row in self.store.opening_hours()}
+        self.assertEqual((hours[8]["openings"], hours[9]["openings"]), (2, 2))
+
+    def test_first_scrape_and_long_gaps_are_not_credited(self):
+        self.store.record(DATE, [], opened(3), MONDAY.replace(hour=8))
+        self.store.record(DATE, [], opened(3), MONDAY.replace(hour=8) + timedelta(hours=observations.OPENING_MAX_GAP_HOURS + 1))
+        self.assertEqual(self.store.opening_hours(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
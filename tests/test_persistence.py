@@ -0,0 +1,109 @@
+"""
+ConfigStore versions: the file on its own, and compare-and-set through a
+shared state backend that several workers write to.
+
+    python -m unittest discover tests
+"""
+import os
+import sys
+import json
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import persistence  # noqa: E402
+from persistence import ConfigStore  # noqa: E402
+from shared_state import SqliteStateBackend  # noqa: E402
+
+DEFAULTS = {"is_paused": False, "targets": [{"date": "07/23/2025", "start": "08:00 AM", "end": "09:00 AM"}]}
+SATURDAY = [{"date": "11/09/2030", "start": "07:00 AM", "end": "10:00 AM"}]
+SUNDAY = [{"date": "11/10/2030", "start": "08:00 AM", "end": "11:00 AM"}]
+
+
+class FileConfigStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(prefix="tee-test-config-"), "current_config.json")
+
+    def test_defaults_until_saved(self):
+        store = ConfigStore(self.path, DEFAULTS)
+        self.assertEqual(store.current().version, 0)
+        self.assertEqual(store.current().target_dicts(), DEFAULTS["targets"])
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_update_bumps_the_version_and_survives_a_restart(self):
+        store = ConfigStore(self.path, DEFAULTS)
+        before = store.current()
+        store.update(targets=SATURDAY)
+        store.toggle_pause()
+        self.assertEqual(before.version, 0) # Snapshots never change underneath a reader
+        reloaded = ConfigStore(self.path, DEFAULTS).current()
+        self.assertEqual((reloaded.version, reloaded.target_dicts(), reloaded.is_paused), (2, SATURDAY, True))
+
+    def test_failed_write_keeps_the_old_snapshot(self):
+        store = ConfigStore(self.path, DEFAULTS)
+        previous, persistence.atomic_write_json = persistence.atomic_write_json, self.fail_write
+        try:
+            with self.assertRaises(OSError):
+                store.update(targets=SATURDAY)
+        finally:
+            persistence.atomic_write_json = previous
+        self.assertEqual(store.current().version, 0)
+        self.assertEqual(store.current().target_dicts(), DEFAULTS["targets"])
+
+    @staticmethod
+    def fail_write(path, obj):
+        raise OSError("No space left on device")
+
+    def test_unreadable_file_falls_back_to_defaults(self):
+        with open(self.path, "w") as f:
+            json.dump({"version": 3, "targets": [{"date": "11/09/2030"}]}, f) # No start/end
+        self.assertEqual(ConfigStore(self.path, DEFAULTS).current().target_dicts(), DEFAULTS["targets"])
+
+
+class SharedConfigStoreTest(unittest.TestCase):
+    def setUp(self):
+        scratch = tempfile.mkdtemp(prefix="tee-test-config-")
+        self.path = os.path.join(scratch, "current_config.json")
+        self.backend = SqliteStateBackend(os.path.join(scratch, "shared_state.db"))
+
+    def worker(self):
+        return ConfigStore(self.path, DEFAULTS, backend=self.backend, key="config")
+
+    def test_file_seeds_a_fresh_backend_once(self):
+        persistence.atomic_write_json(self.path, {"version": 7, "is_paused": True, "targets": SATURDAY})
+        first = self.worker()
+        self.assertEqual(first.current().target_dicts(), SATURDAY)
+        first.update(targets=SUNDAY)
+        # The backend holds the config now; the file only seeded it
+        self.assertEqual(self.worker().current().target_dicts(), SUNDAY)
+        self.assertEqual(self.worker().current().version, first.current().version)
+
+    def test_stale_writer_applies_its_change_on_top(self):
+        a, b = self.worker(), self.worker()
+        a.update(targets=SATURDAY)
+        snapshot = b.update(is_paused=True) # b hasn't seen a's version
+        self.assertEqual(snapshot.version, a.current().version + 1)
+        self.assertEqual((snapshot.target_dicts(), snapshot.is_paused), (SATURDAY, True))
+
+    def test_concurrent_toggles_both_count(self):
+        a, b = self.worker(), self.worker()
+        a.toggle_pause()
+        b.toggle_pause()
+        version, shared = self.backend.get("config")
+        self.assertFalse(shared["is_paused"])
+        self.assertEqual(version, 3)
+
+    def test_adopt_only_moves_forward(self):
+        a, b = self.worker(), self.worker()
+        a.update(targets=SATURDAY)
+        version, shared = self.backend.get("config")
+        self.assertTrue(b.adopt(version, shared))
+        self.assertFalse(b.adopt(version, shared))
+        self.assertFalse(b.adopt(version - 1, DEFAULTS))
+        self.assertEqual(b.current().target_dicts(), SATURDAY)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+"""
+How PollPolicy spaces scrapes: cadence, churn, quiet and error backoff,
+release windows and opening history. Jitter is pinned to its midpoint.
+
+    python -m unittest discover tests
+"""
+import os
+import sys
+import time
+import asyncio
+import unittest
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import scheduler  # noqa: E402
+from scheduler import PollPolicy, Scheduler  # noqa: E402
+
+CADENCE = "00:00-05:00=3600,05:00-06:00=600,06:00-21:00=300,21:00-24:00=1200"
+NOON = datetime(2030, 11, 7, 12, 0)
+
+
+class NoJitter:
+    def uniform(self, low, high):
+        return (low + high) / 2
+
+
+class PollPolicyTest(unittest.TestCase):
+    def policy(self, release_times="", activity=None):
+        return PollPolicy(cadence=CADENCE, release_times=release_times, rng=NoJitter(), activity=activity)
+
+    def test_cadence_by_time_of_day(self):
+        policy = self.policy()
+        self.assertEqual(policy.next_interval(NOON), (300, "cadence"))
+        self.assertEqual(policy.next_interval(NOON.replace(hour=3))[0], 3600)
+        self.assertEqual(policy.next_interval(NOON.replace(hour=22))[0], 1200)
+
+    def test_changes_speed_up_the_next_runs(self):
+        policy = self.policy()
+        policy.record(changed=True, error=False)
+        for _ in range(scheduler.CHURN_RUNS):
+            self.assertEqual(policy.next_interval(NOON), (300 / scheduler.CHURN_SPEEDUP, "recent slot changes"))
+            policy.record(changed=False, error=False)
+        self.assertEqual(policy.next_interval(NOON)[1], f"cadence, {scheduler.CHURN_RUNS} unchanged run(s)")
+
+    def test_quiet_runs_stretch_up_to_the_cap(self):
+        policy = self.policy()
+        policy.record(changed=False, error=False)
+        self.assertAlmostEqual(policy.next_interval(NOON)[0], 300 * scheduler.QUIET_BACKOFF)
+        for _ in range(50):
+            policy.record(changed=False, error=False)
+        self.assertAlmostEqual(policy.next_interval(NOON)[0], 300 * scheduler.QUIET_BACKOFF_MAX)
+
+    def test_errors_back_off_exponentially_and_reset(self):
+        policy = self.policy()
+        intervals = []
+        for _ in range(4):
+            policy.record(changed=False, error=True)
+            intervals.append(policy.next_interval(NOON)[0])
+        base = scheduler.ERROR_BACKOFF_SECONDS
+        self.assertEqual(intervals, [min(max(base * 2 ** n, scheduler.MIN_INTERVAL_SECONDS), scheduler.MAX_INTERVAL_SECONDS)
+                                     for n in range(4)])
+        policy.record(changed=False, error=False)
+        self.assertEqual(policy.next_interval(NOON), (300 * scheduler.QUIET_BACKOFF, "cadence, 1 unchanged run(s)"))
+
+    def test_release_window(self):
+        policy = self.policy(release_times="19:00")
+        self.assertEqual(policy.next_interval(NOON.replace(hour=19, minute=5)),
+                         (max(scheduler.RELEASE_INTERVAL_SECONDS, scheduler.MIN_INTERVAL_SECONDS), "release window"))
+        # Two minutes before the window opens, the wait ends when it does
+        opens = 19 * 60 - scheduler.RELEASE_WINDOW_MINUTES - 2
+        self.assertEqual(policy.next_interval(NOON.replace(hour=opens // 60, minute=opens % 60)), (120, "release window opening"))
+
+    def test_activity_scales_the_cadence(self):
+        policy = self.policy(activity=lambda now: 0.5)
+        self.assertEqual(policy.next_interval(NOON), (150, "cadence, history x0.50"))
+        policy.record(changed=False, error=True)
+        self.assertEqual(policy.next_interval(NOON)[0], scheduler.ERROR_BACKOFF_SECONDS) # Not while erroring
+
+    def test_failing_activity_is_ignored(self):
+        def activity(now):
+            raise RuntimeError("database is locked")
+        self.assertEqual(self.policy(activity=activity).next_interval(NOON), (300, "cadence"))
+
+    def test_interval_is_clamped(self):
+        self.assertEqual(self.policy(activity=lambda now: 0.01).next_interval(NOON)[0], scheduler.MIN_INTERVAL_SECONDS)
+        self.assertEqual(self.policy(activity=lambda now: 100).next_interval(NOON)[0], scheduler.MAX_INTERVAL_SECONDS)
+
+
+class SchedulerWakeTest(unittest.TestCase):
+    def setUp(self):
+        self.previous = scheduler.START_DELAY_SECONDS, scheduler.MIN_INTERVAL_SECONDS
+        scheduler.START_DELAY_SECONDS, scheduler.MIN_INTERVAL_SECONDS = 0, 0.2
+
+    def tearDown(self):
+        scheduler.START_DELAY_SECONDS, scheduler.MIN_INTERVAL_SECONDS = self.previous
+
+    def test_burst_of_wakes_keeps_the_minimum_interval(self):
+        started = []
+
+        async def run(targets):
+            started.append(time.monotonic())
+            return False, False
+
+        async def scenario():
+            schedule = Scheduler(get_targets=list, is_paused=lambda: False, run=run,
+                                 policy=PollPolicy(cadence=CADENCE, release_times="", rng=NoJitter()))
+            schedule.start()
+            for _ in range(20): # e.g. a burst of /set calls
+                await asyncio.sleep(0.025)
+                schedule.wake()
+            await schedule.stop()
+
+        asyncio.run(scenario())
+        self.assertGreaterEqual(len(started), 2)
+        gaps = [later - earlier for earlier, later in zip(started, started[1:])]
+        self.assertTrue(all(gap >= 0.19 for gap in gaps), gaps)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+"""
+/ready recovers from a failed browser install check or warm-up.
+
+    python -m unittest discover tests
+"""
+import os
+import sys
+import asyncio
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import startup  # noqa: E402
+from startup import Readiness, OK, FAILED, SKIPPED  # noqa: E402
+
+
+class FlakyWarmUp:
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RuntimeError("Browser closed unexpectedly")
+
+
+class PrepareBrowserTest(unittest.TestCase):
+    def setUp(self):
+        self.previous = startup.readiness, startup.ensure_browser_installed, startup.BROWSER_PREPARE_RETRY_SECONDS, startup.BROWSER_WARMUP
+        startup.readiness = Readiness(["browser_install", "browser_warmup"])
+        startup.ensure_browser_installed = lambda: None
+        startup.BROWSER_PREPARE_RETRY_SECONDS = 0
+        startup.BROWSER_WARMUP = True
+
+    def tearDown(self):
+        startup.readiness, startup.ensure_browser_installed, startup.BROWSER_PREPARE_RETRY_SECONDS, startup.BROWSER_WARMUP = self.previous
+
+    def test_failed_warm_up_is_retried(self):
+        warm = FlakyWarmUp(failures=2)
+        asyncio.run(startup.prepare_browser(lambda: True, warm))
+        self.assertEqual(warm.calls, 3)
+        self.assertTrue(startup.readiness.ready)
+
+    def test_failed_install_check_is_retried(self):
+        attempts = []
+
+        def install():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise RuntimeError("Download failure")
+        startup.ensure_browser_installed = install
+        asyncio.run(startup.prepare_browser(lambda: True, FlakyWarmUp(failures=0)))
+        self.assertEqual(len(attempts), 2)
+        self.assertTrue(startup.readiness.ready)
+
+    def test_follower_skips_warm_up(self):
+        warm = FlakyWarmUp(failures=0)
+        asyncio.run(startup.prepare_browser(lambda: False, warm))
+        self.assertEqual((warm.calls, startup.readiness.state("browser_warmup")), (0, SKIPPED))
+
+    def test_successful_check_makes_it_ready(self):
+        startup.readiness.set("browser_install", OK)
+        startup.readiness.set("browser_warmup", FAILED, "Browser closed unexpectedly")
+        self.assertFalse(startup.readiness.ready)
+        startup.browser_worked()
+        self.assertTrue(startup.readiness.ready)
+
+    def test_retrying_stops_once_a_check_worked(self):
+        startup.BROWSER_PREPARE_RETRY_SECONDS = 0.2
+        warm = FlakyWarmUp(failures=5)
+
+        async def scheduled_check():
+            await asyncio.sleep(0.05) # Runs while the warm-up waits to retry
+            startup.browser_worked()
+
+        async def run():
+            await asyncio.gather(startup.prepare_browser(lambda: True, warm), scheduled_check())
+        asyncio.run(run())
+        self.assertEqual(warm.calls, 1)
+        self.assertTrue(startup.readiness.ready)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+"""
+Watch alerts for a slot whose open spots reach the watch's min_open, and
+which alerts history may hold back.
+
+    python -m unittest discover tests
+"""
+import os
+import sys
+import tempfile
+import unittest
+from datetime import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SCRATCH = tempfile.mkdtemp(prefix="tee-test-watches-")
+# Module-level CONFIG is read at import, so the stores go to the scratch directory
+os.environ["SLOT_DB"] = os.path.join(SCRATCH, "tee_times.db")
+os.environ["OBSERVATION_DB"] = os.path.join(SCRATCH, "observations.db")
+
+import checker  # noqa: E402
+from notifier import Subscriber  # noqa: E402
+from sheet_parser import TeeSlot  # noqa: E402
+from watchlists import WatchStore  # noqa: E402
+
+DATE = "11/07/2030"
+
+
+def slot(open_count, course="Highlands"):
+    return TeeSlot(time(8, 30), "8:30 AM", course, open_count)
+
+
+class RecordingNotifier:
+    def __init__(self):
+        self.alerts = []
+
+    def notify(self, alerts):
+        self.alerts.extend(alerts)
+
+
+class ScrapeTestCase(unittest.TestCase):
+    def setUp(self):
+        self.watches = WatchStore(os.path.join(tempfile.mkdtemp(dir=SCRATCH), "watches.db"))
+        self.watches.create("ann", DATE, "8:00 AM", "9:00 AM", "ann@example.com", min_open=2)
+        self.notifier = RecordingNotifier()
+        self.previous_notifier, checker.notifier = checker.notifier, self.notifier
+        # A date only watches need: no target windows, so nothing is written to the found-times file
+        self.targets = checker.parse_targets([{"date": DATE}])
+
+    def tearDown(self):
+        checker.notifier = self.previous_notifier
+        checker.get_store().apply_snapshot(DATE, [])
+
+    def scrape(self, *slots):
+        self.notifier.alerts.clear()
+        checker.publish_results(self.targets, {DATE: list(slots)})
+        return self.watches.match(self.notifier.alerts)
+
+
+class MinOpenTransitionTest(ScrapeTestCase):
+    def test_alerts_when_open_spots_rise_to_min_open(self):
+        self.assertEqual(self.scrape(slot(1)), {}) # Open, but below the watch's min_open
+        matched = self.scrape(slot(2))
+        self.assertEqual(list(matched), ["ann@example.com"])
+        self.assertEqual(matched["ann@example.com"][0].previous_open, 1)
+        self.assertEqual(matched["ann@example.com"][0].slot.open_count, 2)
+
+    def test_no_repeat_alert_above_min_open(self):
+        self.assertEqual(list(self.scrape(slot(2))), ["ann@example.com"])
+        self.assertEqual(self.scrape(slot(3)), {}) # Already met min_open last time
+
+    def test_no_alert_when_open_spots_fall(self):
+        self.scrape(slot(4))
+        self.assertEqual(self.scrape(slot(3)), {})
+        self.assertEqual(self.notifier.alerts, [])
+
+    def test_other_course_ignored(self):
+        self.watches.delete(self.watches.list("ann")[0].id)
+        self.watches.create("ann", DATE, "8:00 AM", "9:00 AM", "ann@example.com", min_open=2, courses=["Fairways"])
+        self.scrape(slot(1))
+        self.assertEqual(self.scrape(slot(2)), {})
+
+
+class RoutineSlotTest(ScrapeTestCase):
+    """A slot history calls usually open only stays quiet for broad subscribers."""
+
+    def setUp(self):
+        super().setUp()
+        self.history = []
+        # Usually open only if every scrape so far, before this one, saw it open
+        observations = checker.get_observation_store()
+        observations.usually_open = lambda date_str, slot: bool(self.history) and all(self.history)
+        self.addCleanup(vars(observations).pop, "usually_open")
+
+    def scrape(self, *slots):
+        matched = super().scrape(*slots)
+        self.history.append(bool(slots))
+        return matched
+
+    def test_first_opening_is_judged_before_it_is_recorded(self):
+        self.scrape(slot(2))
+        self.assertFalse(self.notifier.alerts[0].routine)
+
+    def test_routine_alert_reaches_watches_and_narrow_subscribers_only(self):
+        self.scrape(slot(1))
+        matched = self.scrape(slot(2))
+        self.assertTrue(self.notifier.alerts[0].routine)
+        self.assertEqual(list(matched), ["ann@example.com"])
+        self.assertFalse(Subscriber("all@example.com", follow_targets=False, min_open=2).matches(self.notifier.alerts[0]))
+        self.assertTrue(Subscriber("sat@example.com", follow_targets=False, dates=[DATE], min_open=2).matches(self.notifier.alerts[0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
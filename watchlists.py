@@ -0,0 +1,217 @@
+import os
+import uuid
+import sqlite3
+import logging
+import threading
+from bisect import bisect_right
+from datetime import datetime
+from typing import NamedTuple, Tuple
+from sheet_parser import parse_time
+from slot_store import SLOT_DB
+
+# CONFIG
+MAX_WATCHES_PER_USER = int(os.getenv("MAX_WATCHES_PER_USER", "20"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS watches (
+    id TEXT PRIMARY KEY,
+    user TEXT NOT NULL,
+    date TEXT NOT NULL,          -- MM/DD/YYYY
+    start TEXT NOT NULL,         -- H:MM AM
+    end TEXT NOT NULL,
+    min_open INTEGER NOT NULL,
+    courses TEXT NOT NULL,       -- comma-separated, empty for any course
+    notify TEXT NOT NULL,        -- email address
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS watches_user ON watches (user);
+"""
+
+
+def _minute(text):
+    t = parse_time(text)
+    return t.hour * 60 + t.minute
+
+
+class Watch(NamedTuple):
+    """One member's request to hear about open times on a date."""
+    id: str
+    user: str
+    date: str
+    start: str
+    end: str
+    min_open: int
+    courses: Tuple[str, ...] # Lower-cased; empty matches every course
+    notify: str
+    created_at: str
+
+    @property
+    def start_minute(self):
+        return _minute(self.start)
+
+    @property
+    def end_minute(self):
+        return _minute(self.end)
+
+    def accepts(self, slot, previous_open=0):
+        """
+        Course and capacity filters; the index has already checked date and time.
+        Matches when the slot went from fewer than min_open open spots (`previous_open`) to at least that many.
+        """
+        return previous_open < self.min_open <= slot.open_count and (not self.courses or slot.course.lower() in self.courses)
+
+    def to_dict(self):
+        return {**self._asdict(), "courses": list(self.courses)}
+
+
+class WatchIndex:
+    """
+    Watches grouped by date, each date's sorted by window start.
+
+    A slot only has to be compared with the watches on its date whose window
+    starts at or before it (a bisect), not with every watch, so fanning a
+    scrape out costs about the same for one member as for a hundred.
+    """
+
+    def __init__(self, watches):
+        self._by_date = {}
+        for watch in watches:
+            self._by_date.setdefault(watch.date, []).append(watch)
+        self._starts = {}
+        for date_str, date_watches in self._by_date.items():
+            date_watches.sort(key=lambda w: w.start_minute)
+            self._starts[date_str] = [w.start_minute for w in date_watches]
+
+    def dates(self):
+        return list(self._by_date)
+
+    def matching(self, date_str, slot, previous_open=0):
+        watches = self._by_date.get(date_str)
+        if not watches:
+            return []
+        minute = slot.time.hour * 60 + slot.time.minute
+        candidates = watches[:bisect_right(self._starts[date_str], minute)]
+        return [w for w in candidates if minute <= w.end_minute and w.accepts(slot, previous_open)]
+
+
+class WatchStore:
+    """
+    Per-member watches in SQLite, next to the slot store.
+
+    `index()` is rebuilt only when the table changed, whether through this
+    store or through another worker's connection (PRAGMA data_version).
+    """
+
+    def __init__(self, path=SLOT_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        self._changes = 0
+        self._index = None
+        self._index_key = None
+
+    def create(self, user, date, start, end, notify, min_open=1, courses=()):
+        """Add a watch. Raises ValueError for a malformed date/time or too many watches."""
+        datetime.strptime(date, "%m/%d/%Y")
+        if parse_time(start) is None or parse_time(end) is None:
+            raise ValueError(f"Times must look like '8:00 AM' (got '{start}', '{end}')")
+        if parse_time(start) > parse_time(end):
+            raise ValueError("start must not be after end")
+        if "@" not in notify:
+            raise ValueError(f"'{notify}' is not an email address")
+
+        watch = Watch(
+            id=uuid.uuid4().hex[:12], user=user, date=date, start=start, end=end,
+            min_open=max(1, int(min_open)), courses=tuple(sorted({c.strip().lower() for c in courses if c.strip()})),
+            notify=notify, created_at=datetime.now().isoformat(timespec="seconds"),
+        )
+        with self._lock, self._conn:
+            count = self._conn.execute("SELECT COUNT(*) FROM watches WHERE user = ?", (user,)).fetchone()[0]
+            if count >= MAX_WATCHES_PER_USER:
+                raise ValueError(f"{user} already has {count} watches (limit {MAX_WATCHES_PER_USER})")
+            self._conn.execute(
+                "INSERT INTO watches (id, user, date, start, end, min_open, courses, notify, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (watch.id, user, date, start, end, watch.min_open, ",".join(watch.courses), notify, watch.created_at),
+            )
+            self._changes += 1
+        logging.info(f"👀 {user} is watching {date} {start}-{end} (watch {watch.id}).")
+        return watch
+
+    def delete(self, watch_id, user=None):
+        """Remove a watch (only if it's `user`'s, when given). Returns True if one was removed."""
+        query, params = "DELETE FROM watches WHERE id = ?", [watch_id]
+        if user is not None:
+            query += " AND user = ?"
+            params.append(user)
+        with self._lock, self._conn:
+            removed = self._conn.execute(query, params).rowcount > 0
+            self._changes += removed
+        return removed
+
+    def get(self, watch_id):
+        watches = self._select("WHERE id = ?", (watch_id,))
+        return watches[0] if watches else None
+
+    def list(self, user=None):
+        if user is None:
+            return self._select("ORDER BY user, created_at", ())
+        return self._select("WHERE user = ? ORDER BY created_at", (user,))
+
+    def _select(self, clause, params):
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, user, date, start, end, min_open, courses, notify, created_at FROM watches {clause}", params).fetchall()
+        return [Watch(*row[:6], tuple(c for c in row[6].split(",") if c), *row[7:]) for row in rows]
+
+    def index(self):
+        with self._lock:
+            key = (self._conn.execute("PRAGMA data_version").fetchone()[0], self._changes)
+            if key == self._index_key:
+                return self._index
+        index = WatchIndex(self.list())
+        with self._lock:
+            self._index, self._index_key = index, key
+        return index
+
+    def active_dates(self, today=None):
+        """Distinct dates with at least one watch, today or later."""
+        today = today or datetime.now().date()
+        dates = sorted((datetime.strptime(d, "%m/%d/%Y").date(), d) for d in self.index().dates())
+        return [d for day, d in dates if day >= today]
+
+    def match(self, alerts):
+        """Fan new-slot alerts out to watches. Returns {email: [alerts]}."""
+        index = self.index()
+        by_recipient = {}
+        for alert in alerts:
+            for watch in index.matching(alert.date, alert.slot, alert.previous_open):
+                recipients = by_recipient.setdefault(watch.notify, [])
+                if alert not in recipients: # Two watches of one member can overlap
+                    recipients.append(alert)
+        return by_recipient
+
+
+def with_watch_dates(targets, store=None):
+    """
+    `targets` plus a date-only target for every other date someone is
+    watching, so a scrape cycle loads each distinct date exactly once.
+    """
+    store = store or get_watch_store()
+    dates = {t["date"] for t in targets}
+    return list(targets) + [{"date": d} for d in store.active_dates() if d not in dates]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_watch_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = WatchStore()
+        return _store